@@ -2,6 +2,8 @@ import wx
 import ctypes
 import os
 import sys
+import multiprocessing
+import time
 import atexit
 import traceback
 
@@ -13,7 +15,22 @@ try:
     from hotkey.hotkey_dialog import HotkeySettingsDialog
     from utils.unified_tts_speaker import unified_speaker
     from core.database_manager import DatabaseManager
+    from core.db_worker import DatabaseWorker
     from gui.search_results_dialog import SearchResultsDialog
+    from gui.label_input_dialog import LabelInputDialog
+    from gui.label_browser_dialog import LabelBrowserDialog
+    from core.similarity_index import SimilaritySearch
+    from core.audio_fingerprint import DuplicateDetector
+    from core.metadata_indexer import MetadataIndexer
+    from core.library_indexer import LibraryIndexer, load_library_roots, save_library_roots, normalize_roots, list_audio_files
+    from core.audio_reconciler import AudioReconciler
+    from core.content_hash import ExactDuplicateFinder
+    from core.play_history import PlayHistoryRecorder
+    from core.label_snapshot import LabelSnapshotUpdater
+    from core.db_maintenance import MaintenanceScheduler
+    from core.music_analysis import MusicAnalyzer
+    from core.search_filters import parse_search_query
+    from core.label_query import is_boolean_query
     from utils.logger_config import logger # 确保 logger 导入自同一个源
 except ImportError as e:
     print(f"FATAL ERROR: 无法导入核心模块，请检查依赖项: {e}", file=sys.stderr)
@@ -24,7 +41,7 @@ _main_frame_instance = None # 全局引用，用于在其他模块中访问主
 class MyFrame(wx.Frame):
     def __init__(self, parent, title):
         try:
-            super(MyFrame, self).__init__(parent, title=title, size=(400, 150))
+            super(MyFrame, self).__init__(parent, title=title, size=(400, 180))
             self.panel = wx.Panel(self)
             self.Bind(wx.EVT_CLOSE, self.on_close)
             self.Bind(wx.EVT_ICONIZE, self.on_iconize)
@@ -41,13 +58,43 @@ class MyFrame(wx.Frame):
                 "fast_forward": "快进",
                 "rewind": "快退",
                 "add_label": "添加音频标签",
-                "search_label": "搜索音频标签"
+                "search_label": "搜索音频标签",
+                "find_similar": "查找相似音频",
+                "find_duplicates": "查找重复音频",
+                "announce_labels": "朗读当前音频的标签",
+                "rescan_library": "扫描素材库",
+                "find_exact_duplicates": "查找完全相同的文件",
+                "browse_labels": "浏览常用标签",
+                "recent_plays": "最近试听的音频",
+                "most_played": "最常试听的音频",
+                "label_folder": "批量编辑文件夹的标签"
             }
             self.hotkey_manager = HotkeyManager(self)
             # 绑定处理热键事件的函数
             self.Bind(EVT_HOTKEY_TRIGGERED, self.handle_hotkey_event)
 
             self.db_manager = DatabaseManager()
+            # 界面线程中的查询与写入都通过 db_worker 在后台执行，避免慢查询卡住窗口
+            self.db_worker = DatabaseWorker(self.db_manager)
+            self.label_trie = None # 标签自动补全索引，启动后在后台加载
+            self.similarity_search = SimilaritySearch(self.db_manager, self.db_worker)
+            self.duplicate_detector = DuplicateDetector(self.db_manager)
+            self.metadata_indexer = MetadataIndexer(self.db_manager)
+            self.library_indexer = LibraryIndexer(self.db_manager)
+            self.audio_reconciler = AudioReconciler(self.db_manager)
+            self.exact_duplicate_finder = ExactDuplicateFinder(self.db_manager)
+            self.music_analyzer = MusicAnalyzer(self.db_manager)
+            # 试听历史：音频线程只写内存缓冲区，后台定时成批写入数据库
+            self.play_history = PlayHistoryRecorder(self.db_manager)
+            core.audio_manager.set_play_recorder(self.play_history)
+            self.play_history.start()
+            # 标签快照：写入告一段落后在后台重写，只读的标签查询和启动时的自动补全索引直接读取快照
+            self.label_snapshot_updater = LabelSnapshotUpdater(self.db_manager)
+            self.label_snapshot_updater.start()
+            # 空闲时的数据库维护：选中文件（音频命令）和快捷键都算作用户操作，操作时维护在当前时间片结束后暂停
+            self.db_maintenance = MaintenanceScheduler(self.db_manager)
+            core.audio_manager.set_activity_listener(self.db_maintenance.note_activity)
+            self.db_maintenance.start()
 
             self.create_widgets()
             self.layout_widgets()
@@ -72,6 +119,13 @@ class MyFrame(wx.Frame):
             # --- 修复第二个问题：为 toggle_play_pause 添加释放事件处理 ---
             self._toggle_play_pause_pressed = False # 跟踪 toggle_play_pause 按下的状态
 
+            # 在后台为已入库的音频补建元数据索引和特征向量，不阻塞界面
+            wx.CallLater(500, self._load_label_trie)
+            wx.CallLater(1000, self.metadata_indexer.start)
+            wx.CallLater(2000, self.similarity_search.start_background_indexing)
+            wx.CallLater(3000, self.music_analyzer.start)
+            wx.CallLater(4000, self._start_library_scan)
+
             logger.info("GUI 应用程序主窗口已成功初始化。")
 
         except Exception as e:
@@ -93,6 +147,8 @@ class MyFrame(wx.Frame):
         self.toggle_button.Bind(wx.EVT_BUTTON, self.on_toggle_monitor)
         self.settings_button = wx.Button(self.panel, label="快捷键设置")
         self.settings_button.Bind(wx.EVT_BUTTON, self.on_open_hotkey_settings)
+        self.library_button = wx.Button(self.panel, label="添加素材库目录")
+        self.library_button.Bind(wx.EVT_BUTTON, self.on_add_library_folder)
 
     def layout_widgets(self):
         main_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -102,6 +158,7 @@ class MyFrame(wx.Frame):
         main_sizer.Add(status_sizer, 0, wx.EXPAND | wx.TOP | wx.BOTTOM, 5)
         main_sizer.Add(self.toggle_button, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.ALL, 5)
         main_sizer.Add(self.settings_button, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.BOTTOM, 5)
+        main_sizer.Add(self.library_button, 0, wx.ALIGN_CENTER_HORIZONTAL | wx.BOTTOM, 5)
         self.panel.SetSizer(main_sizer)
         self.panel.Fit()
         self.Layout()
@@ -177,6 +234,8 @@ class MyFrame(wx.Frame):
         """处理快捷键按下事件"""
         func_name = event.func_name
         logger.info(f"快捷键触发 (按下): {func_name}")
+        if hasattr(self, 'db_maintenance'):
+            self.db_maintenance.note_activity()
 
         if func_name == "toggle_monitor":
             self.on_toggle_monitor()
@@ -210,6 +269,24 @@ class MyFrame(wx.Frame):
             self.on_add_label_hotkey()
         elif func_name == "search_label":
             self.on_search_label_hotkey()
+        elif func_name == "find_similar":
+            self.on_find_similar_hotkey()
+        elif func_name == "find_duplicates":
+            self.on_find_duplicates_hotkey()
+        elif func_name == "announce_labels":
+            self.on_announce_labels_hotkey()
+        elif func_name == "rescan_library":
+            self.on_rescan_library_hotkey()
+        elif func_name == "find_exact_duplicates":
+            self.on_find_exact_duplicates_hotkey()
+        elif func_name == "browse_labels":
+            self.on_browse_labels_hotkey()
+        elif func_name == "recent_plays":
+            self.on_play_history_hotkey(most_played=False)
+        elif func_name == "most_played":
+            self.on_play_history_hotkey(most_played=True)
+        elif func_name == "label_folder":
+            self.on_label_folder_hotkey()
 
     def on_hotkey_release_event(self, func_name):
         """处理快捷键释放事件"""
@@ -272,6 +349,33 @@ class MyFrame(wx.Frame):
         core.audio_manager.stop_audio()
         # 停止文件监视
         stop_monitor()
+        # 停止后台特征提取
+        if hasattr(self, 'similarity_search'):
+            self.similarity_search.stop()
+        if hasattr(self, 'duplicate_detector'):
+            self.duplicate_detector.stop()
+        if hasattr(self, 'metadata_indexer'):
+            self.metadata_indexer.stop()
+        if hasattr(self, 'library_indexer'):
+            self.library_indexer.stop()
+        if hasattr(self, 'audio_reconciler'):
+            self.audio_reconciler.stop()
+        if hasattr(self, 'exact_duplicate_finder'):
+            self.exact_duplicate_finder.stop()
+        if hasattr(self, 'music_analyzer'):
+            self.music_analyzer.stop()
+        # 写入尚未保存的试听记录
+        if hasattr(self, 'play_history'):
+            core.audio_manager.set_play_recorder(None)
+            self.play_history.stop()
+        if hasattr(self, 'label_snapshot_updater'):
+            self.label_snapshot_updater.stop()
+        if hasattr(self, 'db_maintenance'):
+            core.audio_manager.set_activity_listener(None)
+            self.db_maintenance.stop()
+        # 等待已提交的数据库写入完成
+        if hasattr(self, 'db_worker'):
+            self.db_worker.shutdown()
         
         # 停止所有活动的定时器
         if hasattr(self, 'audio_status_timer') and self.audio_status_timer.IsRunning():
@@ -301,8 +405,8 @@ class MyFrame(wx.Frame):
             logger.warning(msg)
             return
 
-        dlg = wx.TextEntryDialog(self, f"为 '{os.path.basename(current_audio_path)}' 添加标签 (多个标签用逗号分隔):",
-                                "添加音频标签", "", style=wx.TextEntryDialogStyle | wx.OK | wx.CANCEL)
+        dlg = LabelInputDialog(self, f"为 '{os.path.basename(current_audio_path)}' 添加标签 (多个标签用逗号分隔):",
+                               "添加音频标签", "", label_trie=self.label_trie, separator=',')
 
         unified_speaker.speak(f"请为音频文件 {os.path.basename(current_audio_path)} 添加标签。多个标签请用逗号分隔。")
         dlg.CenterOnParent()
@@ -326,18 +430,10 @@ class MyFrame(wx.Frame):
                 dlg.Destroy()
                 return
 
-            try:
-                for label in labels:
-                    self.db_manager.add_audio_label(current_audio_path, label)
-                msg = f"已成功为 '{os.path.basename(current_audio_path)}' 添加标签: {', '.join(labels)}"
-                self.update_status_message(msg)
-                unified_speaker.speak(msg)
-                logger.info(msg)
-            except Exception as e:
-                error_msg = f"添加标签到数据库失败: {e}"
-                self.show_error_message(error_msg, "数据库错误")
-                unified_speaker.speak(error_msg)
-                logger.error(error_msg, exc_info=True)
+            # 所有标签在一个事务中写入
+            self.db_worker.write(self.db_manager.add_audio_labels, [current_audio_path], labels,
+                                 callback=lambda added: self._on_labels_added(current_audio_path, labels, added >= 0),
+                                 error_callback=self._on_database_error)
         else:
             msg = "取消添加标签。"
             self.update_status_message(msg)
@@ -345,8 +441,113 @@ class MyFrame(wx.Frame):
             logger.info(msg)
         dlg.Destroy()
 
+    def _on_labels_added(self, audio_path, labels, success):
+        if not success:
+            self._on_database_error("标签未能写入数据库，详见日志。")
+            return
+        # 新入库的文件顺便建立内嵌元数据索引
+        self.metadata_indexer.index_paths([audio_path])
+        msg = f"已成功为 '{os.path.basename(audio_path)}' 添加标签: {', '.join(labels)}"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def _prompt_batch_labels(self, parent, scope):
+        """
+        询问要对一组音频添加和移除的标签，前面加 "-" 的标签表示移除。
+
+        Returns:
+            tuple | None: (要添加的标签, 要移除的标签)；取消或输入为空时返回 None。
+        """
+        dlg = LabelInputDialog(parent, f"为{scope}编辑标签（多个标签用逗号分隔，前面加 - 表示移除，例如 drums, -todo）:",
+                               "批量编辑标签", "", label_trie=self.label_trie, separator=',')
+        unified_speaker.speak(f"请为{scope}输入标签。多个标签请用逗号分隔，要移除的标签前面加减号。")
+        dlg.CenterOnParent()
+        labels_input = dlg.GetValue().strip() if dlg.ShowModal() == wx.ID_OK else ""
+        dlg.Destroy()
+        labels = [label.strip() for label in labels_input.split(',') if label.strip()]
+        add_labels = [label for label in labels if not label.startswith('-')]
+        remove_labels = [label[1:].strip() for label in labels if label.startswith('-') and label[1:].strip()]
+        if not add_labels and not remove_labels:
+            msg = "取消批量编辑标签。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            return None
+        return add_labels, remove_labels
+
+    def _run_batch_label(self, scope, add_labels, remove_labels, audio_paths=None, label_term=None, filters=()):
+        """在数据库写线程中批量编辑标签（单个事务），进度显示在状态栏。"""
+        progress = lambda done, total: wx.CallAfter(self.update_status_message, f"正在批量编辑标签: {done} / {total}")
+        self.db_worker.write(self.db_manager.update_labels_in_bulk, add_labels, remove_labels, audio_paths,
+                             label_term, filters, progress_callback=progress,
+                             callback=lambda result: self._on_batch_labelled(scope, result, audio_paths),
+                             error_callback=self._on_database_error)
+        self.update_status_message(f"正在为{scope}编辑标签...")
+
+    def _on_batch_labelled(self, scope, result, audio_paths):
+        added, removed = result
+        if added < 0:
+            self._on_database_error("批量编辑标签失败，详见日志。")
+            return
+        if audio_paths and added:
+            # 文件夹中新入库的文件顺便建立内嵌元数据索引
+            self.metadata_indexer.index_paths(audio_paths)
+        msg = f"已为{scope}新增 {added} 个标签关联，移除 {removed} 个。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def _batch_label_search_results(self, parent, label_term, filters, audio_paths, scope):
+        """搜索结果对话框中的批量编辑：audio_paths 为 None 时作用于整个结果集，直接按搜索条件在数据库中选取。"""
+        labels = self._prompt_batch_labels(parent, scope)
+        if labels is None:
+            return
+        if audio_paths is None:
+            self._run_batch_label(scope, *labels, label_term=label_term, filters=filters)
+        else:
+            self._run_batch_label(scope, *labels, audio_paths=audio_paths)
+
+    def on_label_folder_hotkey(self):
+        dlg = wx.DirDialog(self, "选择要批量编辑标签的文件夹（包括子文件夹）", style=wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST)
+        unified_speaker.speak("请选择要批量编辑标签的文件夹。")
+        folder = dlg.GetPath() if dlg.ShowModal() == wx.ID_OK else None
+        dlg.Destroy()
+        if not folder:
+            return
+        labels = self._prompt_batch_labels(self, f"文件夹 '{os.path.basename(folder) or folder}' 中的音频")
+        if labels is None:
+            return
+        # 列出文件在读线程池中进行，写线程只执行数据库事务
+        self.db_worker.read(list_audio_files, folder,
+                            callback=lambda paths: self._on_folder_listed(folder, labels, paths),
+                            error_callback=self._on_database_error)
+        self.update_status_message(f"正在列出 '{folder}' 中的音频文件...")
+
+    def _on_folder_listed(self, folder, labels, paths):
+        if not paths:
+            msg = f"文件夹 '{folder}' 中没有音频文件。"
+            self.show_error_message(msg, "批量编辑标签")
+            unified_speaker.speak(msg)
+            return
+        self._run_batch_label(f"文件夹 '{os.path.basename(folder) or folder}' 中的 {len(paths)} 个音频", *labels,
+                              audio_paths=paths)
+
+    def _load_label_trie(self):
+        # 补全索引加载后由 DatabaseManager 在每次写入标签时增量更新，这里只需保存引用
+        self.db_worker.read(self.db_manager.get_label_trie, callback=self._on_label_trie_loaded)
+
+    def _on_label_trie_loaded(self, label_trie):
+        self.label_trie = label_trie
+
+    def _on_database_error(self, error):
+        error_msg = f"数据库操作失败: {error}"
+        self.show_error_message(error_msg, "数据库错误")
+        unified_speaker.speak(error_msg)
+        logger.error(error_msg)
+
     def on_search_label_hotkey(self):
-        dlg = wx.TextEntryDialog(self, "请输入要搜索的音频标签:", "搜索音频", "", style=wx.TextEntryDialogStyle | wx.OK | wx.CANCEL)
+        dlg = LabelInputDialog(self, "请输入要搜索的音频标签（同时匹配标题、艺术家、专辑等内嵌信息）:", "搜索音频", "",
+                               label_trie=self.label_trie)
 
         unified_speaker.speak("请输入要搜索的音频标签。")
         dlg.CenterOnParent()
@@ -361,27 +562,7 @@ class MyFrame(wx.Frame):
                 dlg.Destroy()
                 return
 
-            try:
-                matching_files = self.db_manager.get_audios_by_label(search_label)
-
-                if not matching_files:
-                    msg = f"未找到与标签 '{search_label}' 匹配的音频文件。"
-                    self.show_error_message(msg, "搜索结果")
-                    unified_speaker.speak(msg)
-                    logger.info(msg)
-                    dlg.Destroy()
-                    return
-
-                result_dlg = SearchResultsDialog(self, f"搜索结果: {search_label}", matching_files)
-                result_dlg.ShowModal()
-                result_dlg.Destroy()
-                unified_speaker.speak(f"搜索完成，找到 {len(matching_files)} 个匹配文件。")
-
-            except Exception as e:
-                error_msg = f"搜索标签失败: {e}"
-                self.show_error_message(error_msg, "数据库错误")
-                unified_speaker.speak(error_msg)
-                logger.error(error_msg, exc_info=True)
+            self._run_label_search(search_label)
         else:
             msg = "取消搜索标签。"
             self.update_status_message(msg)
@@ -389,6 +570,360 @@ class MyFrame(wx.Frame):
             logger.info(msg)
         dlg.Destroy()
 
+    def _run_label_search(self, search_label, suggest_on_miss=True):
+        # 支持 "BPM between 118 and 124 and key A minor"、"label 'impact' AND duration < 2s" 这样的结构化条件
+        parsed_query = parse_search_query(search_label)
+        label_term = parsed_query.label_term if parsed_query.filters else search_label
+        filters = parsed_query.filters
+        # 先只统计数量（只走索引），结果列表由对话框按页加载，不一次性取回全部路径
+        self.db_worker.read(self.db_manager.count_audios, label_term, filters,
+                            callback=lambda total_count: self._show_search_results(
+                                search_label, label_term, filters, total_count, suggest_on_miss),
+                            error_callback=self._on_database_error)
+        self.update_status_message(f"正在搜索 '{search_label}'...")
+
+    def _show_search_results(self, search_label, label_term, filters, total_count, suggest_on_miss=True):
+        if total_count < 0:
+            self._on_database_error("搜索查询失败，详见日志。")
+            return
+        if total_count == 0 and suggest_on_miss and label_term and not is_boolean_query(label_term):
+            # 可能是拼写错误：查询相近的已有标签供用户选择
+            self.db_worker.read(self.db_manager.suggest_labels, label_term,
+                                callback=lambda suggestions: self._offer_label_suggestions(search_label, label_term, suggestions),
+                                error_callback=self._on_database_error)
+            return
+        if total_count == 0:
+            self._report_no_search_results(search_label)
+            return
+
+        msg = f"找到 {total_count} 个匹配文件。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        def load_page(after, callback, error_callback):
+            def on_error(error):
+                error_callback(error) # 让对话框清除进行中的分页请求，之后可以重试
+                self._on_database_error(error)
+            self.db_worker.read(self.db_manager.search_audios_page, label_term, filters, after,
+                                callback=callback, error_callback=on_error)
+        batch_labeler = lambda parent, audio_paths, scope: self._batch_label_search_results(
+            parent, label_term, filters, audio_paths, scope)
+        result_dlg = SearchResultsDialog(self, f"搜索结果: {search_label}", total_count=total_count, page_loader=load_page,
+                                         batch_labeler=batch_labeler)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+        unified_speaker.speak(f"搜索完成，找到 {total_count} 个匹配文件。")
+
+    def _report_no_search_results(self, search_label):
+        msg = f"未找到与标签 '{search_label}' 匹配的音频文件。"
+        self.show_error_message(msg, "搜索结果")
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def _offer_label_suggestions(self, search_label, fuzzy_term, suggestions):
+        if not suggestions:
+            self._report_no_search_results(search_label)
+            return
+
+        names = [name for name, _distance in suggestions]
+        unified_speaker.speak(f"未找到 {search_label}。您是不是要找 {names[0]}？")
+        dlg = wx.SingleChoiceDialog(self, f"未找到与 '{search_label}' 匹配的音频文件。您是不是要找：",
+                                    "搜索建议", names)
+        dlg.CenterOnParent()
+        if dlg.ShowModal() == wx.ID_OK:
+            chosen = dlg.GetStringSelection()
+            logger.info(f"用户选择了搜索建议: '{fuzzy_term}' -> '{chosen}'")
+            # 结构化条件保持不变，只替换标签搜索词
+            self._run_label_search(search_label.replace(fuzzy_term, chosen) if fuzzy_term in search_label else chosen,
+                                   suggest_on_miss=False)
+        else:
+            msg = "取消搜索标签。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+        dlg.Destroy()
+
+    def on_browse_labels_hotkey(self):
+        # 使用次数由数据库触发器维护，统计和分页都只读 label_stats 上的索引
+        self.db_worker.read(self.db_manager.count_used_labels, callback=self._show_label_browser,
+                            error_callback=self._on_database_error)
+
+    def _show_label_browser(self, total_count):
+        if total_count < 0:
+            self._on_database_error("读取标签失败，详见日志。")
+            return
+        if total_count == 0:
+            msg = "还没有任何标签。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            return
+        unified_speaker.speak(f"共 {total_count} 个标签，按使用次数排列。")
+        def load_page(order, after, callback, error_callback):
+            def on_error(error):
+                error_callback(error) # 让对话框清除进行中的分页请求，之后可以重试
+                self._on_database_error(error)
+            self.db_worker.read(self.db_manager.get_label_usage_page, order, after,
+                                callback=callback, error_callback=on_error)
+        dlg = LabelBrowserDialog(self, total_count, load_page)
+        label = dlg.GetSelectedLabel() if dlg.ShowModal() == wx.ID_OK else None
+        dlg.Destroy()
+        if label:
+            # 只列出带有该标签（及其下级标签）的音频，不做模糊匹配；标签快照与数据库一致时不访问数据库
+            self.db_worker.read(self.db_manager.get_audios_with_label, label,
+                                callback=lambda paths: self._show_label_audios(label, paths),
+                                error_callback=self._on_database_error)
+
+    def _show_label_audios(self, label, paths):
+        if not paths:
+            self._report_no_search_results(label)
+            return
+        msg = f"标签 '{label}' 共有 {len(paths)} 个音频。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        batch_labeler = lambda parent, audio_paths, scope: self._batch_label_search_results(parent, None, (), audio_paths, scope)
+        result_dlg = SearchResultsDialog(self, f"标签: {label}", paths, batch_labeler=batch_labeler)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+
+    def on_play_history_hotkey(self, most_played):
+        # 先写入缓冲区中的试听记录，列表中包含刚刚试听的音频
+        def load_history():
+            self.play_history.flush()
+            if most_played:
+                return self.db_manager.get_most_played()
+            return self.db_manager.get_recent_plays()
+        self.db_worker.write(load_history, callback=lambda plays: self._show_play_history(plays, most_played),
+                             error_callback=self._on_database_error)
+
+    def _show_play_history(self, plays, most_played):
+        title = "最常试听的音频" if most_played else "最近试听的音频"
+        if not plays:
+            msg = "还没有试听记录。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            return
+        paths = [path for path, _play_count, _last_played in plays]
+        display_names = [f"{os.path.basename(path)} ({play_count} 次，{time.strftime('%m-%d %H:%M', time.localtime(last_played))})"
+                         for path, play_count, last_played in plays]
+        unified_speaker.speak(f"{title}，共 {len(plays)} 个。")
+        batch_labeler = lambda parent, audio_paths, scope: self._batch_label_search_results(parent, None, (), audio_paths, scope)
+        result_dlg = SearchResultsDialog(self, title, paths, display_names=display_names, batch_labeler=batch_labeler)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+
+    def on_announce_labels_hotkey(self):
+        current_audio_path = core.audio_manager.get_last_played_file_path()
+        if not current_audio_path:
+            msg = "没有正在播放或最近播放的音频文件。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            return
+        # 标签列表按写代数缓存，反复朗读同一文件不会再查询数据库
+        self.db_worker.read(self.db_manager.get_labels_for_audio, current_audio_path,
+                            callback=lambda labels: self._announce_labels(current_audio_path, labels),
+                            error_callback=self._on_database_error)
+
+    def _announce_labels(self, audio_path, labels):
+        file_name = os.path.basename(audio_path)
+        msg = f"'{file_name}' 的标签: {', '.join(labels)}" if labels else f"'{file_name}' 还没有标签。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def on_find_similar_hotkey(self):
+        current_audio_path = core.audio_manager.get_last_played_file_path()
+        if not current_audio_path or not os.path.exists(current_audio_path):
+            msg = "没有正在播放或最近播放的音频文件，无法查找相似音频。"
+            self.show_error_message(msg, "操作失败")
+            unified_speaker.speak(msg)
+            logger.warning(msg)
+            return
+
+        msg = f"正在查找与 '{os.path.basename(current_audio_path)}' 相似的音频..."
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+        self.similarity_search.find_similar(
+            current_audio_path,
+            lambda results: self._show_similar_results(current_audio_path, results))
+
+    def _show_similar_results(self, source_path, results):
+        if not results:
+            msg = f"未找到与 '{os.path.basename(source_path)}' 相似的音频文件。"
+            self.show_error_message(msg, "搜索结果")
+            unified_speaker.speak(msg)
+            logger.info(msg)
+            return
+
+        matching_files = [path for path, _score in results]
+        result_dlg = SearchResultsDialog(self, f"相似音频: {os.path.basename(source_path)}", matching_files)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+        unified_speaker.speak(f"搜索完成，找到 {len(matching_files)} 个相似文件。")
+
+    def on_find_duplicates_hotkey(self):
+        if self.duplicate_detector.is_running():
+            msg = "正在计算音频指纹，请稍后再试。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            logger.info(msg)
+            return
+
+        msg = "正在更新音频指纹并查找重复文件..."
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+        if not self.duplicate_detector.start_fingerprinting(on_finished=self._present_duplicate_clusters):
+            msg = "音频分析组件 (numpy) 不可用，无法查找重复音频。"
+            self.show_error_message(msg, "操作失败")
+            unified_speaker.speak(msg)
+
+    def _present_duplicate_clusters(self, clusters):
+        if not clusters:
+            msg = "未发现重复的音频文件。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            logger.info(msg)
+            return
+
+        paths = []
+        display_names = []
+        for group_index, members in enumerate(clusters, start=1):
+            for path in members:
+                paths.append(path)
+                display_names.append(f"[第 {group_index} 组] {os.path.basename(path)}")
+
+        result_dlg = SearchResultsDialog(self, f"重复音频: {len(clusters)} 组", paths, display_names=display_names)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+        unified_speaker.speak(f"共发现 {len(clusters)} 组重复音频。")
+        self._offer_label_sharing(clusters)
+
+    def _offer_label_sharing(self, clusters):
+        confirm = wx.MessageDialog(self, "是否在每个重复组内同步标签（组内文件拥有相同的标签）？",
+                                   "同步标签", wx.YES_NO | wx.ICON_QUESTION)
+        if confirm.ShowModal() == wx.ID_YES:
+            def share_labels():
+                return sum(max(self.db_manager.share_labels_among(members), 0) for members in clusters)
+
+            self.db_worker.write(share_labels,
+                                 callback=lambda added: self._on_labels_shared(len(clusters), added),
+                                 error_callback=self._on_database_error)
+        confirm.Destroy()
+
+    def _on_labels_shared(self, cluster_count, added):
+        msg = f"已在 {cluster_count} 个重复组内同步标签，新增 {added} 条标签关联。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def on_find_exact_duplicates_hotkey(self):
+        if self.audio_reconciler.is_running() or self.exact_duplicate_finder.is_running():
+            msg = "正在核对素材库文件，请稍后再试。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            logger.info(msg)
+            return
+
+        msg = "正在核对文件并查找完全相同的音频..."
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+        # 先核对文件大小和修改时间，内容哈希只为有变化或新出现的文件重新计算
+        self.audio_reconciler.start(
+            on_finished=lambda stats: wx.CallAfter(self._on_reconciled_for_exact_duplicates, stats))
+
+    def _on_reconciled_for_exact_duplicates(self, stats):
+        self._on_audios_reconciled(stats)
+        self.exact_duplicate_finder.start(
+            on_finished=lambda stats: wx.CallAfter(self._show_exact_duplicates, stats))
+
+    def _show_exact_duplicates(self, stats):
+        self.db_worker.read(self.db_manager.get_exact_duplicate_groups,
+                            callback=lambda groups: self._present_exact_duplicates(groups, stats),
+                            error_callback=self._on_database_error)
+
+    def _present_exact_duplicates(self, groups, stats):
+        if not groups:
+            msg = "未发现完全相同的音频文件。"
+            self.update_status_message(msg)
+            unified_speaker.speak(msg)
+            logger.info(msg)
+            return
+
+        paths = []
+        display_names = []
+        for group_index, (_file_size, members) in enumerate(groups, start=1):
+            for path in members:
+                paths.append(path)
+                display_names.append(f"[第 {group_index} 组] {os.path.basename(path)}")
+
+        saved_mb = stats.redundant_bytes / 1024 / 1024
+        msg = f"共发现 {len(groups)} 组完全相同的音频，多余副本 {stats.redundant_files} 个，可节省 {saved_mb:.1f} MB。"
+        self.update_status_message(msg)
+        logger.info(msg)
+        result_dlg = SearchResultsDialog(self, f"完全相同的音频: {len(groups)} 组，可节省 {saved_mb:.1f} MB",
+                                         paths, display_names=display_names)
+        result_dlg.ShowModal()
+        result_dlg.Destroy()
+        unified_speaker.speak(msg)
+        self._offer_label_sharing([members for _file_size, members in groups])
+
+    def on_add_library_folder(self, event=None):
+        dlg = wx.DirDialog(self, "选择音频素材库目录", style=wx.DD_DEFAULT_STYLE | wx.DD_DIR_MUST_EXIST)
+        if dlg.ShowModal() == wx.ID_OK:
+            roots = normalize_roots(load_library_roots() + [dlg.GetPath()])
+            save_library_roots(roots)
+            self._start_library_scan(announce=True)
+        dlg.Destroy()
+
+    def on_rescan_library_hotkey(self):
+        if not load_library_roots():
+            self.on_add_library_folder() # 尚未配置素材库时先选择目录
+            return
+        self._start_library_scan(announce=True)
+
+    def _start_library_scan(self, announce=False):
+        """在后台扫描配置的素材库目录；启动时的自动扫描不播报，只在有新文件时更新状态。"""
+        roots = load_library_roots()
+        if not roots:
+            self._start_reconciler()
+            return
+        started = self.library_indexer.start(
+            roots, on_finished=lambda stats: wx.CallAfter(self._on_library_scanned, stats, announce))
+        if not announce:
+            return
+        msg = "正在扫描素材库..." if started else "素材库正在扫描中，请稍后再试。"
+        self.update_status_message(msg)
+        unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def _on_library_scanned(self, stats, announce):
+        # 扫描到的新文件可能是移动过的已标记文件，核对后重新链接
+        self._start_reconciler()
+        if stats.new_files:
+            # 新入库的文件需要补建元数据索引、速度/调性分析和特征向量
+            self.metadata_indexer.start()
+            self.music_analyzer.start()
+            self.similarity_search.start_background_indexing()
+        elif not announce:
+            return
+        msg = (f"素材库扫描完成，新增 {stats.new_files} 个音频文件"
+               f"（检查 {stats.directories} 个目录，{stats.dirty_directories} 个有变化）。")
+        self.update_status_message(msg)
+        if announce:
+            unified_speaker.speak(msg)
+        logger.info(msg)
+
+    def _start_reconciler(self):
+        """在后台核对音频记录：标记缺失的文件，并把移动过的文件重新链接到新位置。"""
+        self.audio_reconciler.start(on_finished=lambda stats: wx.CallAfter(self._on_audios_reconciled, stats))
+
+    def _on_audios_reconciled(self, stats):
+        if not stats.relinked and not stats.newly_missing:
+            return
+        msg = f"已重新链接 {stats.relinked} 个移动过的音频文件，{stats.missing} 个文件缺失。"
+        self.update_status_message(msg)
+        logger.info(msg)
+
 APP_CURRENT_VERSION = "1.0.0"
 
 if sys.platform == 'win32':
@@ -399,6 +934,9 @@ if sys.platform == 'win32':
         logger.warning(f"设置应用程序用户模型ID失败: {e}")
 
 def main():
+    # 打包后的程序使用进程池（音频指纹计算）时需要此调用
+    multiprocessing.freeze_support()
+
     # 确保只创建一个 wx.App 实例
     app = wx.App.Get()
     if not app:
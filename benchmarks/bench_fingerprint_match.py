@@ -0,0 +1,150 @@
+"""
+指纹匹配的基准测试：对比原来的全表哈希自连接与按源音频分批、只用最稀有哈希探测候选的查询。
+
+用法:
+    python benchmarks/bench_fingerprint_match.py              # 默认 10,000 个音频（800 万个哈希）
+    python benchmarks/bench_fingerprint_match.py 2000         # 指定音频数量
+
+合成数据：每个音频 800 个哈希，锚点频率集中在低频（与真实录音的峰值分布类似，少数哈希非常常见）；
+每 50 个音频中有一组副本：紧接着原音频的是完整副本（哈希相同、时间偏移整体平移），再下一个是只保留 70% 哈希的
+部分副本（模拟以其他格式或码率重新导出），三者应被合并为一个重复组。有副本的原音频峰值分布均匀、哈希很少与其他音频相同，
+前两个副本共有而部分副本缺少的稀有哈希最多，用来检验探测哈希不会全部落在前两个副本之间。
+原查询的代价随音频数平方增长，只在 LEGACY_MAX_AUDIOS 个音频以内运行作为对照。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_label_search import BenchDatabaseManager
+from core.audio_fingerprint import MIN_ALIGNED_MATCHES, MIN_MATCH_RATIO
+
+DEFAULT_AUDIO_COUNT = 10_000
+HASHES_PER_AUDIO = 800
+DUPLICATE_EVERY = 50
+PARTIAL_COPY_RATIO = 0.7
+LEGACY_MAX_AUDIOS = 2000
+
+# 改造前 find_fingerprint_matches 使用的查询，作为对照
+LEGACY_QUERY = '''
+    SELECT m.id_a, m.id_b
+    FROM (
+        SELECT h1.audio_id AS id_a, h2.audio_id AS id_b, COUNT(*) AS aligned
+        FROM fingerprint_hashes h1
+        JOIN fingerprint_hashes h2 ON h2.hash = h1.hash AND h2.audio_id > h1.audio_id
+        GROUP BY h1.audio_id, h2.audio_id, h2.time_offset - h1.time_offset
+        HAVING aligned >= ?
+    ) m
+    JOIN fingerprinted_audios fa ON fa.audio_id = m.id_a
+    JOIN fingerprinted_audios fb ON fb.audio_id = m.id_b
+    WHERE m.aligned >= ? * MIN(fa.hash_count, fb.hash_count)
+    GROUP BY m.id_a, m.id_b
+'''
+
+
+def random_hashes(rng, distinctive=False):
+    hashes = []
+    for _ in range(HASHES_PER_AUDIO):
+        # 低频峰值更常见；distinctive 的音频峰值分布均匀，哈希大多只出现在它自己和副本中
+        anchor = rng.randint(0, 511) if distinctive else min(int(rng.expovariate(1 / 40)), 511)
+        target = min(max(anchor + rng.randint(-30, 30), 0), 511)
+        hashes.append(((anchor << 15) | (target << 6) | rng.randint(1, 63), rng.randint(0, 5000)))
+    return hashes
+
+
+def populate(db, audio_count, rng):
+    """Returns: list，期望的重复组 [{路径, ...}, ...]。"""
+    start = time.perf_counter()
+    paths = [f"D:\\素材库\\fp\\{i:07d}.wav" for i in range(audio_count)]
+    audio_ids = db._ensure_audio_ids(paths)
+    groups = []
+    original = None
+    for i, path in enumerate(paths):
+        position = i % DUPLICATE_EVERY
+        if original is not None and position in (1, 2):
+            shift = rng.randint(0, 500)
+            hashes = [(h, offset + shift) for h, offset in original]
+            if position == 1:
+                groups.append({paths[i - 1], path})
+            else:
+                hashes = rng.sample(hashes, int(len(hashes) * PARTIAL_COPY_RATIO))
+                groups[-1].add(path)
+        else:
+            hashes = random_hashes(rng, distinctive=position == 0)
+            original = hashes if position == 0 else None
+        audio_id = audio_ids[path]
+        db.cursor.executemany("INSERT OR IGNORE INTO fingerprint_hashes (hash, audio_id, time_offset) VALUES (?, ?, ?)",
+                              [(h, audio_id, offset) for h, offset in hashes])
+        db.cursor.execute("INSERT INTO fingerprinted_audios (audio_id, version, hash_count) VALUES (?, 1, ?)",
+                          (audio_id, len(hashes)))
+    db.conn.commit()
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print(f"生成 {audio_count} 个音频、约 {audio_count * HASHES_PER_AUDIO} 个哈希（{len(groups)} 个三副本组），"
+          f"耗时 {time.perf_counter() - start:.1f}s，数据库 {os.path.getsize(db.db_path) / 1024 / 1024:.1f} MB")
+    return groups
+
+
+def batched_matches(db):
+    pairs = []
+    after_id = 0
+    batches = 0
+    while after_id is not None:
+        batch_pairs, after_id = db.find_fingerprint_matches(MIN_ALIGNED_MATCHES, MIN_MATCH_RATIO, after_id)
+        pairs.extend(batch_pairs)
+        batches += 1
+    return pairs, batches
+
+
+def complete_groups(pairs, groups):
+    """与 DuplicateDetector 一样用并查集合并匹配对，返回被完整找到（没有多余成员）的期望重复组数。"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for path_a, path_b in pairs:
+        parent[find(path_a)] = find(path_b)
+    clusters = {}
+    for path in parent:
+        clusters.setdefault(find(path), set()).add(path)
+    found = {frozenset(cluster) for cluster in clusters.values()}
+    return sum(frozenset(group) in found for group in groups)
+
+
+def run_benchmark(audio_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_fingerprint_bench_") as temp_dir:
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        groups = populate(db, audio_count, rng)
+        longest = db.cursor.execute(
+            "SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM fingerprint_hashes GROUP BY hash)").fetchone()[0]
+        print(f"最长的哈希倒排表: {longest} 条")
+
+        if audio_count <= LEGACY_MAX_AUDIOS:
+            start = time.perf_counter()
+            legacy = db.cursor.execute(LEGACY_QUERY, (MIN_ALIGNED_MATCHES, MIN_MATCH_RATIO)).fetchall()
+            id_paths = dict(db.cursor.execute(
+                "SELECT a.id, d.path || a.name FROM audios a JOIN directories d ON d.id = a.directory_id").fetchall())
+            legacy = [(id_paths[id_a], id_paths[id_b]) for id_a, id_b in legacy]
+            print(f"全表自连接 (改造前): {time.perf_counter() - start:.2f}s，{len(legacy)} 对，"
+                  f"完整找到 {complete_groups(legacy, groups)}/{len(groups)} 个重复组")
+        else:
+            print(f"全表自连接 (改造前): 超过 {LEGACY_MAX_AUDIOS} 个音频，跳过")
+
+        start = time.perf_counter()
+        pairs, batches = batched_matches(db)
+        elapsed = time.perf_counter() - start
+        print(f"分批 + 稀有哈希探测: {elapsed:.2f}s，{batches} 批（平均每批 {elapsed / batches * 1000:.0f}ms），"
+              f"{len(pairs)} 对，完整找到 {complete_groups(pairs, groups)}/{len(groups)} 个重复组")
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_AUDIO_COUNT)
@@ -0,0 +1,75 @@
+"""
+标签批量导入/导出的基准测试：向空数据库导入、重复导入（关联均已存在）、导出为 CSV 与 JSONL。
+
+用法:
+    python benchmarks/bench_label_io.py              # 默认 5,000,000 条标签关联
+    python benchmarks/bench_label_io.py 500000       # 指定关联数量
+
+合成数据：每个音频 LABELS_PER_AUDIO 个标签，共 LABEL_COUNT 个不同标签，每个目录 50 个音频。
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database_manager import DatabaseManager
+from core.label_io import export_labels, import_labels
+
+DEFAULT_ASSIGNMENT_COUNT = 5_000_000
+LABELS_PER_AUDIO = 3
+LABEL_COUNT = 20000
+FILES_PER_DIRECTORY = 50
+
+
+class BenchDatabaseManager(DatabaseManager):
+    """使用临时数据库文件，不读写程序目录下的 db_path.dat。"""
+    def __init__(self, db_path):
+        self._bench_db_path = db_path
+        super().__init__()
+
+    def _get_database_path(self):
+        return self._bench_db_path
+
+
+def write_source(file_path, assignment_count, rng):
+    start = time.perf_counter()
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'label'])
+        for i in range(assignment_count // LABELS_PER_AUDIO):
+            path = f"D:\\素材库\\库{i // 20000}\\分类{i // FILES_PER_DIRECTORY}\\sound_{i:07d}.wav"
+            for label_index in rng.sample(range(LABEL_COUNT), LABELS_PER_AUDIO):
+                writer.writerow((path, f"标签{label_index}"))
+    print(f"生成 {assignment_count} 条标签关联的 CSV ({os.path.getsize(file_path) / 1024 / 1024:.0f} MB)，"
+          f"耗时 {time.perf_counter() - start:.1f}s")
+
+
+def report(name, stats):
+    rate = stats.rows / stats.elapsed if stats.elapsed else 0.0
+    print(f"{name}: {stats.elapsed:.2f}s, {stats.rows} 条 ({rate:.0f} 条/秒)，新增 {stats.added}")
+
+
+def run_benchmark(assignment_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_label_io_bench_") as temp_dir:
+        source = os.path.join(temp_dir, "labels.csv")
+        write_source(source, assignment_count, rng)
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        report("导入到空数据库", import_labels(db, source))
+        report("重复导入", import_labels(db, source))
+        report("导出 CSV", export_labels(db, os.path.join(temp_dir, "export.csv")))
+        jsonl_path = os.path.join(temp_dir, "export.jsonl")
+        report("导出 JSONL", export_labels(db, jsonl_path))
+        db.close_connection()
+
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench_jsonl.db"))
+        report("从 JSONL 导入到空数据库", import_labels(db, jsonl_path))
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ASSIGNMENT_COUNT)
@@ -0,0 +1,116 @@
+"""
+标签/文件名搜索的基准测试：对比原来的 LIKE 全表扫描与 trigram 全文索引。
+
+用法:
+    python benchmarks/bench_label_search.py              # 默认 1,000,000 个音频
+    python benchmarks/bench_label_search.py 200000       # 指定音频数量
+
+合成数据：N 个音频、约 N/10 个不同标签，每个音频 2 个标签。搜索词是随机抽取的标签子串（5-6 个字符）。
+布尔查询把同一音频的两个标签子串组合为 "a AND b"，并加入一个宽泛的 OR / NOT 子表达式。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database_manager import DatabaseManager
+
+DEFAULT_AUDIO_COUNT = 1_000_000
+LABELS_PER_AUDIO = 2
+QUERY_COUNT = 100
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+CHINESE_WORDS = ["金属", "撞击", "脚步", "环境", "开门", "爆炸", "风声", "雨声"]
+
+# 改造前 get_audios_by_label 使用的查询，作为对照
+LEGACY_QUERY = '''
+    SELECT DISTINCT d.path || a.name
+    FROM audios a
+    JOIN directories d ON d.id = a.directory_id
+    JOIN audio_labels al ON a.id = al.audio_id
+    JOIN labels l ON al.label_id = l.id
+    WHERE l.name LIKE ?
+'''
+
+
+class BenchDatabaseManager(DatabaseManager):
+    """使用临时数据库文件，不读写程序目录下的 db_path.dat。"""
+    def __init__(self, db_path):
+        self._bench_db_path = db_path
+        super().__init__()
+
+    def _get_database_path(self):
+        return self._bench_db_path
+
+
+def random_word(rng):
+    word = "".join(rng.choice(LETTERS) for _ in range(rng.randint(5, 9)))
+    return word + rng.choice(CHINESE_WORDS) if rng.random() < 0.2 else word
+
+
+def populate(db, audio_count, rng):
+    label_count = max(1, audio_count // 10)
+    labels = list(dict.fromkeys(random_word(rng) + f" {i % 97}" for i in range(label_count)))
+    start = time.perf_counter()
+    db.cursor.executemany("INSERT INTO labels (name) VALUES (?)", [(name,) for name in labels])
+    folders = [f"D:\\素材库\\{random_word(rng)}\\" for _ in range(max(1, audio_count // 50))]
+    db._ensure_audio_ids(f"{rng.choice(folders)}{random_word(rng)}_{i:07d}.wav" for i in range(audio_count))
+    db.cursor.executemany("INSERT OR IGNORE INTO audio_labels (audio_id, label_id) VALUES (?, ?)",
+                          ((audio_id, rng.randint(1, len(labels)))
+                           for audio_id in range(1, audio_count + 1) for _ in range(LABELS_PER_AUDIO)))
+    db.conn.commit()
+    db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print(f"生成 {audio_count} 个音频、{len(labels)} 个标签，耗时 {time.perf_counter() - start:.1f}s，"
+          f"数据库 {os.path.getsize(db.db_path) / 1024 / 1024:.1f} MB")
+    return labels
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(name, run, terms):
+    latencies = []
+    total_results = 0
+    for term in terms:
+        start = time.perf_counter()
+        total_results += len(run(term))
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"{name}: p50 {percentile(latencies, 0.5):.2f}ms, p99 {percentile(latencies, 0.99):.2f}ms, "
+          f"最大 {max(latencies):.2f}ms, 平均结果数 {total_results / len(terms):.1f}")
+
+
+def run_benchmark(audio_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_search_bench_") as temp_dir:
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        labels = populate(db, audio_count, rng)
+        terms = []
+        for _ in range(QUERY_COUNT):
+            label = rng.choice(labels)
+            length = rng.randint(5, 6)
+            offset = rng.randint(0, max(0, len(label) - length))
+            terms.append(label[offset:offset + length])
+
+        measure("LIKE 扫描 (改造前)",
+                lambda term: db.cursor.execute(LEGACY_QUERY, (f"%{term}%",)).fetchall(), terms)
+        measure("全文索引 (标签 + 文件名 + 元数据)", db.get_audios_by_label, terms)
+
+        # 每个布尔查询的两个肯定项取自同一音频的两个标签，保证有结果；第三项是宽泛的短词
+        boolean_queries = []
+        for _ in range(QUERY_COUNT):
+            audio_id = rng.randint(1, audio_count)
+            names = [row[0] for row in db.cursor.execute(
+                "SELECT l.name FROM audio_labels al JOIN labels l ON l.id = al.label_id WHERE al.audio_id = ?", (audio_id,))]
+            first, second = (names + names)[:2]
+            broad = rng.choice(LETTERS) + rng.choice(LETTERS)
+            boolean_queries.append(f"{first[:6]} AND ({second[:6]} OR {broad}) NOT {rng.choice(CHINESE_WORDS)}")
+        measure("布尔查询 (a AND (b OR c) NOT d)", db.get_audios_by_label, boolean_queries)
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_AUDIO_COUNT)
@@ -0,0 +1,87 @@
+"""
+标签快照的基准测试：对比冷启动时从 mmap 快照读取与从 SQLite 查询"带某标签的所有音频"。
+
+用法:
+    python benchmarks/bench_label_snapshot.py              # 默认 500,000 个音频（1,000,000 条标签关联）
+    python benchmarks/bench_label_snapshot.py 100000       # 指定音频数量
+
+合成数据：N 个音频、约 N/10 个不同标签，每个音频 2 个标签；每 10 个标签挂在一个上级标签之下。
+"冷启动"每次查询前都关闭快照，计入打开文件、映射和校验写代数的时间（文件本身仍在系统缓存中）。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_label_search import BenchDatabaseManager, measure, populate
+from core.label_trie import LabelTrie
+
+DEFAULT_AUDIO_COUNT = 500_000
+QUERY_COUNT = 100
+CHILDREN_PER_PARENT = 10
+
+
+class SnapshotBenchDatabaseManager(BenchDatabaseManager):
+    """快照文件与临时数据库放在同一目录；use_snapshot 为 False 时查询总是退回 SQLite。"""
+    use_snapshot = True
+
+    def _get_label_snapshot_path(self):
+        return self._bench_db_path + ".snapshot"
+
+    def _fresh_label_snapshot(self):
+        return super()._fresh_label_snapshot() if self.use_snapshot else None
+
+
+def close_snapshot(db):
+    with db._label_snapshot_lock:
+        if db._label_snapshot is not None:
+            db._label_snapshot.close()
+            db._label_snapshot = None
+
+
+def run_benchmark(audio_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_snapshot_bench_") as temp_dir:
+        db = SnapshotBenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        labels = populate(db, audio_count, rng)
+        parents = [f"group {i}" for i in range(0, len(labels), CHILDREN_PER_PARENT)]
+        db.set_label_parents((label, parents[i // CHILDREN_PER_PARENT]) for i, label in enumerate(labels))
+
+        start = time.perf_counter()
+        db.write_label_snapshot()
+        print(f"写入快照耗时 {time.perf_counter() - start:.2f}s，"
+              f"文件 {os.path.getsize(db._get_label_snapshot_path()) / 1024 / 1024:.1f} MB")
+
+        terms = [rng.choice(labels) for _ in range(QUERY_COUNT)]
+        parent_terms = [rng.choice(parents) for _ in range(QUERY_COUNT)]
+
+        def sqlite_lookup(term):
+            db.use_snapshot = False
+            try:
+                return db.get_audios_with_label(term)
+            finally:
+                db.use_snapshot = True
+
+        def cold_lookup(term):
+            close_snapshot(db)
+            return db.get_audios_with_label(term)
+
+        measure("SQLite 标签", sqlite_lookup, terms)
+        measure("快照冷启动 标签", cold_lookup, terms)
+        measure("快照 标签", db.get_audios_with_label, terms)
+        measure("SQLite 上级标签（含下级）", sqlite_lookup, parent_terms)
+        measure("快照冷启动 上级标签（含下级）", cold_lookup, parent_terms)
+
+        for name, source in (("SQLite", db._label_usage_counts), ("快照", lambda: db._label_snapshot.label_counts())):
+            db.get_audios_with_label(terms[0]) # 确保快照已映射
+            start = time.perf_counter()
+            LabelTrie().build(source())
+            print(f"从{name}加载自动补全索引: {(time.perf_counter() - start) * 1000:.1f}ms")
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_AUDIO_COUNT)
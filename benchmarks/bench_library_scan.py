@@ -0,0 +1,77 @@
+"""
+素材库扫描的基准测试：首次全量扫描、无变化的重新扫描，以及少量目录有新增文件时的增量扫描。
+
+用法:
+    python benchmarks/bench_library_scan.py              # 默认 200,000 个文件
+    python benchmarks/bench_library_scan.py 1000000      # 指定文件数量
+
+合成数据：三层目录，每个目录 50 个空音频文件（另有少量非音频文件，扫描时应被忽略）。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database_manager import DatabaseManager
+from core.library_indexer import LibraryIndexer
+
+DEFAULT_FILE_COUNT = 200_000
+FILES_PER_DIRECTORY = 50
+DIRECTORIES_PER_LEVEL = 20
+CHANGED_DIRECTORY_FRACTION = 0.01
+
+
+class BenchDatabaseManager(DatabaseManager):
+    """使用临时数据库文件，不读写程序目录下的 db_path.dat。"""
+    def __init__(self, db_path):
+        self._bench_db_path = db_path
+        super().__init__()
+
+    def _get_database_path(self):
+        return self._bench_db_path
+
+
+def build_tree(root, file_count):
+    start = time.perf_counter()
+    directories = []
+    for i in range((file_count + FILES_PER_DIRECTORY - 1) // FILES_PER_DIRECTORY):
+        directory = os.path.join(root, f"库{i // DIRECTORIES_PER_LEVEL ** 2}",
+                                 f"分类{i // DIRECTORIES_PER_LEVEL % DIRECTORIES_PER_LEVEL}", f"素材{i}")
+        os.makedirs(directory)
+        for j in range(min(FILES_PER_DIRECTORY, file_count - i * FILES_PER_DIRECTORY)):
+            open(os.path.join(directory, f"sound_{j:03d}.wav"), 'wb').close()
+        open(os.path.join(directory, "notes.txt"), 'wb').close()
+        directories.append(directory)
+    print(f"生成 {file_count} 个文件、{len(directories)} 个目录，耗时 {time.perf_counter() - start:.1f}s")
+    return directories
+
+
+def report(name, stats):
+    rate = stats.files / stats.elapsed if stats.elapsed else 0.0
+    print(f"{name}: {stats.elapsed:.2f}s, 检查 {stats.directories} 个目录（有变化 {stats.dirty_directories}），"
+          f"列出 {stats.files} 个文件，新增 {stats.new_files} ({rate:.0f} 文件/秒)")
+
+
+def run_benchmark(file_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_scan_bench_") as temp_dir:
+        library_root = os.path.join(temp_dir, "library")
+        directories = build_tree(library_root, file_count)
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        indexer = LibraryIndexer(db)
+
+        report("首次扫描", indexer.scan([library_root]))
+        report("无变化的重新扫描", indexer.scan([library_root]))
+
+        changed = rng.sample(directories, max(1, int(len(directories) * CHANGED_DIRECTORY_FRACTION)))
+        for directory in changed:
+            open(os.path.join(directory, "new_take.wav"), 'wb').close()
+        report(f"{len(changed)} 个目录新增文件后的重新扫描", indexer.scan([library_root]))
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILE_COUNT)
@@ -0,0 +1,84 @@
+"""
+搜索结果分页的基准测试：宽泛搜索（约 10 万个匹配）时逐页翻到深处，每页的耗时。
+
+用法:
+    python benchmarks/bench_search_paging.py              # 默认 200,000 个音频
+    python benchmarks/bench_search_paging.py 500000       # 指定音频数量
+
+合成数据同 bench_label_search（N 个音频、每个音频 2 个标签），另有 5% 的音频有试听记录。
+搜索词取单个字母，约一半的音频匹配；结果按相关度与试听热度排序。对照组按改造前的做法，
+每页都在全部匹配上重新计算排序键，再按上一页最后一行的排序键定位（键集分页）。
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_label_search import BenchDatabaseManager, populate
+from core.database_manager import RESULTS_PAGE_SIZE
+
+DEFAULT_AUDIO_COUNT = 200_000
+PAGES = (1, 2, 3, 10, 100)
+PLAYED_FRACTION = 0.05
+
+
+def legacy_page(db, label_term, after):
+    """改造前的 search_audios_page：排序键在子查询中对每个匹配计算，按行值比较定位到上一页之后。"""
+    from_sql, where_sql, params, order_keys, order_params = db._search_query_parts(label_term, [])
+    key_names = [f"sort_key_{i}" for i in range(len(order_keys))]
+    key_columns = ", ".join(f"{key} AS {name}" for key, name in zip(order_keys, key_names))
+    page_where = f"({', '.join(key_names)}) > ({', '.join('?' * len(key_names))})" if after else "1"
+    rows = db.cursor.execute(f'''
+        SELECT * FROM (SELECT d.path || a.name AS path, {key_columns} FROM {from_sql} WHERE {where_sql})
+        WHERE {page_where}
+        ORDER BY {", ".join(key_names)}
+        LIMIT ?
+    ''', order_params + params + list(after or ()) + [RESULTS_PAGE_SIZE]).fetchall()
+    return [row['path'] for row in rows], tuple(rows[-1][1:])
+
+
+def walk_pages(name, load_page, reset=None):
+    after = None
+    timings = []
+    first_pages = []
+    for page in range(1, max(PAGES) + 1):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        paths, after = load_page(after)
+        elapsed = (time.perf_counter() - start) * 1000
+        if page in PAGES:
+            timings.append(f"第 {page} 页 {elapsed:.0f}ms")
+        if page <= 3:
+            first_pages.extend(paths)
+    print(f"{name}: {', '.join(timings)}")
+    return first_pages
+
+
+def run_benchmark(audio_count):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory(prefix="iap_paging_bench_") as temp_dir:
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        populate(db, audio_count, rng)
+        now = time.time()
+        db.cursor.executemany(
+            "INSERT INTO audio_play_stats (audio_id, play_count, last_played) VALUES (?, ?, ?)",
+            [(audio_id, rng.randint(1, 20), now - rng.randint(0, 90 * 86400))
+             for audio_id in rng.sample(range(1, audio_count + 1), int(audio_count * PLAYED_FRACTION))])
+        db.conn.commit()
+
+        label_term = "a"
+        print(f"搜索 '{label_term}'：{db.count_audios(label_term, [])} 个匹配，每页 {RESULTS_PAGE_SIZE} 条")
+        legacy = walk_pages("每页重新计算排序键 (改造前)", lambda after: legacy_page(db, label_term, after))
+        current = walk_pages("物化排序结果后按位置分页",
+                             lambda after: db.search_audios_page(label_term, [], after),
+                             reset=db._search_cache.clear) # 不计页缓存，只计物化结果的复用
+        print(f"前三页结果一致: {legacy == current}")
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_AUDIO_COUNT)
@@ -0,0 +1,82 @@
+"""
+相似音频查询的基准测试：后台特征提取不断写入新批次时，对比每次查询前完整重建索引（改造前）与增量加入向量。
+
+用法:
+    python benchmarks/bench_similarity_query.py              # 默认 100,000 个特征向量
+    python benchmarks/bench_similarity_query.py 300000       # 指定向量数量（超过 IVF_THRESHOLD 时启用 IVF 分区）
+
+合成数据：随机特征向量（float16 存储，与真实数据相同）。每次查询之前先写入一批 FEATURE_WRITE_BATCH 个新向量，
+模拟用户在后台特征提取期间查找相似音频；查询文件的特征向量已在数据库中。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.bench_label_search import BenchDatabaseManager, percentile
+from core.audio_features import FEATURE_DIM, FEATURE_VERSION, pack_vector
+from core.similarity_index import FEATURE_WRITE_BATCH, SimilarityIndex, SimilaritySearch
+
+DEFAULT_VECTOR_COUNT = 100_000
+QUERY_COUNT = 50
+TARGET_MS = 50
+
+
+def random_vectors(rng, count):
+    return rng.normal(0, 1, size=(count, FEATURE_DIM)).astype(np.float32)
+
+
+def populate(db, vector_count, rng):
+    start = time.perf_counter()
+    paths = [f"D:\\素材库\\sim\\{i // 500:04d}\\{i:07d}.wav" for i in range(vector_count)]
+    for offset in range(0, vector_count, 10000):
+        chunk = paths[offset:offset + 10000]
+        db.save_audio_features([(path, pack_vector(vector)) for path, vector in zip(chunk, random_vectors(rng, len(chunk)))],
+                               FEATURE_VERSION)
+    print(f"生成 {vector_count} 个特征向量，耗时 {time.perf_counter() - start:.1f}s")
+    return paths
+
+
+def run_queries(name, search, rng, paths, before_query):
+    latencies = []
+    for i in range(QUERY_COUNT):
+        batch = [(f"D:\\素材库\\new\\{name}_{i:04d}_{j:02d}.wav", vector)
+                 for j, vector in enumerate(random_vectors(rng, FEATURE_WRITE_BATCH))]
+        search._store_batch(batch)
+        start = time.perf_counter()
+        before_query() # 计入查询耗时
+        results = search._query(paths[rng.integers(len(paths))], 50)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert len(results) == 50
+    print(f"{name}: p50 {percentile(latencies, 0.5):.1f}ms, p99 {percentile(latencies, 0.99):.1f}ms, "
+          f"最大 {max(latencies):.1f}ms（目标 < {TARGET_MS}ms）")
+
+
+def run_benchmark(vector_count):
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory(prefix="iap_similarity_bench_") as temp_dir:
+        db = BenchDatabaseManager(os.path.join(temp_dir, "bench.db"))
+        paths = populate(db, vector_count, rng)
+        search = SimilaritySearch(db, None)
+
+        start = time.perf_counter()
+        search._ensure_index()
+        print(f"首次构建索引: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        # 改造前：每批写入都标记索引过期，下一次查询先完整重建
+        legacy = SimilarityIndex()
+        legacy_search = SimilaritySearch(db, None)
+        legacy_search.index = legacy
+        run_queries("每次查询前重建 (改造前)", legacy_search, rng, paths,
+                    lambda: legacy.build(db.load_audio_features(FEATURE_VERSION)))
+        run_queries("增量加入新向量", search, rng, paths, lambda: None)
+        print(f"索引中共 {len(search.index)} 条向量，需要重建: {search.index.needs_rebuild()}")
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_VECTOR_COUNT)
@@ -0,0 +1,142 @@
+"""
+内嵌标签读取器的吞吐量基准测试。
+
+用法:
+    python benchmarks/bench_tag_reader.py                 # 生成合成样本并测试
+    python benchmarks/bench_tag_reader.py <音频目录>       # 测试真实素材库
+
+合成样本覆盖 ID3v2 (MP3)、FLAC、Ogg Vorbis、MP4、WAV (INFO + bext)、AIFF 和 ASF，
+每个文件带 1 MB 的伪音频数据，用于验证读取开销与文件大小无关。
+"""
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.tag_reader import read_tags, read_tags_bulk
+
+AUDIO_PAYLOAD = b"\x00" * (1024 * 1024)
+SAMPLES_PER_FORMAT = 400
+
+
+def _id3v2(title, artist, album, comment):
+    def frame(frame_id, payload):
+        return frame_id + struct.pack(">I", len(payload)) + b"\x00\x00" + payload
+    body = (frame(b"TIT2", b"\x03" + title.encode("utf-8")) +
+            frame(b"TPE1", b"\x03" + artist.encode("utf-8")) +
+            frame(b"TALB", b"\x03" + album.encode("utf-8")) +
+            frame(b"COMM", b"\x03eng\x00" + comment.encode("utf-8")) +
+            frame(b"APIC", b"\x00" * 200_000) + # 模拟封面图片，应被跳过
+            b"\x00" * 1024)
+    size = len(body)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x03\x00\x00" + syncsafe + body
+
+
+def _vorbis_comment(fields):
+    entries = [f"{k}={v}".encode("utf-8") for k, v in fields.items()]
+    data = struct.pack("<I", 6) + b"bench!" + struct.pack("<I", len(entries))
+    for entry in entries:
+        data += struct.pack("<I", len(entry)) + entry
+    return data
+
+
+def _ogg_page(packet, sequence):
+    segments = [255] * (len(packet) // 255) + [len(packet) % 255]
+    return (b"OggS\x00\x00" + b"\x00" * 8 + struct.pack("<II", 1, sequence) + b"\x00" * 4 +
+            bytes([len(segments)]) + bytes(segments) + packet)
+
+
+def _mp4_atom(atom_type, payload):
+    return struct.pack(">I", 8 + len(payload)) + atom_type + payload
+
+
+def _riff_chunk(chunk_id, payload, big_endian=False):
+    size = struct.pack(">I" if big_endian else "<I", len(payload))
+    return chunk_id + size + payload + (b"\x00" if len(payload) & 1 else b"")
+
+
+def build_samples(directory, count):
+    """生成各格式的合成样本文件，返回路径列表。"""
+    paths = []
+    for i in range(count):
+        fields = {"TITLE": f"Impact {i}", "ARTIST": "声音设计组", "ALBUM": "Cinematic Hits", "COMMENT": f"metal hit {i}"}
+
+        mp3 = _id3v2(fields["TITLE"], fields["ARTIST"], fields["ALBUM"], fields["COMMENT"]) + AUDIO_PAYLOAD
+
+        comment_block = _vorbis_comment(fields)
+        flac = (b"fLaC" + bytes([0]) + (34).to_bytes(3, "big") + b"\x00" * 34 +
+                bytes([0x84]) + len(comment_block).to_bytes(3, "big") + comment_block + AUDIO_PAYLOAD)
+
+        ogg = (_ogg_page(b"\x01vorbis" + b"\x00" * 23, 0) +
+               _ogg_page(b"\x03vorbis" + comment_block + b"\x01", 1) + AUDIO_PAYLOAD)
+
+        def ilst_item(atom_type, text):
+            return _mp4_atom(atom_type, _mp4_atom(b"data", struct.pack(">II", 1, 0) + text.encode("utf-8")))
+        ilst = _mp4_atom(b"ilst", ilst_item(b"\xa9nam", fields["TITLE"]) + ilst_item(b"\xa9ART", fields["ARTIST"]) +
+                         ilst_item(b"\xa9alb", fields["ALBUM"]) + ilst_item(b"\xa9cmt", fields["COMMENT"]))
+        moov = _mp4_atom(b"moov", _mp4_atom(b"trak", b"\x00" * 4096) +
+                         _mp4_atom(b"udta", _mp4_atom(b"meta", b"\x00" * 4 + ilst)))
+        mp4 = _mp4_atom(b"ftyp", b"M4A \x00\x00\x00\x00") + _mp4_atom(b"mdat", AUDIO_PAYLOAD) + moov
+
+        info = b"INFO" + b"".join(_riff_chunk(cid, text.encode("utf-8") + b"\x00") for cid, text in
+                                  ((b"INAM", fields["TITLE"]), (b"IART", fields["ARTIST"]),
+                                   (b"IPRD", fields["ALBUM"]), (b"ICMT", fields["COMMENT"])))
+        bext = f"BWF description {i}".encode("ascii").ljust(256, b"\x00") + b"\x00" * 346
+        riff_body = (b"WAVE" + _riff_chunk(b"fmt ", b"\x00" * 16) + _riff_chunk(b"data", AUDIO_PAYLOAD) +
+                     _riff_chunk(b"LIST", info) + _riff_chunk(b"bext", bext))
+        wav = b"RIFF" + struct.pack("<I", len(riff_body)) + riff_body
+
+        aiff_body = (b"AIFF" + _riff_chunk(b"SSND", AUDIO_PAYLOAD, True) +
+                     _riff_chunk(b"NAME", fields["TITLE"].encode("utf-8"), True))
+        aiff = b"FORM" + struct.pack(">I", len(aiff_body)) + aiff_body
+
+        def utf16(text):
+            return (text + "\x00").encode("utf-16-le")
+        strings = [utf16(fields["TITLE"]), utf16(fields["ARTIST"]), b"", utf16(fields["COMMENT"]), b""]
+        content = struct.pack("<5H", *(len(x) for x in strings)) + b"".join(strings)
+        content_object = bytes.fromhex("3326b2758e66cf11a6d900aa0062ce6c") + struct.pack("<Q", 24 + len(content)) + content
+        header_size = 30 + len(content_object)
+        asf = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c") + struct.pack("<QIH", header_size, 1, 0) + content_object + AUDIO_PAYLOAD
+
+        for ext, data in ((".mp3", mp3), (".flac", flac), (".ogg", ogg), (".m4a", mp4),
+                          (".wav", wav), (".aiff", aiff), (".wma", asf)):
+            path = os.path.join(directory, f"sample_{i}{ext}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def collect_audio_files(directory):
+    extensions = ('.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a', '.wma', '.aiff', '.opus')
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+    return paths
+
+
+def run_benchmark(paths):
+    start = time.perf_counter()
+    tagged = sum(1 for path in paths if read_tags(path))
+    sequential = time.perf_counter() - start
+    print(f"顺序读取: {len(paths)} 个文件, {tagged} 个含标签, {sequential:.2f}s, {len(paths) / sequential:.0f} 文件/秒")
+
+    start = time.perf_counter()
+    tagged = sum(1 for _path, tags, _props, _mtime in read_tags_bulk(paths) if tags)
+    parallel = time.perf_counter() - start
+    print(f"并行读取: {len(paths)} 个文件, {tagged} 个含标签, {parallel:.2f}s, {len(paths) / parallel:.0f} 文件/秒")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(collect_audio_files(sys.argv[1]))
+    else:
+        with tempfile.TemporaryDirectory(prefix="iap_tag_bench_") as temp_dir:
+            sample_paths = build_samples(temp_dir, SAMPLES_PER_FORMAT)
+            for sample in sample_paths[:7]:
+                print(os.path.basename(sample), read_tags(sample))
+            run_benchmark(sample_paths)
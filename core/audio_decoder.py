@@ -0,0 +1,161 @@
+import os
+import wave
+import tempfile
+import time
+
+from utils.logger_config import logger
+
+# NumPy 是可选依赖：缺失时所有基于解码的分析功能（相似度、指纹等）都会被禁用
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    logger.warning("未找到 numpy，音频分析相关功能将不可用。可通过 pip install numpy 安装。")
+
+# 分析统一使用的采样率与最大解码时长，足以覆盖音效和循环素材
+ANALYSIS_SAMPLE_RATE = 22050
+MAX_ANALYSIS_SECONDS = 30.0
+
+# VLC 转码等待的最长时间（秒），避免损坏的文件卡住后台线程
+VLC_DECODE_TIMEOUT = 20.0
+
+_vlc_instance = None # 每个进程独立的解码用 VLC 实例，懒加载
+
+
+def is_analysis_available():
+    """检查音频分析所需的依赖 (numpy) 是否可用。"""
+    return np is not None
+
+
+def _pcm_bytes_to_float(raw, sample_width):
+    """将 little-endian PCM 字节转换为 [-1, 1] 范围的 float32 数组。"""
+    if sample_width == 1:
+        data = np.frombuffer(raw, dtype=np.uint8).astype(np.float32)
+        return (data - 128.0) / 128.0
+    if sample_width == 2:
+        return np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    if sample_width == 3:
+        # 24 位 PCM：补齐为 32 位再转换
+        bytes_ = np.frombuffer(raw, dtype=np.uint8)
+        bytes_ = bytes_[:len(bytes_) - len(bytes_) % 3].reshape(-1, 3)
+        data = (bytes_[:, 0].astype(np.int32) |
+                (bytes_[:, 1].astype(np.int32) << 8) |
+                (bytes_[:, 2].astype(np.int32) << 16))
+        data = np.where(data & 0x800000, data - 0x1000000, data)
+        return data.astype(np.float32) / 8388608.0
+    if sample_width == 4:
+        return np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    raise ValueError(f"不支持的采样位宽: {sample_width}")
+
+
+def _resample_linear(samples, source_rate, target_rate):
+    """线性插值重采样。对特征提取而言精度足够，且无需额外依赖。"""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / float(source_rate)
+    target_length = int(duration * target_rate)
+    if target_length <= 1:
+        return samples[:0]
+    source_positions = np.arange(len(samples), dtype=np.float64)
+    target_positions = np.linspace(0, len(samples) - 1, target_length)
+    return np.interp(target_positions, source_positions, samples).astype(np.float32)
+
+
+def _read_wav(path, sample_rate, max_seconds):
+    """使用标准库 wave 读取 PCM WAV 文件，返回单声道 float32 数组。"""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        source_rate = wf.getframerate()
+        max_frames = int(source_rate * max_seconds) if max_seconds else wf.getnframes()
+        raw = wf.readframes(min(wf.getnframes(), max_frames))
+
+    samples = _pcm_bytes_to_float(raw, sample_width)
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return _resample_linear(samples, source_rate, sample_rate)
+
+
+def _get_vlc_instance():
+    """获取（或创建）当前进程专用的解码 VLC 实例。"""
+    global _vlc_instance
+    if _vlc_instance is None:
+        import vlc # 延迟导入，只有非 WAV 文件才需要 VLC
+        _vlc_instance = vlc.Instance("--no-video", "--quiet", "--no-sout-video")
+        if not _vlc_instance:
+            raise RuntimeError("解码用 VLC 实例创建失败。")
+    return _vlc_instance
+
+
+def _decode_with_vlc(path, sample_rate, max_seconds):
+    """
+    借助 VLC 将任意格式转码为单声道 16 位临时 WAV，再读取为 float32 数组。
+    转码不经过声卡，速度远快于实时播放。
+    """
+    import vlc
+    instance = _get_vlc_instance()
+
+    fd, temp_path = tempfile.mkstemp(suffix=".wav", prefix="iap_decode_")
+    os.close(fd)
+    player = None
+    try:
+        dst = temp_path.replace('\\', '/')
+        media = instance.media_new(path)
+        media.add_option(f":sout=#transcode{{acodec=s16l,channels=1,samplerate={sample_rate}}}"
+                         f":std{{access=file,mux=wav,dst='{dst}'}}")
+        media.add_option(":no-sout-all")
+        if max_seconds:
+            media.add_option(f":stop-time={max_seconds}")
+
+        player = instance.media_player_new()
+        player.set_media(media)
+        player.play()
+
+        deadline = time.time() + VLC_DECODE_TIMEOUT
+        finished_states = (vlc.State.Ended, vlc.State.Error, vlc.State.Stopped)
+        while time.time() < deadline:
+            if player.get_state() in finished_states:
+                break
+            time.sleep(0.02)
+        else:
+            logger.warning(f"VLC 解码超时: {path}")
+        player.stop()
+
+        if os.path.getsize(temp_path) <= 44:
+            logger.warning(f"VLC 未能解码音频: {path}")
+            return None
+        return _read_wav(temp_path, sample_rate, max_seconds)
+    finally:
+        if player is not None:
+            player.release()
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def decode_audio(path, sample_rate=ANALYSIS_SAMPLE_RATE, max_seconds=MAX_ANALYSIS_SECONDS):
+    """
+    将音频文件解码为单声道 float32 PCM。
+
+    Args:
+        path (str): 音频文件路径。
+        sample_rate (int): 目标采样率。
+        max_seconds (float): 最多解码的秒数，None 表示整首。
+
+    Returns:
+        numpy.ndarray | None: 解码后的采样；依赖缺失或解码失败时返回 None。
+    """
+    if np is None:
+        return None
+    try:
+        if path.lower().endswith('.wav'):
+            try:
+                return _read_wav(path, sample_rate, max_seconds)
+            except (wave.Error, EOFError, ValueError) as e:
+                # 非 PCM 编码（如 IEEE float、ADPCM）的 WAV 交给 VLC 处理
+                logger.debug(f"wave 模块无法读取 '{os.path.basename(path)}' ({e})，改用 VLC 解码。")
+        return _decode_with_vlc(path, sample_rate, max_seconds)
+    except Exception as e:
+        logger.error(f"解码音频失败: {path}, {e}", exc_info=True)
+        return None
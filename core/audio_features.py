@@ -0,0 +1,113 @@
+from core.audio_decoder import np, decode_audio, ANALYSIS_SAMPLE_RATE
+from utils.logger_config import logger
+
+# 特征向量定义。修改计算方式时递增 FEATURE_VERSION，旧向量会在后台自动重算。
+FEATURE_VERSION = 1
+N_FFT = 1024
+HOP_LENGTH = 512
+N_MELS = 40
+# 向量 = 每个 mel 频带对数能量的均值 + 标准差 + 一阶差分绝对值均值
+FEATURE_DIM = N_MELS * 3
+
+_mel_filterbank_cache = {}
+
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+
+def _mel_filterbank(sample_rate, n_fft, n_mels):
+    """构建 (n_mels, n_fft // 2 + 1) 的三角形 mel 滤波器组，按参数缓存。"""
+    key = (sample_rate, n_fft, n_mels)
+    if key in _mel_filterbank_cache:
+        return _mel_filterbank_cache[key]
+
+    n_bins = n_fft // 2 + 1
+    mel_points = np.linspace(_hz_to_mel(0.0), _hz_to_mel(sample_rate / 2.0), n_mels + 2)
+    bin_points = np.floor((n_fft + 1) * _mel_to_hz(mel_points) / sample_rate).astype(int)
+
+    filterbank = np.zeros((n_mels, n_bins), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bin_points[m - 1], bin_points[m], bin_points[m + 1]
+        center = max(center, left + 1)
+        right = max(right, center + 1)
+        for k in range(left, min(center, n_bins)):
+            filterbank[m - 1, k] = (k - left) / float(center - left)
+        for k in range(center, min(right, n_bins)):
+            filterbank[m - 1, k] = (right - k) / float(right - center)
+
+    _mel_filterbank_cache[key] = filterbank
+    return filterbank
+
+
+def power_spectrogram(samples, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    计算功率谱 (帧数, n_fft // 2 + 1)。
+    不足一帧的短音频会补零到一帧，保证每个文件都能得到特征。
+    """
+    if len(samples) < n_fft:
+        samples = np.pad(samples, (0, n_fft - len(samples)))
+    n_frames = 1 + (len(samples) - n_fft) // hop_length
+    # 利用 stride 生成帧视图，避免逐帧复制
+    frames = np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(n_frames, n_fft),
+        strides=(samples.strides[0] * hop_length, samples.strides[0]),
+        writeable=False,
+    )
+    window = np.hanning(n_fft).astype(np.float32)
+    spectrum = np.fft.rfft(frames * window, axis=1)
+    return (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+
+
+def log_mel_spectrogram(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """计算对数 mel 频谱 (帧数, N_MELS)。"""
+    power = power_spectrogram(samples)
+    mel = power @ _mel_filterbank(sample_rate, N_FFT, N_MELS).T
+    return np.log(mel + 1e-10)
+
+
+def compute_feature_vector(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """
+    由 PCM 采样计算紧凑的音色摘要向量 (FEATURE_DIM,)。
+
+    只使用有声部分的帧，避免首尾静音拉低均值。
+    """
+    log_mel = log_mel_spectrogram(samples, sample_rate)
+    frame_energy = log_mel.mean(axis=1)
+    voiced = log_mel[frame_energy > frame_energy.max() - 8.0] # 与最响帧相差约 35 dB 以内的帧
+    if len(voiced) == 0:
+        voiced = log_mel
+
+    mean = voiced.mean(axis=0)
+    std = voiced.std(axis=0)
+    delta = np.abs(np.diff(voiced, axis=0)).mean(axis=0) if len(voiced) > 1 else np.zeros(N_MELS, dtype=np.float32)
+    return np.concatenate([mean, std, delta]).astype(np.float32)
+
+
+def extract_features(path):
+    """解码文件并计算特征向量；失败时返回 None。"""
+    samples = decode_audio(path)
+    if samples is None or len(samples) == 0:
+        return None
+    try:
+        return compute_feature_vector(samples)
+    except Exception as e:
+        logger.error(f"计算音频特征失败: {path}, {e}", exc_info=True)
+        return None
+
+
+def pack_vector(vector):
+    """将特征向量打包为 little-endian float16 字节串，用于存入数据库。"""
+    return np.asarray(vector, dtype='<f2').tobytes()
+
+
+def unpack_vectors(blobs):
+    """将多个 float16 字节串批量解包为 (n, FEATURE_DIM) 的 float32 矩阵。"""
+    if not blobs:
+        return np.zeros((0, FEATURE_DIM), dtype=np.float32)
+    return np.frombuffer(b"".join(blobs), dtype='<f2').reshape(len(blobs), FEATURE_DIM).astype(np.float32)
@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import wx
+
+from core.audio_decoder import np, decode_audio, is_analysis_available
+from core.audio_features import power_spectrogram
+from utils.logger_config import logger
+
+# 指纹参数。修改算法时递增 FINGERPRINT_VERSION，旧指纹会在下次运行时重算。
+FINGERPRINT_VERSION = 1
+FINGERPRINT_SAMPLE_RATE = 11025
+FINGERPRINT_MAX_SECONDS = 120.0
+FP_N_FFT = 1024
+FP_HOP_LENGTH = 256
+PEAK_NEIGHBORHOOD_TIME = 10   # 峰值在 ±10 帧内必须是局部最大
+PEAK_NEIGHBORHOOD_FREQ = 12   # 峰值在 ±12 个频点内必须是局部最大
+PEAK_MIN_DB_ABOVE_MEDIAN = 10.0
+FAN_OUT = 8                   # 每个锚点最多与多少个后续峰值组成哈希
+TARGET_ZONE_FRAMES = 63       # 锚点与目标峰值的最大帧间隔 (6 位)
+
+# 两个文件被判定为重复所需的最少对齐哈希数，以及占较短文件哈希总数的最小比例
+MIN_ALIGNED_MATCHES = 20
+MIN_MATCH_RATIO = 0.1
+
+FINGERPRINT_WRITE_BATCH = 16
+
+
+def _sliding_max(values, radius, axis):
+    """沿指定轴计算半径为 radius 的滑动最大值（边缘用 -inf 填充）。"""
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, mode='constant', constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=axis)
+    return windows.max(axis=-1)
+
+
+def find_spectral_peaks(samples):
+    """
+    在对数频谱上寻找显著的局部峰值。
+
+    Returns:
+        numpy.ndarray: (n_peaks, 2) 的 [帧序号, 频点] 数组，按时间排序。
+    """
+    power = power_spectrogram(samples, FP_N_FFT, FP_HOP_LENGTH)[:, :512] # 丢弃奈奎斯特频点，频率正好占 9 位
+    spectrum_db = 10.0 * np.log10(power + 1e-10)
+    local_max = _sliding_max(_sliding_max(spectrum_db, PEAK_NEIGHBORHOOD_TIME, 0), PEAK_NEIGHBORHOOD_FREQ, 1)
+    threshold = np.median(spectrum_db) + PEAK_MIN_DB_ABOVE_MEDIAN
+    frames, bins = np.nonzero((spectrum_db == local_max) & (spectrum_db > threshold))
+    return np.stack([frames, bins], axis=1)
+
+
+def compute_fingerprint(samples):
+    """
+    由峰值星座图生成组合哈希。
+    每个哈希 = 锚点频率 (9 位) | 目标频率 (9 位) | 帧间隔 (6 位)，与绝对时间无关，
+    因此同一素材在不同格式/码率/起始偏移下仍能对齐匹配。
+
+    Returns:
+        list: [(hash, anchor_frame), ...]
+    """
+    peaks = find_spectral_peaks(samples)
+    hashes = []
+    n_peaks = len(peaks)
+    for i in range(n_peaks):
+        anchor_frame, anchor_bin = peaks[i]
+        paired = 0
+        for j in range(i + 1, n_peaks):
+            target_frame, target_bin = peaks[j]
+            dt = target_frame - anchor_frame
+            if dt == 0:
+                continue
+            if dt > TARGET_ZONE_FRAMES or paired >= FAN_OUT:
+                break
+            hashes.append(((int(anchor_bin) << 15) | (int(target_bin) << 6) | int(dt), int(anchor_frame)))
+            paired += 1
+    return hashes
+
+
+def fingerprint_file(path):
+    """
+    解码并计算单个文件的指纹。该函数在进程池的子进程中执行，必须可被 pickle 引用。
+
+    Returns:
+        tuple: (path, hashes)；解码失败时 hashes 为 None。
+    """
+    samples = decode_audio(path, FINGERPRINT_SAMPLE_RATE, FINGERPRINT_MAX_SECONDS)
+    if samples is None or len(samples) == 0:
+        return path, None
+    return path, compute_fingerprint(samples)
+
+
+class DuplicateDetector:
+    """
+    重复/近似重复音频检测服务。
+    指纹由进程池并行计算，结果由协调线程按批写入数据库；已完成的文件会被记录，中断后可增量续算。
+    """
+    def __init__(self, db_manager, max_workers=None):
+        self.db_manager = db_manager
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._stop_event = threading.Event()
+        self._coordinator_thread = None
+
+    def is_running(self):
+        return bool(self._coordinator_thread and self._coordinator_thread.is_alive())
+
+    def start_fingerprinting(self, on_finished=None):
+        """为尚未计算指纹的音频启动后台并行指纹计算。"""
+        if not is_analysis_available():
+            logger.warning("numpy 不可用，跳过音频指纹计算。")
+            return False
+        if self.is_running():
+            logger.info("指纹计算已在进行中。")
+            return True
+        self._stop_event.clear()
+        self._coordinator_thread = threading.Thread(target=self._coordinator_loop, args=(on_finished,), daemon=True)
+        self._coordinator_thread.start()
+        return True
+
+    def stop(self):
+        """请求停止指纹计算；已提交的任务完成后线程退出，已写入的结果保留以便续算。"""
+        self._stop_event.set()
+        if self._coordinator_thread and self._coordinator_thread.is_alive():
+            self._coordinator_thread.join(timeout=2.0)
+
+    def _coordinator_loop(self, on_finished):
+        pending = [path for _audio_id, path in self.db_manager.get_audios_without_fingerprint(FINGERPRINT_VERSION)
+                   if os.path.exists(path)]
+        if not pending:
+            logger.info("所有音频的指纹均已是最新。")
+            self._report_clusters(on_finished)
+            return
+        logger.info(f"后台指纹计算已启动: {len(pending)} 个文件，{self.max_workers} 个进程。")
+        start_time = time.time()
+        processed = 0
+        batch = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(fingerprint_file, path) for path in pending]
+                for future in as_completed(futures):
+                    if self._stop_event.is_set():
+                        for f in futures:
+                            f.cancel()
+                        break
+                    try:
+                        path, hashes = future.result()
+                    except Exception as e:
+                        logger.error(f"指纹子进程执行失败: {e}", exc_info=True)
+                        continue
+                    # 解码失败的文件也记录（空指纹），避免每次启动都重试
+                    batch.append((path, hashes or []))
+                    processed += 1
+                    if len(batch) >= FINGERPRINT_WRITE_BATCH:
+                        self.db_manager.save_fingerprints(batch, FINGERPRINT_VERSION)
+                        batch = []
+        except Exception as e:
+            logger.error(f"指纹计算进程池发生错误: {e}", exc_info=True)
+        if batch:
+            self.db_manager.save_fingerprints(batch, FINGERPRINT_VERSION)
+        elapsed = time.time() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        logger.info(f"指纹计算结束: {processed}/{len(pending)} 个文件，耗时 {elapsed:.1f}s ({rate:.1f} 文件/秒)。")
+        self._report_clusters(on_finished)
+
+    def _report_clusters(self, on_finished):
+        """在协调线程中分批查找重复组（不占用界面的数据库读线程），完成后在主线程调用 on_finished(clusters)。"""
+        if not on_finished or self._stop_event.is_set():
+            return
+        clusters = self.get_duplicate_clusters()
+        if clusters is not None:
+            wx.CallAfter(on_finished, clusters)
+
+    def get_duplicate_clusters(self):
+        """
+        通过倒排哈希表分批找到时间对齐的候选对（见 DatabaseManager.find_fingerprint_matches），再用并查集合并为重复组。
+
+        Returns:
+            list | None: [[path, ...], ...]，每组至少两个文件，组内按路径排序；调用 stop() 中止时返回 None。
+        """
+        pairs = []
+        after_id = 0
+        while after_id is not None:
+            if self._stop_event.is_set():
+                return None
+            batch_pairs, after_id = self.db_manager.find_fingerprint_matches(MIN_ALIGNED_MATCHES, MIN_MATCH_RATIO, after_id)
+            pairs.extend(batch_pairs)
+        parent = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for path_a, path_b in pairs:
+            root_a, root_b = find(path_a), find(path_b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        clusters = {}
+        for path in parent:
+            clusters.setdefault(find(path), []).append(path)
+        result = sorted((sorted(members) for members in clusters.values() if len(members) > 1),
+                        key=lambda members: (-len(members), members[0]))
+        logger.info(f"检测到 {len(result)} 组重复音频。")
+        return result
@@ -35,6 +35,10 @@ audio_command_queue = queue.Queue()
 
 # 用于主窗口的引用，以便在其他线程中更新 GUI
 _main_frame_ref = None
+# 试听历史记录器（core.play_history.PlayHistoryRecorder），开始播放时记录，只做内存操作
+_play_recorder = None
+# 用户操作回调（如 core.db_maintenance.MaintenanceScheduler.note_activity），音频线程每收到一条命令调用一次
+_activity_listener = None
 
 # --- 硬编码 VLC 的安装路径 ---
 # 请根据你的实际安装路径修改此变量，指向 VLC 的安装目录，例如 C:\Program Files\VideoLAN\VLC
@@ -46,6 +50,17 @@ def set_frame_reference(frame):
     _main_frame_ref = frame
     logger.debug("audio_manager: 主窗口引用已设置。")
 
+def set_play_recorder(recorder):
+    """设置试听历史记录器；为 None 时不记录。"""
+    global _play_recorder
+    _play_recorder = recorder
+    logger.debug("audio_manager: 试听历史记录器已设置。")
+
+def set_activity_listener(listener):
+    """设置用户操作回调（选中文件、播放控制都会产生音频命令）；为 None 时不通知。"""
+    global _activity_listener
+    _activity_listener = listener
+
 def is_audio_system_initialized():
     """检查音频系统是否已初始化。"""
     return _audio_system_initialized
@@ -64,6 +79,8 @@ def _vlc_playback_thread():
         try:
             command, arg = audio_command_queue.get(timeout=0.1) # 短暂超时，以便线程可以被终止
             logger.debug(f"音频线程收到命令: {command}, 参数: {arg}")
+            if _activity_listener:
+                _activity_listener()
 
             if command == "play":
                 if _vlc_player:
@@ -73,6 +90,8 @@ def _vlc_playback_thread():
                     _vlc_player.play()
                     _playback_status = PLAYBACK_STATUS_PLAYING
                     _last_played_file_path = arg
+                    if _play_recorder:
+                        _play_recorder.record(arg)
                     # 尝试获取媒体时长
                     media.parse() # 解析媒体信息
                     # 等待媒体解析完成并获取时长
@@ -133,6 +152,8 @@ def _vlc_playback_thread():
                         _vlc_player.set_media(media)
                         _vlc_player.play()
                         _playback_status = PLAYBACK_STATUS_PLAYING
+                        if _play_recorder:
+                            _play_recorder.record(_last_played_file_path)
                         logger.info(f"重新播放上次媒体: {_last_played_file_path}")
                         if _main_frame_ref:
                             wx.CallAfter(_main_frame_ref.update_status_message, f"正在播放: {os.path.basename(_last_played_file_path)}")
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from core.content_hash import full_hash, partial_hash, stat_file
+from utils.logger_config import logger
+
+PROGRESS_LOG_INTERVAL = 5.0 # 秒
+
+# 核对统计：checked 为检查的音频数，missing 为当前缺失的数量（其中 newly_missing 个是本次新发现的），
+# restored 为重新出现的文件，relinked 为重新链接到移动后位置的记录，hashed 为计算内容哈希的文件数
+ReconcileStats = namedtuple('ReconcileStats', ['checked', 'missing', 'newly_missing', 'restored', 'relinked',
+                                               'hashed', 'elapsed'])
+
+
+class AudioReconciler:
+    """
+    后台核对数据库中的音频记录与磁盘上的文件：
+    按批并行检查文件是否存在并标记缺失的记录；对缺失的记录，用一次连接查询找出大小相同的新入库文件，
+    再比较部分内容哈希（或文件名），把标签等数据重新链接到移动后的位置。
+    打过标签的文件在存在时计算并记录部分哈希，文件被移走后才能据此识别。
+    """
+    def __init__(self, db_manager, max_workers=8):
+        self.db_manager = db_manager
+        self.max_workers = max_workers
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, on_finished=None):
+        """在后台线程中核对；on_finished(stats) 在后台线程中调用（界面代码需自行使用 wx.CallAfter）。"""
+        if self.is_running():
+            logger.info("音频记录核对已在进行中。")
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_finished,), daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _run(self, on_finished):
+        stats = self.reconcile()
+        if on_finished and not self._stop_event.is_set():
+            on_finished(stats)
+
+    def reconcile(self):
+        """
+        核对所有音频记录（在调用线程中执行）。
+
+        Returns:
+            ReconcileStats
+        """
+        start_time = time.time()
+        checked = missing = newly_missing = restored = hashed = 0
+        last_progress = start_time
+        after_id = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop_event.is_set():
+                rows = self.db_manager.get_audio_file_states(after_id)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                file_stats = list(executor.map(stat_file, [row[1] for row in rows]))
+
+                present = []
+                missing_ids = []
+                hash_jobs = []
+                for (audio_id, path, file_size, mtime_ns, old_hash, missing_since, first_seen, labelled), stat in zip(rows, file_stats):
+                    if stat is None:
+                        missing_ids.append(audio_id)
+                        if missing_since is None:
+                            newly_missing += 1
+                        continue
+                    if missing_since is not None:
+                        restored += 1
+                    unchanged = first_seen is not None and (file_size, mtime_ns) == stat
+                    needs_hash = labelled and (not unchanged or old_hash is None)
+                    if unchanged and missing_since is None and not needs_hash:
+                        continue # 状态没有变化，不必写回
+                    if needs_hash:
+                        hash_jobs.append((len(present), path, stat[0]))
+                    present.append([audio_id, stat[0], stat[1], old_hash if unchanged else None])
+                for (index, _path, _size), digest in zip(hash_jobs, executor.map(
+                        lambda job: partial_hash(job[1], job[2]), hash_jobs)):
+                    present[index][3] = digest
+                hashed += len(hash_jobs)
+                self.db_manager.save_audio_file_states(present, missing_ids, start_time)
+                checked += len(rows)
+                missing += len(missing_ids)
+                if time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                    last_progress = time.time()
+                    logger.info(f"音频记录核对中: 已检查 {checked} 个，缺失 {missing} 个，计算哈希 {hashed} 个。")
+
+            relinked = 0
+            if not self._stop_event.is_set():
+                relinked, candidate_hashes = self._relink_moved(executor, start_time)
+                hashed += candidate_hashes
+
+        elapsed = time.time() - start_time
+        rate = checked / elapsed if elapsed > 0 else 0.0
+        logger.info(f"音频记录核对{'已中断' if self._stop_event.is_set() else '完成'}: 检查 {checked} 个 ({rate:.0f} 个/秒)，"
+                    f"缺失 {missing} 个（新发现 {newly_missing} 个），重新出现 {restored} 个，重新链接 {relinked} 个，"
+                    f"计算内容哈希 {hashed} 个，耗时 {elapsed:.2f}s。")
+        return ReconcileStats(checked, missing - relinked, newly_missing, restored, relinked, hashed, elapsed)
+
+    def _relink_moved(self, executor, seen_since):
+        """
+        为缺失的记录匹配本次新出现的文件：大小相同，且部分哈希相同（缺失记录没有哈希时要求文件名相同）；
+        缺失记录有完整哈希时（查找完全相同的文件时计算过），还要求完整内容相同。
+        一个缺失记录只有唯一匹配时才重新链接；多个候选时优先选择文件名相同的。
+
+        Returns:
+            tuple: (重新链接的数量, 为候选文件计算哈希的数量)
+        """
+        candidates = self.db_manager.find_moved_audio_candidates(seen_since)
+        if not candidates:
+            return 0, 0
+        hash_paths = {found_id: found_path for _missing_id, _missing_name, missing_hash, _missing_full, found_id, found_path, _found_name
+                      in candidates if missing_hash}
+        found_hashes = dict(zip(hash_paths, executor.map(
+            lambda path: partial_hash(path, os.path.getsize(path)) if os.path.exists(path) else None, hash_paths.values())))
+        # 部分哈希相同时再比较完整哈希（部分哈希已覆盖全部内容的小文件，full_hash 只读取首尾内容）
+        full_paths = {found_id: found_path for _missing_id, _missing_name, missing_hash, missing_full, found_id, found_path, _found_name
+                      in candidates if missing_full and found_hashes.get(found_id) == missing_hash}
+        found_full_hashes = dict(zip(full_paths, executor.map(
+            lambda path: full_hash(path, os.path.getsize(path)) if os.path.exists(path) else None, full_paths.values())))
+
+        matches = {}
+        for missing_id, missing_name, missing_hash, missing_full, found_id, _found_path, found_name in candidates:
+            if missing_hash:
+                if found_hashes.get(found_id) != missing_hash:
+                    continue
+                if missing_full and found_full_hashes.get(found_id) != missing_full:
+                    continue
+            elif found_name != missing_name:
+                continue
+            matches.setdefault(missing_id, []).append((found_name != missing_name, found_id))
+
+        pairs = []
+        used = set()
+        for missing_id, options in matches.items():
+            options = [option for option in sorted(options) if option[1] not in used]
+            # 无法唯一确定（例如同一文件被复制到多处）时不做猜测
+            if not options or (len(options) > 1 and options[0][0] == options[1][0]):
+                continue
+            used.add(options[0][1])
+            pairs.append((missing_id, options[0][1]))
+        if not pairs:
+            return 0, len(found_hashes) + len(found_full_hashes)
+        return max(self.db_manager.relink_moved_audios(pairs), 0), len(found_hashes) + len(found_full_hashes)
+
+
+if __name__ == '__main__':
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.audio_reconciler 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_manager = DatabaseManager()
+    stats = AudioReconciler(db_manager).reconcile()
+    print(stats)
+    db_manager.close_connection()
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger_config import logger
+
+# 部分内容哈希读取文件开头和结尾各这么多字节（连同文件大小），足以区分同样大小的不同音频
+PARTIAL_HASH_BYTES = 64 * 1024
+# 完整内容哈希每次读取的字节数：流式计算，内存占用与文件大小无关
+HASH_READ_BYTES = 1024 * 1024
+PROGRESS_LOG_INTERVAL = 5.0 # 秒
+
+# 查找统计：partial_hashed / full_hashed 为本次计算部分哈希 / 完整哈希的文件数，
+# groups 为完全相同的文件组数，redundant_files / redundant_bytes 为多余副本的数量和占用空间
+ContentHashStats = namedtuple('ContentHashStats', ['partial_hashed', 'full_hashed', 'groups', 'redundant_files',
+                                                   'redundant_bytes', 'elapsed'])
+
+
+def stat_file(path):
+    """Returns: (file_size, mtime_ns)；文件不存在或无法访问时返回 None。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def partial_hash(path, file_size):
+    """
+    计算文件的部分内容哈希：文件大小 + 开头与结尾各 PARTIAL_HASH_BYTES 字节。
+
+    Returns:
+        str | None: 十六进制摘要；读取失败时返回 None。
+    """
+    digest = hashlib.blake2b(str(file_size).encode('ascii'), digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+            if file_size > PARTIAL_HASH_BYTES:
+                f.seek(max(PARTIAL_HASH_BYTES, file_size - PARTIAL_HASH_BYTES))
+                digest.update(f.read(PARTIAL_HASH_BYTES))
+    except OSError as e:
+        logger.debug(f"计算部分哈希失败: {path} ({e})")
+        return None
+    return digest.hexdigest()
+
+
+def covers_whole_file(file_size):
+    """部分哈希是否已经读取了文件的全部内容（此时部分哈希就是完整哈希）。"""
+    return file_size <= 2 * PARTIAL_HASH_BYTES
+
+
+def full_hash(path, file_size):
+    """
+    计算文件的完整内容哈希，按 HASH_READ_BYTES 分块流式读取。
+    部分哈希已覆盖全部内容的小文件直接返回部分哈希，同一文件的完整哈希因此总是唯一的。
+
+    Returns:
+        str | None: 十六进制摘要；读取失败时返回 None。
+    """
+    if covers_whole_file(file_size):
+        return partial_hash(path, file_size)
+    digest = hashlib.blake2b(str(file_size).encode('ascii'), digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_READ_BYTES), b''):
+                digest.update(chunk)
+    except OSError as e:
+        logger.debug(f"计算完整哈希失败: {path} ({e})")
+        return None
+    return digest.hexdigest()
+
+
+class ExactDuplicateFinder:
+    """
+    查找字节完全相同的音频文件，尽量不读取整个文件：
+    先用后台核对记录的文件大小分组（只在数据库中完成），只为大小相同的文件计算首尾内容的部分哈希，
+    再只为大小和部分哈希都相同的文件流式计算完整哈希。哈希在线程池中并行计算，结果保存在 audio_files 表中，
+    文件没有变化时不会重新计算。
+
+    依赖后台核对（core.audio_reconciler）记录的文件大小和修改时间；从未核对过的音频不参与比较。
+    """
+    def __init__(self, db_manager, max_workers=4):
+        self.db_manager = db_manager
+        self.max_workers = max_workers
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, on_finished=None):
+        """在后台线程中查找；on_finished(stats) 在后台线程中调用（界面代码需自行使用 wx.CallAfter）。"""
+        if self.is_running():
+            logger.info("完全相同文件的查找已在进行中。")
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_finished,), daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _run(self, on_finished):
+        stats = self.find()
+        if on_finished and not self._stop_event.is_set():
+            on_finished(stats)
+
+    def find(self):
+        """
+        为需要的文件补算哈希并统计完全相同的文件（在调用线程中执行）。
+
+        Returns:
+            ContentHashStats
+        """
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            partial_hashed = self._hash_stage('partial', executor)
+            full_hashed = self._hash_stage('full', executor) if not self._stop_event.is_set() else 0
+        report = self.db_manager.get_duplicate_storage_report()
+        elapsed = time.time() - start_time
+        logger.info(f"完全相同文件的查找{'已中断' if self._stop_event.is_set() else '完成'}: "
+                    f"计算部分哈希 {partial_hashed} 个、完整哈希 {full_hashed} 个；发现 {report['groups']} 组，"
+                    f"多余副本 {report['redundant_files']} 个，共 {report['redundant_bytes'] / 1024 / 1024:.1f} MB，"
+                    f"耗时 {elapsed:.2f}s。")
+        return ContentHashStats(partial_hashed, full_hashed, report['groups'], report['redundant_files'],
+                                report['redundant_bytes'], elapsed)
+
+    def _hash_stage(self, stage, executor):
+        """分页读取 stage（'partial' 或 'full'）阶段待计算的文件，并行计算哈希并写回。Returns: 写入的哈希数量。"""
+        hashed = 0
+        after_id = 0
+        last_progress = time.time()
+        while not self._stop_event.is_set():
+            rows = self.db_manager.get_content_hash_jobs(stage, after_id)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            digests = executor.map(lambda row: self._hash_file(stage, *row[1:]), rows)
+            results = [(audio_id, file_size, mtime_ns, digest)
+                       for (audio_id, _path, file_size, mtime_ns, _partial), digest in zip(rows, digests) if digest]
+            if results and self.db_manager.save_content_hashes(stage, results):
+                hashed += len(results)
+            if time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                last_progress = time.time()
+                logger.info(f"正在计算{'部分' if stage == 'partial' else '完整'}哈希: 已完成 {hashed} 个。")
+        return hashed
+
+    def _hash_file(self, stage, path, file_size, mtime_ns, known_partial_hash):
+        if self._stop_event.is_set():
+            return None
+        if stage == 'full' and covers_whole_file(file_size):
+            return known_partial_hash # 部分哈希已覆盖全部内容，不必再读文件
+        if stat_file(path) != (file_size, mtime_ns):
+            return None # 核对之后文件有变化，留给下次核对更新大小后再计算
+        return partial_hash(path, file_size) if stage == 'partial' else full_hash(path, file_size)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import core.database_manager
+    from core.audio_reconciler import AudioReconciler
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.content_hash 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="查找素材库中字节完全相同的音频文件（无需启动界面）。")
+    parser.add_argument("--share-labels", action="store_true", help="在每组完全相同的文件内同步标签")
+    parser.add_argument("--limit", type=int, default=20, help="最多列出多少组（按可节省的空间排序）")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    AudioReconciler(db_manager).reconcile() # 先更新文件大小和修改时间
+    stats = ExactDuplicateFinder(db_manager).find()
+    groups = db_manager.get_exact_duplicate_groups()
+    for file_size, paths in groups[:args.limit]:
+        print(f"{len(paths)} 份 × {file_size / 1024 / 1024:.2f} MB")
+        for path in paths:
+            print(f"    {path}")
+    print(f"共 {stats.groups} 组，多余副本 {stats.redundant_files} 个，可节省 {stats.redundant_bytes / 1024 / 1024:.1f} MB；"
+          f"计算部分哈希 {stats.partial_hashed} 个、完整哈希 {stats.full_hashed} 个，耗时 {stats.elapsed:.2f}s")
+    if args.share_labels:
+        added = sum(max(db_manager.share_labels_among(paths), 0) for _file_size, paths in groups)
+        print(f"已在 {len(groups)} 组内同步标签，新增 {added} 条标签关联。")
+    db_manager.close_connection()
@@ -2,6 +2,16 @@ import os
 import sqlite3
 import sys
 import atexit
+import functools
+import threading
+import time
+from array import array
+from collections import deque
+from core.fuzzy_match import trigrams, max_typo_distance, select_probe_trigrams, rank_candidates
+from core.label_trie import LabelTrie
+from core.label_snapshot import LabelSnapshot, SNAPSHOT_FILE, write_snapshot
+from core.label_query import Term, And, Or, Not, is_boolean_query, parse_label_query
+from core.query_cache import GenerationalLRUCache, is_missing
 from utils.logger_config import logger
 
 # 获取程序运行目录
@@ -15,15 +25,311 @@ else:
 DEFAULT_DB_FILE = "audio_labels.db"
 DB_CONFIG_FILE = "db_path.dat" # 存储数据库路径的配置文件
 
+BUSY_TIMEOUT_SECONDS = 30.0   # 其他进程持有写锁时的等待时间（网络磁盘上的数据库可能较慢）
+SLOW_QUERY_SECONDS = 0.5      # 超过该耗时的调用记录警告日志
+LATENCY_SAMPLE_SIZE = 512     # 每个调用保留最近多少个耗时样本用于计算分位数
+FUZZY_CANDIDATE_LIMIT = 200   # 容错匹配时最多对多少个 trigram 候选计算编辑距离
+RESULTS_PAGE_SIZE = 200       # 搜索结果分页查询的默认每页条数
+LABEL_BROWSE_PAGE_SIZE = 200  # 按使用次数浏览标签时每页的条数
+PLAY_HISTORY_LIMIT = 200      # "最近播放"、"最常播放"列表的默认条数
+# 搜索结果排序中，每多播放一次相当于最近播放时间提前多少秒（最多计 PLAY_COUNT_BOOST_CAP 次）
+PLAY_COUNT_BOOST_SECONDS = 86400
+PLAY_COUNT_BOOST_CAP = 30
+RECONCILE_PAGE_SIZE = 5000    # 后台核对每批读取的音频数量
+CONTENT_HASH_PAGE_SIZE = 2000 # 查找完全相同的文件时每批读取的待哈希文件数量
+BOOLEAN_ESTIMATE_CAP = 10000  # 估算布尔查询各搜索词的匹配数时最多计数到该值
+LABEL_CACHE_SIZE = 4096       # 缓存多少个音频的标签列表
+SEARCH_CACHE_SIZE = 256       # 缓存多少个搜索结果（计数、分页、完整结果各算一条）
+RANKED_IDS_CACHE_SIZE = 8     # 分页搜索保留多少次搜索的完整排序结果（每个匹配 8 字节）
+SEARCH_CACHE_MAX_RESULTS = 5000 # 结果多于该数量的搜索不缓存，避免宽泛搜索占用大量内存
+# 播放记录只影响搜索结果的排序：缓存的搜索结果最多按这么多秒之前的播放统计排序，之后的第一次查询重新执行
+PLAY_RANKING_MAX_STALENESS_SECONDS = 300.0
+SQL_VARIABLE_CHUNK = 500      # IN (...) 列表每批的参数个数
+BATCH_LABEL_CHUNK = 5000      # 批量编辑标签时每块处理的音频数量（每块之后报告一次进度）
+EXPORT_FETCH_SIZE = 10000     # 导出标签时每次从游标读取的行数
+FINGERPRINT_MATCH_BATCH = 200 # 查找指纹匹配时每次查询处理的源音频数量
+FINGERPRINT_PROBE_HASHES = 100 # 每个源音频只用倒排表最短（最有区分度）的这么多个哈希查找候选
+FINGERPRINT_CANDIDATE_MATCHES = 4 # 探测哈希中至少有这么多个时间对齐的命中才成为候选，再用全部哈希核对
+# 倒排表长于该值的哈希视为"停用哈希"（静音、底噪等常见频率组合），不用于查找候选
+FINGERPRINT_STOP_HASH_POSTINGS = 1000
+BULK_IMPORT_CACHE_KIB = 256 * 1024 # 批量导入标签时连接使用的页缓存大小，减少索引随机插入造成的磁盘读写
+MAINTENANCE_ANALYSIS_LIMIT = 400   # PRAGMA optimize 运行 ANALYZE 时每个索引最多检查的行数（近似统计，耗时有上限）
+FTS_MERGE_PAGES = 500              # 每次全文索引合并最多写入的页数
+INCREMENTAL_VACUUM_PAGES = 256     # 每次增量清理最多释放的空闲页数
+
+# 按完整路径查找音频：目录通过 directories.path 唯一索引解析，文件名通过 (directory_id, name) 唯一索引查找
+_AUDIO_BY_PATH_SQL = "a.directory_id = (SELECT id FROM directories WHERE path = ?) AND a.name = ?"
+
+
+class QueryMetrics:
+    """按方法名统计数据库调用耗时（次数、平均、P95、最大值），线程安全。"""
+    def __init__(self, sample_size=LATENCY_SAMPLE_SIZE):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self._stats = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                             'samples': deque(maxlen=self._sample_size)}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['samples'].append(seconds)
+        if seconds >= SLOW_QUERY_SECONDS:
+            logger.warning(f"慢数据库调用: {name} 耗时 {seconds * 1000:.0f}ms")
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {name: {'count', 'mean_ms', 'p95_ms', 'max_ms'}}
+        """
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                samples = sorted(stats['samples'])
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+                result[name] = {
+                    'count': stats['count'],
+                    'mean_ms': stats['total'] / stats['count'] * 1000,
+                    'p95_ms': p95 * 1000,
+                    'max_ms': stats['max'] * 1000,
+                }
+            return result
+
+    def log_summary(self):
+        for name, stats in sorted(self.snapshot().items()):
+            logger.info(f"数据库调用统计 {name}: {stats['count']} 次, 平均 {stats['mean_ms']:.1f}ms, "
+                        f"P95 {stats['p95_ms']:.1f}ms, 最大 {stats['max_ms']:.1f}ms")
+
+
+def _timed(func):
+    """记录读操作的耗时。"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.query_metrics.record(func.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def _serialized_write(func=None, *, generation='search_generation'):
+    """
+    写操作在进程内串行执行（WAL 模式下同一时刻只能有一个写事务），并记录耗时。
+    确实修改了数据时递增 write_generation（空闲维护据此判断有没有新写入），以及 generation 指定的代数：
+    默认的 search_generation 使缓存的搜索结果失效；record_plays 只递增 play_generation（见 _search_cache_generation）；
+    不影响搜索结果的写入（特征向量、指纹、文件状态、内容哈希）传 None。
+    标签缓存另外跟随 label_index_state 中的持久标签写代数：写入后该代数变化了才递增 label_generation，
+    因此只有标签、标签关联与路径的修改会使标签缓存失效（没有新数据的后台批次不影响任何缓存）。
+    _ensure_audio_ids 新建了音频时（新文件会出现在文件名搜索中）总是递增 search_generation。
+    所有代数都在方法返回（事务已提交）之后才递增：提交前开始的查询只会以旧代数写入缓存。
+    """
+    if func is None:
+        return functools.partial(_serialized_write, generation=generation)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        with self._write_lock:
+            state = self._thread_state()
+            changes_before = state.conn.total_changes
+            outer_inserted_audios = getattr(state, 'inserted_audios', False)
+            state.inserted_audios = False
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                inserted_audios = state.inserted_audios
+                state.inserted_audios = outer_inserted_audios or inserted_audios
+                if state.conn.total_changes != changes_before:
+                    self.write_generation += 1
+                    if generation:
+                        setattr(self, generation, getattr(self, generation) + 1)
+                    if inserted_audios and generation != 'search_generation':
+                        self.search_generation += 1
+                    self._sync_label_generation()
+                self.query_metrics.record(func.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def _split_path(path):
+    """将路径拆分为 (目录, 文件名)；目录保留末尾的分隔符，同时识别 / 与 \\。"""
+    index = max(path.rfind('/'), path.rfind('\\'))
+    return path[:index + 1], path[index + 1:]
+
+
+def _parent_directory(directory):
+    """返回目录（以分隔符结尾）的上级目录；已是根目录（如 "D:\\"、"/"）时返回 None。"""
+    if len(directory) <= 1:
+        return None
+    return _split_path(directory[:-1])[0] or None
+
+
+def _directory_range(directory):
+    """
+    返回目录子树在 directories.path 上的索引范围 [low, high)：子树中所有目录都以 directory 为前缀。
+    directory 末尾没有分隔符时自动补上，避免 "D:\\sfx" 匹配到 "D:\\sfx2"。
+    """
+    if not directory.endswith(('/', '\\')):
+        directory += '\\' if '\\' in directory else '/'
+    return directory, directory[:-1] + chr(ord(directory[-1]) + 1)
+
+
+def _normalize_search_term(label_term):
+    """搜索词的缓存键：合并空白；普通搜索不区分大小写，布尔查询的运算符区分大小写，保持原样。"""
+    term = " ".join((label_term or "").split())
+    return term if is_boolean_query(term) else term.lower()
+
+
+def _path_key(audio_path):
+    return (audio_path,)
+
+
+def _escape_like(text):
+    """转义 LIKE 模式中的通配符（配合 ESCAPE '\\' 使用）。"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search_key(label_term, filters=(), *args, **kwargs):
+    return (_normalize_search_term(label_term), tuple(filters)) + args + tuple(sorted(kwargs.items()))
+
+
+def _cached(cache_attr, make_key, generation_getter):
+    """
+    读方法的结果缓存：以 (方法名, make_key(参数)) 为键，generation_getter 指定的方法返回的代数变化后自动失效。
+    查询失败（方法内调用了 _mark_query_failed）或结果过大时不缓存。返回值与缓存共享，调用方不应修改。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, cache_attr)
+            key = (func.__name__,) + make_key(*args, **kwargs)
+            generation = getattr(self, generation_getter)()
+            value = cache.get(key, generation)
+            if not is_missing(value):
+                return value
+            state = self._thread_state()
+            state.query_failed = False
+            value = func(self, *args, **kwargs)
+            results = value[0] if isinstance(value, tuple) else value
+            if not state.query_failed and (not isinstance(results, list) or len(results) <= SEARCH_CACHE_MAX_RESULTS):
+                cache.put(key, value, generation)
+            return value
+        return wrapper
+    return decorator
+
+
 class DatabaseManager:
+    """
+    音频标签数据库。每个线程使用各自的连接（WAL 模式下读写互不阻塞），
+    写操作由进程内的写锁串行化；界面线程应通过 core.db_worker.DatabaseWorker 异步调用。
+    """
     def __init__(self):
         self.db_path = self._get_database_path()
-        self.conn = None
-        self.cursor = None
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._closed = False
+        self._fts_tokenizers = {} # 全文索引表名 -> 实际使用的分词器
+        self._label_trie = None # 标签自动补全索引，首次使用时加载（见 get_label_trie）
+        self._label_trie_lock = threading.Lock()
+        self._label_snapshot = None # 映射到内存的标签快照，首次使用时打开（见 _fresh_label_snapshot）
+        self._label_snapshot_lock = threading.RLock()
+        self.query_metrics = QueryMetrics()
+        # 查询缓存：写事务提交后按修改的内容递增相应的代数，旧代数的缓存条目随之失效（见 _serialized_write）
+        self.write_generation = 0  # 任意写入
+        self.search_generation = 0 # 可能改变搜索结果的写入
+        self.play_generation = 0   # 播放记录
+        self.label_generation = 0  # 标签、标签关联与路径的修改（跟随 label_index_state）
+        self._ranked_play_generation = 0 # 搜索缓存当前使用的播放代数
+        self._ranked_play_time = time.monotonic()
+        self._persistent_label_generation = None
+        self._label_cache = GenerationalLRUCache("音频标签", LABEL_CACHE_SIZE)
+        self._search_cache = GenerationalLRUCache("搜索结果", SEARCH_CACHE_SIZE)
+        self._ranked_ids_cache = GenerationalLRUCache("分页排序结果", RANKED_IDS_CACHE_SIZE)
         self._connect()
         self._create_tables()
         atexit.register(self.close_connection) # 注册程序退出时关闭数据库连接
 
+    def _thread_state(self):
+        """返回当前线程的连接状态，首次访问时创建连接和游标。"""
+        state = self._local
+        if getattr(state, 'conn', None) is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("数据库连接已关闭。")
+            state.conn = self._open_connection()
+            state.cursor = state.conn.cursor()
+        return state
+
+    def _mark_query_failed(self):
+        """在查询方法的异常处理中调用，使本次返回的空结果不被缓存。"""
+        self._thread_state().query_failed = True
+
+    def _sync_label_generation(self):
+        """写入后调用（持有写锁）：label_index_state 中的持久标签写代数变化时递增 label_generation。"""
+        try:
+            row = self.cursor.execute("SELECT generation FROM label_index_state WHERE id = 0").fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"查询标签写代数失败: {e}", exc_info=True)
+            row = None
+        persistent = row['generation'] if row else None
+        if persistent is None or persistent != self._persistent_label_generation:
+            self._persistent_label_generation = persistent
+            self.label_generation += 1
+
+    def _label_cache_generation(self):
+        return self.label_generation
+
+    def _search_cache_generation(self):
+        """
+        搜索缓存的代数：(search_generation, 排序使用的播放代数)。播放记录每次写入都会递增 play_generation，
+        但排序使用的播放代数距上次更新不足 PLAY_RANKING_MAX_STALENESS_SECONDS 秒时保持不变，
+        因此定期写入播放记录不会每次都清空搜索缓存，缓存结果的排序最多落后这么久。
+        """
+        if self._ranked_play_generation != self.play_generation:
+            now = time.monotonic()
+            if now - self._ranked_play_time >= PLAY_RANKING_MAX_STALENESS_SECONDS:
+                self._ranked_play_generation = self.play_generation
+                self._ranked_play_time = now
+        return (self.search_generation, self._ranked_play_generation)
+
+    def cache_stats(self):
+        """
+        Returns:
+            dict: {'labels': {...}, 'search': {...}, 'ranked_ids': {...}}，各项见 GenerationalLRUCache.stats。
+        """
+        return {'labels': self._label_cache.stats(), 'search': self._search_cache.stats(),
+                'ranked_ids': self._ranked_ids_cache.stats()}
+
+    @property
+    def conn(self):
+        """当前线程的数据库连接。"""
+        return self._thread_state().conn
+
+    @property
+    def cursor(self):
+        """当前线程的游标。"""
+        return self._thread_state().cursor
+
+    def _open_connection(self):
+        """打开一个新连接并设置 WAL 等连接参数。"""
+        # 连接只在创建它的线程中使用；关闭 check_same_thread 仅为了让 close_connection 能统一关闭
+        connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        connection.row_factory = sqlite3.Row # 使查询结果可以通过字典键访问
+        connection.execute("PRAGMA synchronous=NORMAL") # WAL 模式下 NORMAL 已能保证一致性
+        with self._connections_lock:
+            self._connections.append(connection)
+        logger.debug(f"线程 '{threading.current_thread().name}' 打开了新的数据库连接。")
+        return connection
+
+    def _get_label_snapshot_path(self):
+        """标签快照保存在程序目录中，数据库位于网络共享上时也从本地磁盘读取。"""
+        return os.path.join(APPLICATION_ROOT, SNAPSHOT_FILE)
+
     def _get_database_path(self):
         """
         从配置文件或默认位置获取数据库文件路径。
@@ -67,11 +373,13 @@ class DatabaseManager:
         return db_path
 
     def _connect(self):
-        """连接到SQLite数据库。"""
+        """连接到SQLite数据库，并切换到 WAL 日志模式（该设置持久保存在数据库文件中）。"""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row # 使查询结果可以通过字典键访问
-            self.cursor = self.conn.cursor()
+            # 只对新建的数据库生效（须在建表之前设置）；已有数据库需要一次完整的 VACUUM 才能转换（见 enable_incremental_vacuum）
+            self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            journal_mode = self.conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if journal_mode.lower() != "wal":
+                logger.warning(f"数据库不支持 WAL 模式（当前为 {journal_mode}），读写将相互阻塞。")
             logger.info(f"成功连接到数据库: {self.db_path}")
         except sqlite3.Error as e:
             logger.error(f"连接数据库失败: {e}", exc_info=True)
@@ -87,16 +395,83 @@ class DatabaseManager:
                 logger.error(f"在显示数据库连接错误时发生错误: {gui_err}")
             sys.exit(1) # 如果数据库无法连接，则退出程序
 
+    # 按标签查音频需要以 label_id 开头的索引（主键以 audio_id 开头，无法用于该方向）；大批量导入期间暂时删除
+    _AUDIO_LABELS_LABEL_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_audio_labels_label ON audio_labels (label_id, audio_id)"
+    # 标签关联增删时更新 label_stats；时间与其他表一致，为 Unix 时间戳（秒）
+    _LABEL_STATS_TRIGGERS_SQL = '''
+        CREATE TRIGGER IF NOT EXISTS audio_labels_stats_ai AFTER INSERT ON audio_labels BEGIN
+            UPDATE label_stats SET usage_count = usage_count + 1, last_used = (julianday('now') - 2440587.5) * 86400.0
+            WHERE label_id = new.label_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS audio_labels_stats_ad AFTER DELETE ON audio_labels BEGIN
+            UPDATE label_stats SET usage_count = usage_count - 1 WHERE label_id = old.label_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS audio_labels_stats_au AFTER UPDATE OF label_id ON audio_labels BEGIN
+            UPDATE label_stats SET usage_count = usage_count - 1 WHERE label_id = old.label_id;
+            UPDATE label_stats SET usage_count = usage_count + 1, last_used = (julianday('now') - 2440587.5) * 86400.0
+            WHERE label_id = new.label_id;
+        END;
+    '''
+    _LABEL_STATS_TRIGGERS = ('audio_labels_stats_ai', 'audio_labels_stats_ad', 'audio_labels_stats_au')
+    _FINGERPRINT_STATS_TRIGGERS_SQL = '''
+        CREATE TRIGGER IF NOT EXISTS fingerprint_hashes_stats_ai AFTER INSERT ON fingerprint_hashes BEGIN
+            INSERT INTO fingerprint_hash_stats (hash, postings) VALUES (new.hash, 1)
+            ON CONFLICT (hash) DO UPDATE SET postings = postings + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS fingerprint_hashes_stats_ad AFTER DELETE ON fingerprint_hashes BEGIN
+            UPDATE fingerprint_hash_stats SET postings = postings - 1 WHERE hash = old.hash;
+        END;
+    '''
+    # 影响标签查询结果的修改都递增 label_index_state 中的持久写代数，标签快照据此判断是否过期。
+    # audio_labels 上的触发器与计数触发器一样在大批量导入期间暂时删除，导入的每批各自递增一次
+    _LABEL_GENERATION_EVENTS = (
+        ('audio_labels', 'ai', 'INSERT'), ('audio_labels', 'ad', 'DELETE'), ('audio_labels', 'au', 'UPDATE'),
+        ('labels', 'ai', 'INSERT'), ('labels', 'ad', 'DELETE'), ('labels', 'au', 'UPDATE OF name'),
+        ('audios', 'ad', 'DELETE'), ('audios', 'au', 'UPDATE OF directory_id, name'),
+        ('directories', 'au', 'UPDATE OF path'),
+        ('label_tree', 'ai', 'INSERT'), ('label_tree', 'ad', 'DELETE'), ('label_tree', 'au', 'UPDATE'),
+        ('label_aliases', 'ai', 'INSERT'), ('label_aliases', 'ad', 'DELETE'), ('label_aliases', 'au', 'UPDATE'),
+    )
+    _LABEL_GENERATION_TRIGGERS_SQL = "".join(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_gen_{suffix} AFTER {event} ON {table} BEGIN "
+        f"UPDATE label_index_state SET generation = generation + 1; END;\n"
+        for table, suffix, event in _LABEL_GENERATION_EVENTS)
+    _BULK_IMPORT_GENERATION_TRIGGERS = ('audio_labels_gen_ai', 'audio_labels_gen_ad', 'audio_labels_gen_au')
+    _BUMP_LABEL_GENERATION_SQL = "UPDATE label_index_state SET generation = generation + 1"
+
     def _create_tables(self):
         """创建数据库表（如果不存在）。"""
         try:
-            # audios 表存储音频路径
+            # directories 表对目录路径做驻留：每个目录的完整路径（含末尾分隔符）只保存一次，parent_id 指向上级目录。
+            # scan_mtime_ns 为素材库扫描时目录的修改时间，未变化的目录在重新扫描时不必列出内容（见 core.library_indexer）
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS directories (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    parent_id INTEGER REFERENCES directories(id),
+                    path TEXT NOT NULL UNIQUE,
+                    scan_mtime_ns INTEGER
+                )
+            ''')
+            if "scan_mtime_ns" not in self._table_columns("directories"):
+                self.cursor.execute("ALTER TABLE directories ADD COLUMN scan_mtime_ns INTEGER")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories (parent_id)")
+            # audios 表只存储所在目录和文件名，完整路径为 directories.path || audios.name（见 audio_paths 视图）
+            if self._table_exists("audios") and "path" in self._table_columns("audios"):
+                self._migrate_audio_paths()
             self.cursor.execute('''
                 CREATE TABLE IF NOT EXISTS audios (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    path TEXT NOT NULL UNIQUE
+                    directory_id INTEGER NOT NULL REFERENCES directories(id),
+                    name TEXT NOT NULL,
+                    UNIQUE (directory_id, name)
                 )
             ''')
+            self.cursor.execute('''
+                CREATE VIEW IF NOT EXISTS audio_paths AS
+                SELECT a.id, a.directory_id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+            ''')
             # labels 表存储标签名称
             self.cursor.execute('''
                 CREATE TABLE IF NOT EXISTS labels (
@@ -114,6 +489,264 @@ class DatabaseManager:
                     FOREIGN KEY (label_id) REFERENCES labels(id) ON DELETE CASCADE
                 )
             ''')
+            self.cursor.execute(self._AUDIO_LABELS_LABEL_INDEX_SQL)
+            # label_stats 表物化每个标签的使用次数（使用该标签的音频数）和最近一次被添加到音频的时间，由触发器维护，
+            # 浏览常用标签和补全排序时不必对 audio_labels 做 GROUP BY
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS label_stats (
+                    label_id INTEGER PRIMARY KEY,
+                    usage_count INTEGER NOT NULL DEFAULT 0,
+                    last_used REAL,
+                    FOREIGN KEY (label_id) REFERENCES labels(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_label_stats_usage ON label_stats (usage_count, label_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_label_stats_recent ON label_stats (last_used, label_id)")
+            self.cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS labels_stats_ai AFTER INSERT ON labels BEGIN
+                    INSERT OR IGNORE INTO label_stats (label_id) VALUES (new.id);
+                END;
+                CREATE TRIGGER IF NOT EXISTS labels_stats_ad AFTER DELETE ON labels BEGIN
+                    DELETE FROM label_stats WHERE label_id = old.id;
+                END;
+            ''')
+            # 计数触发器在大批量导入期间暂时删除（见 begin_bulk_label_import）；启动时缺少触发器说明导入被中断，重新统计
+            if not self._table_exists("audio_labels_stats_ai"):
+                self._rebuild_label_stats()
+                self.cursor.executescript(self._LABEL_STATS_TRIGGERS_SQL)
+            # label_tree 为标签层级的闭包表：每个标签与它的每个祖先（包括自身，depth 为 0）各有一行，
+            # "某个标签及其所有下级标签"无论层级多深都是一次按主键的范围扫描；父标签即 depth 为 1 的祖先
+            label_tree_existed = self._table_exists("label_tree")
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS label_tree (
+                    ancestor_id INTEGER NOT NULL,
+                    descendant_id INTEGER NOT NULL,
+                    depth INTEGER NOT NULL,
+                    PRIMARY KEY (ancestor_id, descendant_id)
+                ) WITHOUT ROWID
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_label_tree_descendant ON label_tree (descendant_id, depth)")
+            self.cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS labels_tree_ai AFTER INSERT ON labels BEGIN
+                    INSERT OR IGNORE INTO label_tree (ancestor_id, descendant_id, depth) VALUES (new.id, new.id, 0);
+                END;
+                CREATE TRIGGER IF NOT EXISTS labels_tree_ad AFTER DELETE ON labels BEGIN
+                    DELETE FROM label_tree WHERE ancestor_id = old.id OR descendant_id = old.id;
+                END;
+            ''')
+            if not label_tree_existed:
+                self.cursor.execute("INSERT OR IGNORE INTO label_tree (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM labels")
+            # 标签别名，例如 "gunshot" -> "weapons/gun"；按别名搜索时匹配该标签及其下级标签
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS label_aliases (
+                    alias TEXT PRIMARY KEY COLLATE NOCASE,
+                    label_id INTEGER NOT NULL,
+                    FOREIGN KEY (label_id) REFERENCES labels(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_label_aliases_label ON label_aliases (label_id)")
+            # 标签相关数据的持久写代数；instance 在创建数据库时随机生成，区分不同的数据库文件
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS label_index_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    instance TEXT NOT NULL,
+                    generation INTEGER NOT NULL
+                )
+            ''')
+            self.cursor.execute("INSERT OR IGNORE INTO label_index_state (id, instance, generation) VALUES (0, lower(hex(randomblob(16))), 0)")
+            generation_triggers_existed = self._table_exists("audio_labels_gen_ai")
+            self.cursor.executescript(self._LABEL_GENERATION_TRIGGERS_SQL)
+            if not generation_triggers_existed: # 新数据库、旧版本数据库或被中断的大批量导入
+                self.cursor.execute(self._BUMP_LABEL_GENERATION_SQL)
+            # 按标签名精确查找（不区分大小写），用于层级搜索和相关度排序
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_labels_name_nocase ON labels (name COLLATE NOCASE)")
+            # 标签名与文件名的 trigram 全文索引，使子串搜索不再逐行扫描 LIKE
+            labels_fts_existed = self._table_exists("labels_fts")
+            self.labels_fts_available = self._create_fts_table(
+                "labels_fts", "name", "content='labels', content_rowid='id'")
+            if self.labels_fts_available:
+                self.cursor.executescript('''
+                    CREATE TRIGGER IF NOT EXISTS labels_ai AFTER INSERT ON labels BEGIN
+                        INSERT INTO labels_fts (rowid, name) VALUES (new.id, new.name);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS labels_ad AFTER DELETE ON labels BEGIN
+                        INSERT INTO labels_fts (labels_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS labels_au AFTER UPDATE OF name ON labels BEGIN
+                        INSERT INTO labels_fts (labels_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                        INSERT INTO labels_fts (rowid, name) VALUES (new.id, new.name);
+                    END;
+                ''')
+                if not labels_fts_existed:
+                    self.cursor.execute("INSERT INTO labels_fts (labels_fts) VALUES ('rebuild')")
+                # trigram 词表：instance 表给出 trigram -> 标签 id，row 表给出每个 trigram 的文档频率，作为容错匹配的候选索引
+                self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS labels_fts_vocab USING fts5vocab(labels_fts, 'instance')")
+                self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS labels_fts_terms USING fts5vocab(labels_fts, 'row')")
+            # 文件名索引单独保存 basename（audios.name），由 audios 表的触发器维护
+            names_fts_existed = self._table_exists("audio_names_fts")
+            self.names_fts_available = self._create_fts_table("audio_names_fts", "basename")
+            if self.names_fts_available:
+                self.cursor.executescript('''
+                    CREATE TRIGGER IF NOT EXISTS audios_ai AFTER INSERT ON audios BEGIN
+                        INSERT INTO audio_names_fts (rowid, basename) VALUES (new.id, new.name);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS audios_ad AFTER DELETE ON audios BEGIN
+                        DELETE FROM audio_names_fts WHERE rowid = old.id;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS audios_au AFTER UPDATE OF name ON audios BEGIN
+                        UPDATE audio_names_fts SET basename = new.name WHERE rowid = new.id;
+                    END;
+                ''')
+                if not names_fts_existed:
+                    self.cursor.execute("INSERT INTO audio_names_fts (rowid, basename) SELECT id, name FROM audios")
+            # audio_features 表存储每个音频的紧凑特征向量 (float16 打包)，用于相似度检索
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_features (
+                    audio_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            # fingerprint_hashes 是声学指纹的倒排表：按哈希聚簇，候选匹配通过哈希查找获得
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fingerprint_hashes (
+                    hash INTEGER NOT NULL,
+                    audio_id INTEGER NOT NULL,
+                    time_offset INTEGER NOT NULL,
+                    PRIMARY KEY (hash, audio_id, time_offset)
+                ) WITHOUT ROWID
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_hashes_audio ON fingerprint_hashes (audio_id)")
+            # 每个哈希的倒排表长度，由触发器维护；查找匹配时据此挑选最稀有的哈希（见 find_fingerprint_matches）
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fingerprint_hash_stats (
+                    hash INTEGER PRIMARY KEY,
+                    postings INTEGER NOT NULL
+                )
+            ''')
+            if not self._table_exists("fingerprint_hashes_stats_ai"):
+                self.cursor.execute("DELETE FROM fingerprint_hash_stats")
+                self.cursor.execute('''
+                    INSERT INTO fingerprint_hash_stats (hash, postings)
+                    SELECT hash, COUNT(*) FROM fingerprint_hashes GROUP BY hash
+                ''')
+                self.cursor.executescript(self._FINGERPRINT_STATS_TRIGGERS_SQL)
+            # fingerprinted_audios 记录已完成指纹计算的音频，用于增量续算
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS fingerprinted_audios (
+                    audio_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    hash_count INTEGER NOT NULL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            # audio_metadata 表存储从文件内嵌标签读取的文本元数据
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_metadata (
+                    audio_id INTEGER PRIMARY KEY,
+                    title TEXT,
+                    artist TEXT,
+                    album TEXT,
+                    comment TEXT,
+                    description TEXT,
+                    mtime REAL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            self.metadata_fts_available = self._create_fts_table(
+                "metadata_fts", "title, artist, album, comment, description",
+                "content='audio_metadata', content_rowid='audio_id'")
+            if self.metadata_fts_available:
+                # 外部内容表的全文索引通过触发器与 audio_metadata 保持同步
+                self.cursor.executescript('''
+                    CREATE TRIGGER IF NOT EXISTS audio_metadata_ai AFTER INSERT ON audio_metadata BEGIN
+                        INSERT INTO metadata_fts (rowid, title, artist, album, comment, description)
+                        VALUES (new.audio_id, new.title, new.artist, new.album, new.comment, new.description);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS audio_metadata_ad AFTER DELETE ON audio_metadata BEGIN
+                        INSERT INTO metadata_fts (metadata_fts, rowid, title, artist, album, comment, description)
+                        VALUES ('delete', old.audio_id, old.title, old.artist, old.album, old.comment, old.description);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS audio_metadata_au AFTER UPDATE ON audio_metadata BEGIN
+                        INSERT INTO metadata_fts (metadata_fts, rowid, title, artist, album, comment, description)
+                        VALUES ('delete', old.audio_id, old.title, old.artist, old.album, old.comment, old.description);
+                        INSERT INTO metadata_fts (rowid, title, artist, album, comment, description)
+                        VALUES (new.audio_id, new.title, new.artist, new.album, new.comment, new.description);
+                    END;
+                ''')
+            # audio_analysis 表存储速度/调性估计结果及置信度，数值列带索引以支持范围查询
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_analysis (
+                    audio_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    bpm REAL,
+                    bpm_confidence REAL,
+                    key_root INTEGER,
+                    key_mode INTEGER,
+                    key_confidence REAL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_analysis_bpm ON audio_analysis (bpm)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_analysis_key_bpm ON audio_analysis (key_root, key_mode, bpm)")
+            # audio_properties 表存储从文件头读取的流属性，复合索引覆盖常见的组合过滤
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_properties (
+                    audio_id INTEGER PRIMARY KEY,
+                    duration_ms INTEGER,
+                    sample_rate INTEGER,
+                    channels INTEGER,
+                    file_size INTEGER,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_properties_duration ON audio_properties (duration_ms)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_properties_channels_rate ON audio_properties (channels, sample_rate, duration_ms)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_properties_rate ON audio_properties (sample_rate, duration_ms)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_properties_size ON audio_properties (file_size)")
+            # audio_files 表记录后台核对时看到的文件状态：partial_hash 为文件首尾内容的哈希（只为打过标签的文件，
+            # 以及与其他文件大小相同的文件计算），full_hash 为完整内容的哈希（只为部分哈希也相同的文件计算，见 core.content_hash），
+            # 文件大小或修改时间变化后两者都会清空。first_seen 为第一次核对到该文件的时间，missing_since 为发现文件缺失的时间（文件存在时为 NULL）
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_files (
+                    audio_id INTEGER PRIMARY KEY,
+                    file_size INTEGER,
+                    mtime_ns INTEGER,
+                    partial_hash TEXT,
+                    first_seen REAL,
+                    missing_since REAL,
+                    full_hash TEXT,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            if "full_hash" not in self._table_columns("audio_files"):
+                self.cursor.execute("ALTER TABLE audio_files ADD COLUMN full_hash TEXT")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_files_size ON audio_files (file_size, first_seen)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_files_partial ON audio_files (file_size, partial_hash, missing_since)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_files_full ON audio_files (full_hash, file_size)")
+            # play_history 表按时间记录每次试听（由 core.play_history 成批写入），audio_play_stats 为每个音频的播放次数
+            # 和最近一次播放时间，在同一事务中更新，"最近播放"、"最常播放"和搜索结果的最近播放优先都只读它的索引
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS play_history (
+                    id INTEGER PRIMARY KEY,
+                    audio_id INTEGER NOT NULL,
+                    played_at REAL NOT NULL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_play_history_time ON play_history (played_at, audio_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_play_history_audio ON play_history (audio_id)")
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_play_stats (
+                    audio_id INTEGER PRIMARY KEY,
+                    play_count INTEGER NOT NULL,
+                    last_played REAL NOT NULL,
+                    FOREIGN KEY (audio_id) REFERENCES audios(id) ON DELETE CASCADE
+                )
+            ''')
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_play_stats_recent ON audio_play_stats (last_played, audio_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_audio_play_stats_count ON audio_play_stats (play_count, last_played)")
             self.conn.commit()
             logger.info("数据库表已创建或已存在。")
         except sqlite3.Error as e:
@@ -130,81 +763,2322 @@ class DatabaseManager:
                 logger.error(f"在显示数据库表创建错误时发生错误: {gui_err}")
             sys.exit(1)
 
+    def _table_exists(self, table_name):
+        return self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,)).fetchone() is not None
+
+    def _table_columns(self, table_name):
+        return {row['name'] for row in self.cursor.execute(f"PRAGMA table_info({table_name})")}
+
+    def _migrate_audio_paths(self):
+        """
+        将旧版 audios(id, path) 表迁移为 audios(id, directory_id, name) + directories。
+        音频 id 保持不变，其他表的关联无需改动；迁移在单个事务中完成，之后 VACUUM 回收空间。
+        """
+        start = time.perf_counter()
+        logger.info("正在将音频路径迁移为目录 + 文件名的紧凑存储...")
+        basename_sql = self._basename_sql("audios.path")
+        dirname_sql = f"substr(audios.path, 1, length(audios.path) - length({basename_sql}))"
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.cursor.execute("BEGIN")
+        try:
+            directories = [row[0] for row in self.cursor.execute(f"SELECT DISTINCT {dirname_sql} FROM audios")]
+            self._ensure_directory_ids(directories)
+            self.cursor.execute('''
+                CREATE TABLE audios_compact (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    directory_id INTEGER NOT NULL REFERENCES directories(id),
+                    name TEXT NOT NULL,
+                    UNIQUE (directory_id, name)
+                )
+            ''')
+            self.cursor.execute(f'''
+                INSERT INTO audios_compact (id, directory_id, name)
+                SELECT audios.id, d.id, {basename_sql}
+                FROM audios
+                JOIN directories d ON d.path = {dirname_sql}
+            ''')
+            migrated = self.cursor.rowcount
+            # 旧表上的触发器随表一起删除，稍后按新结构重新创建
+            self.cursor.execute("DROP TABLE audios")
+            self.cursor.execute("ALTER TABLE audios_compact RENAME TO audios")
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.conn.execute("VACUUM")
+        logger.info(f"已迁移 {migrated} 个音频路径（{len(directories)} 个目录），耗时 {time.perf_counter() - start:.1f}s。")
+
+    def _ensure_directory_ids(self, directories):
+        """
+        确保目录及其所有上级目录都已存在于 directories 表中（调用方负责提交事务）。
+
+        Returns:
+            dict: 目录路径 -> 目录 id（包含上级目录）。
+        """
+        wanted = set()
+        for directory in directories:
+            while directory is not None and directory not in wanted:
+                wanted.add(directory)
+                directory = _parent_directory(directory)
+        ordered = sorted(wanted, key=len) # 上级目录总比下级目录短，先插入
+        directory_ids = {}
+        for start in range(0, len(ordered), SQL_VARIABLE_CHUNK):
+            chunk = ordered[start:start + SQL_VARIABLE_CHUNK]
+            self.cursor.execute(f"SELECT id, path FROM directories WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+            directory_ids.update((row['path'], row['id']) for row in self.cursor.fetchall())
+        for directory in ordered:
+            if directory not in directory_ids:
+                parent = _parent_directory(directory)
+                self.cursor.execute("INSERT INTO directories (parent_id, path) VALUES (?, ?)",
+                                    (directory_ids[parent] if parent is not None else None, directory))
+                directory_ids[directory] = self.cursor.lastrowid
+        return directory_ids
+
+    def _ensure_audio_ids(self, audio_paths):
+        """
+        确保音频路径都已存在于 audios 表中（调用方负责提交事务），通过临时表一次性解析 id。
+
+        Returns:
+            dict: 音频路径 -> 音频 id。
+        """
+        keys = {path: _split_path(path) for path in audio_paths}
+        if not keys:
+            return {}
+        directory_ids = self._ensure_directory_ids({directory for directory, _name in keys.values()})
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS bulk_audio_keys (path TEXT PRIMARY KEY, directory_id INTEGER, name TEXT)
+        ''')
+        self.cursor.execute("DELETE FROM bulk_audio_keys")
+        self.cursor.executemany("INSERT INTO bulk_audio_keys (path, directory_id, name) VALUES (?, ?, ?)",
+                                [(path, directory_ids[directory], name) for path, (directory, name) in keys.items()])
+        self.cursor.execute("INSERT OR IGNORE INTO audios (directory_id, name) SELECT directory_id, name FROM bulk_audio_keys")
+        if self.cursor.rowcount > 0: # 提交后由 _serialized_write 递增 search_generation（新文件会出现在文件名搜索中）
+            self._thread_state().inserted_audios = True
+        self.cursor.execute('''
+            SELECT b.path, a.id
+            FROM bulk_audio_keys b
+            JOIN audios a ON a.directory_id = b.directory_id AND a.name = b.name
+        ''')
+        audio_ids = {row['path']: row['id'] for row in self.cursor.fetchall()}
+        self.cursor.execute("DELETE FROM bulk_audio_keys")
+        return audio_ids
+
+    def _lookup_audio_ids(self, audio_paths):
+        """只查询、不创建：返回 {音频路径: 音频 id}，数据库中不存在的路径不出现在结果中。"""
+        audio_ids = {}
+        for path in dict.fromkeys(audio_paths):
+            directory, name = _split_path(path)
+            row = self.cursor.execute(f"SELECT a.id FROM audios a WHERE {_AUDIO_BY_PATH_SQL}", (directory, name)).fetchone()
+            if row:
+                audio_ids[path] = row['id']
+        return audio_ids
+
+    @staticmethod
+    def _basename_sql(path_expr):
+        """返回计算文件名的 SQL 表达式：rtrim 去掉最后一个分隔符之后的字符，剩余长度即文件名的起点（用于迁移旧数据）。"""
+        normalized = f"replace({path_expr}, '\\', '/')"
+        return f"substr({path_expr}, length(rtrim({normalized}, replace({normalized}, '/', ''))) + 1)"
+
+    def _create_fts_table(self, table_name, columns, options=""):
+        """
+        创建 FTS5 全文索引表。优先使用 trigram 分词器以保持子串匹配语义，
+        旧版 SQLite 不支持时退回 unicode61；完全不支持 FTS5 时返回 False。
+        """
+        extra = f", {options}" if options else ""
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} USING fts5({columns}{extra}, tokenize='{tokenizer}')")
+                if tokenizer != "trigram":
+                    logger.warning(f"当前 SQLite 不支持 trigram 分词器，全文索引 '{table_name}' 使用 {tokenizer}。")
+                self._fts_tokenizers[table_name] = tokenizer
+                return True
+            except sqlite3.OperationalError as e:
+                logger.debug(f"使用 {tokenizer} 分词器创建 '{table_name}' 失败: {e}")
+        logger.warning(f"当前 SQLite 不支持 FTS5，'{table_name}' 将退回 LIKE 查询。")
+        return False
+
+    @staticmethod
+    def _fts_phrase(text):
+        """将用户输入转换为 FTS5 短语查询，避免其中的运算符被解析。"""
+        return '"' + text.replace('"', '""') + '"'
+
     def add_audio_label(self, audio_path, label_name):
         """
         为音频文件添加一个或多个标签。
         如果音频路径或标签不存在，则自动创建。
         """
-        try:
-            self.cursor.execute("INSERT OR IGNORE INTO audios (path) VALUES (?)", (audio_path,))
-            audio_id_row = self.cursor.execute("SELECT id FROM audios WHERE path = ?", (audio_path,)).fetchone()
-            if not audio_id_row:
-                logger.error(f"无法获取或创建音频ID: {audio_path}")
-                return False
-            audio_id = audio_id_row[0]
+        return self.add_audio_labels([audio_path], [label_name]) >= 0
+
+    @_serialized_write
+    def add_audio_labels(self, audio_paths, label_names):
+        """
+        批量为多个音频添加多个标签（笛卡尔积），整个操作在单个事务中完成，只提交一次。
+        不存在的音频路径和标签会自动创建；音频和标签 id 通过临时表连接一次性解析。
 
-            self.cursor.execute("INSERT OR IGNORE INTO labels (name) VALUES (?)", (label_name,))
-            label_id_row = self.cursor.execute("SELECT id FROM labels WHERE name = ?", (label_name,)).fetchone()
-            if not label_id_row:
-                logger.error(f"无法获取或创建标签ID: {label_name}")
-                return False
-            label_id = label_id_row[0]
+        Args:
+            audio_paths (iterable): 音频文件路径。
+            label_names (iterable): 标签名称。
 
-            self.cursor.execute("INSERT OR IGNORE INTO audio_labels (audio_id, label_id) VALUES (?, ?)", (audio_id, label_id))
+        Returns:
+            int: 新增的标签关联数量（已存在的关联不计）；失败时返回 -1。
+        """
+        paths = list(dict.fromkeys(audio_paths))
+        names = list(dict.fromkeys(name for name in label_names if name))
+        if not paths or not names:
+            return 0
+        try:
+            audio_ids = self._ensure_audio_ids(paths)
+            self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_label_audios (audio_id INTEGER PRIMARY KEY)")
+            self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_label_names (name TEXT PRIMARY KEY)")
+            self.cursor.execute("DELETE FROM bulk_label_audios")
+            self.cursor.execute("DELETE FROM bulk_label_names")
+            self.cursor.executemany("INSERT OR IGNORE INTO bulk_label_audios (audio_id) VALUES (?)",
+                                    [(audio_id,) for audio_id in audio_ids.values()])
+            self.cursor.executemany("INSERT INTO bulk_label_names (name) VALUES (?)", [(name,) for name in names])
+            self.cursor.execute("INSERT OR IGNORE INTO labels (name) SELECT name FROM bulk_label_names")
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO audio_labels (audio_id, label_id)
+                SELECT ba.audio_id, l.id
+                FROM bulk_label_audios ba
+                CROSS JOIN bulk_label_names bn
+                JOIN labels l ON l.name = bn.name
+            ''')
+            added = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM bulk_label_audios")
+            self.cursor.execute("DELETE FROM bulk_label_names")
             self.conn.commit()
-            logger.debug(f"已为音频 '{os.path.basename(audio_path)}' 添加标签 '{label_name}'。")
-            return True
+            placeholders = ",".join("?" * len(names))
+            self._refresh_label_trie(f"WHERE l.name IN ({placeholders})", names)
+            logger.debug(f"已为 {len(paths)} 个音频添加 {len(names)} 个标签，新增 {added} 条关联。")
+            return added
         except sqlite3.Error as e:
-            logger.error(f"添加音频标签失败: {e} (Path: {audio_path}, Label: {label_name})", exc_info=True)
-            return False
+            self.conn.rollback()
+            logger.error(f"批量添加音频标签失败: {e} (音频: {len(paths)} 个, 标签: {names})", exc_info=True)
+            return -1
 
-    def get_audios_by_label(self, label_name):
+    @_serialized_write
+    def update_labels_in_bulk(self, add_labels=(), remove_labels=(), audio_paths=None, label_term=None, filters=(),
+                              progress_callback=None):
         """
-        根据标签名称搜索所有匹配的音频文件路径。
-        支持模糊搜索。
+        为一组音频批量添加和移除标签，整个操作在单个事务中完成，只提交一次。
+        目标音频可以是路径列表（例如列表中的多选、文件夹中的文件），也可以是一次搜索的全部结果
+        （label_term 和 filters 与 search_audios 相同，直接在数据库中选出，不经过 Python 列表）。
+        目标音频 id 先写入临时表，再按 id 范围分块写入或删除 audio_labels，每块之后报告进度。
+
+        Args:
+            add_labels (iterable): 要添加的标签名，不存在时自动创建；别名按其指向的标签处理。
+            remove_labels (iterable): 要移除的标签名或别名。
+            audio_paths (iterable, optional): 目标音频路径；添加标签时不存在的音频会自动创建。为 None 时按搜索条件选取。
+            progress_callback (callable, optional): 在调用线程中调用 progress_callback(已处理数, 总数)。
+
+        Returns:
+            tuple: (新增的关联数, 移除的关联数)；失败时返回 (-1, -1)。
         """
+        add_labels = [name for name in dict.fromkeys(add_labels) if name]
+        remove_labels = [name for name in dict.fromkeys(remove_labels) if name and name not in add_labels]
+        if not add_labels and not remove_labels:
+            return 0, 0
         try:
-            # 使用 LIKE 进行模糊匹配，并将搜索词前后加上 %
-            search_term = f"%{label_name.strip()}%"
-            self.cursor.execute('''
-                SELECT DISTINCT a.path
-                FROM audios a
-                JOIN audio_labels al ON a.id = al.audio_id
+            self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_label_targets (audio_id INTEGER PRIMARY KEY)")
+            self.cursor.execute("DELETE FROM batch_label_targets")
+            if audio_paths is not None:
+                paths = list(dict.fromkeys(audio_paths))
+                audio_ids = self._ensure_audio_ids(paths) if add_labels else self._lookup_audio_ids(paths)
+                self.cursor.executemany("INSERT OR IGNORE INTO batch_label_targets (audio_id) VALUES (?)",
+                                        [(audio_id,) for audio_id in audio_ids.values()])
+            else:
+                from_sql, where_sql, params, _order_keys, _order_params = self._search_query_parts(label_term, filters)
+                self.cursor.execute(f'''
+                    INSERT OR IGNORE INTO batch_label_targets (audio_id)
+                    SELECT a.id FROM {from_sql} WHERE {where_sql}
+                ''', params)
+            target_ids = [row[0] for row in self.cursor.execute("SELECT audio_id FROM batch_label_targets ORDER BY audio_id")]
+            add_ids = sorted(set(self._resolve_label_ids(add_labels).values()))
+            remove_ids = sorted(set(self._resolve_label_ids(remove_labels, create=False).values()) - set(add_ids))
+            added = removed = 0
+            for start in range(0, len(target_ids), BATCH_LABEL_CHUNK):
+                first_id, last_id = target_ids[start], target_ids[min(start + BATCH_LABEL_CHUNK, len(target_ids)) - 1]
+                if add_ids:
+                    self.cursor.execute(f'''
+                        INSERT OR IGNORE INTO audio_labels (audio_id, label_id)
+                        SELECT t.audio_id, l.id
+                        FROM batch_label_targets t
+                        CROSS JOIN labels l
+                        WHERE t.audio_id BETWEEN ? AND ? AND l.id IN ({",".join("?" * len(add_ids))})
+                    ''', [first_id, last_id] + add_ids)
+                    added += self.cursor.rowcount
+                if remove_ids:
+                    self.cursor.execute(f'''
+                        DELETE FROM audio_labels
+                        WHERE audio_id IN (SELECT audio_id FROM batch_label_targets WHERE audio_id BETWEEN ? AND ?)
+                          AND label_id IN ({",".join("?" * len(remove_ids))})
+                    ''', [first_id, last_id] + remove_ids)
+                    removed += self.cursor.rowcount
+                if progress_callback:
+                    progress_callback(min(start + BATCH_LABEL_CHUNK, len(target_ids)), len(target_ids))
+            self.cursor.execute("DELETE FROM batch_label_targets")
+            self.conn.commit()
+            changed_ids = add_ids + remove_ids
+            if changed_ids:
+                self._refresh_label_trie(f"WHERE l.id IN ({','.join('?' * len(changed_ids))})", changed_ids)
+            logger.info(f"批量编辑标签: {len(target_ids)} 个音频，添加 {add_labels} 新增 {added} 条关联，"
+                        f"移除 {remove_labels} 删除 {removed} 条关联。")
+            return added, removed
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"批量编辑标签失败: {e} (添加: {add_labels}, 移除: {remove_labels})", exc_info=True)
+            return -1, -1
+
+    # 名称或别名与搜索词完全相同（不区分大小写）的标签 id，参数为 (搜索词, 搜索词)
+    _NAMED_LABEL_IDS_SQL = "SELECT id FROM labels WHERE name = ? COLLATE NOCASE UNION SELECT label_id FROM label_aliases WHERE alias = ?"
+
+    def _label_match_clauses(self, label_name):
+        """
+        构造"标签名、文件名或内嵌元数据匹配搜索词"的各个音频 id 子查询（几者的并集即为匹配结果）。
+        优先使用 trigram 全文索引；搜索词短于 3 个字符（trigram 无法匹配）或 FTS5 不可用时退回 LIKE 扫描。
+        搜索词恰好是某个标签名或别名时，还匹配带有其下级标签的音频（见 label_tree）。
+
+        Returns:
+            list: [(sql, params), ...]，每个 sql 产出单列 audio_id。
+        """
+        # 使用 LIKE 进行模糊匹配，并将搜索词前后加上 %
+        term = label_name.strip()
+        search_term = f"%{term}%"
+        use_fts = len(term) >= 3
+        clauses = []
+        if self.labels_fts_available and use_fts:
+            clauses.append(('''
+                SELECT al.audio_id
+                FROM audio_labels al
+                WHERE al.label_id IN (SELECT rowid FROM labels_fts WHERE labels_fts MATCH ?)
+            ''', (self._fts_phrase(term),)))
+        else:
+            clauses.append(('''
+                SELECT al.audio_id
+                FROM audio_labels al
                 JOIN labels l ON l.id = al.label_id
                 WHERE l.name LIKE ?
-            ''', (search_term,))
+            ''', (search_term,)))
+        clauses.append((f'''
+            SELECT al.audio_id
+            FROM label_tree t
+            JOIN audio_labels al ON al.label_id = t.descendant_id
+            WHERE t.ancestor_id IN ({self._NAMED_LABEL_IDS_SQL})
+        ''', (term, term)))
+        if self.names_fts_available and use_fts:
+            clauses.append(("SELECT rowid FROM audio_names_fts WHERE audio_names_fts MATCH ?", (self._fts_phrase(term),)))
+        else:
+            clauses.append(("SELECT id FROM audios WHERE name LIKE ?", (search_term,)))
+        # 同时匹配内嵌元数据
+        if self.metadata_fts_available and use_fts:
+            clauses.append(("SELECT rowid FROM metadata_fts WHERE metadata_fts MATCH ?", (self._fts_phrase(term),)))
+        else:
+            clauses.append(('''
+                SELECT m.audio_id
+                FROM audio_metadata m
+                WHERE m.title LIKE ? OR m.artist LIKE ? OR m.album LIKE ? OR m.comment LIKE ? OR m.description LIKE ?
+            ''', (search_term,) * 5))
+        return clauses
+
+    def _label_match_sql(self, label_name):
+        """
+        构造"标签名、文件名或内嵌元数据匹配搜索词"的音频 id 子查询。
+
+        Returns:
+            tuple: (sql, params)，sql 产出单列 audio_id。
+        """
+        clauses = self._label_match_clauses(label_name)
+        return " UNION ".join(sql for sql, _params in clauses), tuple(p for _sql, params in clauses for p in params)
+
+    def _label_match_predicate(self, label_name, id_expr):
+        """
+        与 _label_match_sql 的匹配规则相同，但写成针对单个音频 id 的判断条件：
+        标签通过 audio_labels 主键 (audio_id, label_id) 逐行探测，文件名和元数据按行比较，不必先物化所有匹配的音频。
+        用于布尔查询中驱动集合以外的搜索词。
+
+        Returns:
+            tuple: (sql, params)
+        """
+        term = label_name.strip()
+        search_term = f"%{term}%"
+        if self.labels_fts_available and len(term) >= 3:
+            label_ids_sql = "SELECT rowid FROM labels_fts WHERE labels_fts MATCH ?"
+            label_param = self._fts_phrase(term)
+        else:
+            label_ids_sql = "SELECT id FROM labels WHERE name LIKE ?"
+            label_param = search_term
+        sql = f'''(
+            EXISTS (SELECT 1 FROM audio_labels pl WHERE pl.audio_id = {id_expr} AND pl.label_id IN ({label_ids_sql}))
+            OR EXISTS (SELECT 1 FROM audio_labels pl WHERE pl.audio_id = {id_expr} AND pl.label_id IN
+                       (SELECT t.descendant_id FROM label_tree t WHERE t.ancestor_id IN ({self._NAMED_LABEL_IDS_SQL})))
+            OR EXISTS (SELECT 1 FROM audios pa WHERE pa.id = {id_expr} AND pa.name LIKE ?)
+            OR EXISTS (SELECT 1 FROM audio_metadata pm WHERE pm.audio_id = {id_expr}
+                       AND (pm.title LIKE ? OR pm.artist LIKE ? OR pm.album LIKE ? OR pm.comment LIKE ? OR pm.description LIKE ?))
+        )'''
+        return sql, (label_param, term, term, search_term) + (search_term,) * 5
+
+    def _estimate_match_count(self, node, cap):
+        """
+        估算布尔查询子表达式的匹配数量，最多计数到 cap，用于选出最有选择性的子表达式。
+        搜索词的各个子查询分别带 LIMIT 计数（UNION 会先物化全部结果，不能提前停止），因此宽泛的搜索词也很快返回。
+        """
+        if isinstance(node, Term):
+            total = 0
+            for sql, params in self._label_match_clauses(node.text):
+                row = self.cursor.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT ?)", params + (cap - total,)).fetchone()
+                total += row[0]
+                if total >= cap:
+                    break
+            return total
+        if isinstance(node, Or):
+            total = 0
+            for child in node.children:
+                total += self._estimate_match_count(child, cap - total)
+                if total >= cap:
+                    break
+            return total
+        if isinstance(node, And):
+            best = cap
+            for child in node.children:
+                if not isinstance(child, Not):
+                    best = min(best, self._estimate_match_count(child, best))
+            return best
+        return cap
+
+    def _boolean_predicate_sql(self, node, id_expr):
+        """将布尔查询子表达式编译为针对 id_expr 的判断条件。"""
+        if isinstance(node, Term):
+            return self._label_match_predicate(node.text, id_expr)
+        if isinstance(node, Not):
+            sql, params = self._boolean_predicate_sql(node.child, id_expr)
+            return f"NOT {sql}", params
+        parts = [self._boolean_predicate_sql(child, id_expr) for child in node.children]
+        joiner = " AND " if isinstance(node, And) else " OR "
+        return "(" + joiner.join(sql for sql, _params in parts) + ")", tuple(p for _sql, params in parts for p in params)
+
+    def _boolean_match_sql(self, node):
+        """
+        将布尔查询语法树（见 core.label_query）编译为产出音频 id 的子查询。
+        OR 编译为 UNION；AND 先估算各个肯定子表达式的匹配数，以最少的一个作为驱动集合，
+        其余子表达式（包括 NOT）对驱动集合中的每个音频按索引逐行判断；只有否定项时用 EXCEPT 从全部音频中排除。
+
+        Returns:
+            tuple: (sql, params)
+        """
+        if isinstance(node, Term):
+            return self._label_match_sql(node.text)
+        if isinstance(node, Or):
+            parts = [self._boolean_match_sql(child) for child in node.children]
+            return (" UNION ".join(f"SELECT * FROM ({sql})" for sql, _params in parts),
+                    tuple(p for _sql, params in parts for p in params))
+
+        children = node.children if isinstance(node, And) else (node,)
+        positives = [child for child in children if not isinstance(child, Not)]
+        if not positives:
+            parts = [self._boolean_match_sql(child.child) for child in children]
+            return ("SELECT id FROM audios" + "".join(f" EXCEPT SELECT * FROM ({sql})" for sql, _params in parts),
+                    tuple(p for _sql, params in parts for p in params))
+
+        # 先估算较长的搜索词（通常更有选择性），之后的估算以当前最小值为上限，很快就能停止
+        estimates = {}
+        best = BOOLEAN_ESTIMATE_CAP
+        for child in sorted(positives, key=lambda child: -len(child.text) if isinstance(child, Term) else 0):
+            estimates[id(child)] = self._estimate_match_count(child, best)
+            best = min(best, estimates[id(child)])
+        driver = min(positives, key=lambda child: estimates[id(child)])
+        driver_sql, params = self._boolean_match_sql(driver)
+        conditions = [f"qa.id IN ({driver_sql})"]
+        # 其余肯定项按估算数量从少到多排列，排除得多的判断先执行；否定项放在最后
+        rest = sorted((child for child in positives if child is not driver), key=lambda child: estimates[id(child)])
+        for child in rest + [child for child in children if isinstance(child, Not)]:
+            sql, child_params = self._boolean_predicate_sql(child, "qa.id")
+            conditions.append(sql)
+            params += child_params
+        logger.debug(f"布尔查询驱动项: {driver}（估算 {estimates[id(driver)]} 条）")
+        return f"SELECT qa.id FROM audios qa WHERE {' AND '.join(conditions)}", params
+
+    def _label_term_match_sql(self, label_term):
+        """
+        标签搜索词的音频 id 子查询：含布尔运算符或括号时按布尔查询编译，否则整段作为一个搜索词。
+
+        Returns:
+            tuple: (sql, params)；布尔查询中没有任何搜索词（例如 "()"）时不匹配任何音频。
+        """
+        if not is_boolean_query(label_term):
+            return self._label_match_sql(label_term)
+        node = parse_label_query(label_term)
+        if node is None:
+            return "SELECT NULL WHERE 0", ()
+        return self._boolean_match_sql(node)
+
+    @_cached('_search_cache', _search_key, '_search_cache_generation')
+    @_timed
+    def get_audios_by_label(self, label_name):
+        """
+        根据标签名称搜索所有匹配的音频文件路径，按相关度排列（见 _search_query_parts）。
+        支持模糊搜索，同时匹配文件名以及文件内嵌的标题、艺术家、专辑、注释等元数据；
+        也支持布尔查询，例如 drum AND (kick OR snare) NOT acoustic（见 core.label_query）。
+        """
+        try:
+            from_sql, where_sql, params, order_keys, order_params = self._search_query_parts(label_name, [])
+            self.cursor.execute(f'''
+                SELECT d.path || a.name AS path
+                FROM {from_sql}
+                WHERE {where_sql}
+                ORDER BY {", ".join(order_keys)}
+            ''', params + order_params)
             results = [row['path'] for row in self.cursor.fetchall()]
             logger.debug(f"通过标签 '{label_name}' 搜索到 {len(results)} 个音频文件。")
             return results
         except sqlite3.Error as e:
             logger.error(f"根据标签搜索音频失败: {e} (Label: {label_name})", exc_info=True)
+            self._mark_query_failed()
             return []
 
-    def get_labels_for_audio(self, audio_path):
+    @_timed
+    def get_audios_in_directory(self, directory, recursive=True):
         """
-        获取指定音频文件的所有标签。
+        获取目录中的音频路径（按路径排序）。
+        recursive 为 True 时包括所有子目录：子树中的目录路径都以该目录为前缀，是 directories.path 唯一索引上的
+        一个连续区间，按区间扫描目录后再按 (directory_id, name) 索引取文件，不需要对完整路径做 LIKE 扫描。
         """
+        if recursive:
+            return self.search_audios("", [('folder', '=', directory)])
         try:
             self.cursor.execute('''
-                SELECT l.name
-                FROM labels l
-                JOIN audio_labels al ON l.id = al.label_id
-                JOIN audios a ON a.id = al.audio_id
-                WHERE a.path = ?
-            ''', (audio_path,))
-            results = [row['name'] for row in self.cursor.fetchall()]
-            return results
+                SELECT d.path || a.name AS path
+                FROM directories d
+                JOIN audios a ON a.directory_id = d.id
+                WHERE d.path = ?
+                ORDER BY a.name
+            ''', (_directory_range(directory)[0],))
+            return [row['path'] for row in self.cursor.fetchall()]
         except sqlite3.Error as e:
-            logger.error(f"获取音频标签失败: {e} (Path: {audio_path})", exc_info=True)
+            logger.error(f"获取目录中的音频失败: {e} (Directory: {directory})", exc_info=True)
             return []
 
-    def close_connection(self):
-        """关闭数据库连接。"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.cursor = None
-            logger.info("数据库连接已关闭。")
+    @_timed
+    def get_scanned_directories(self, roots):
+        """
+        读取各根目录子树中已登记的目录，供素材库增量扫描使用。
+
+        Returns:
+            dict: 目录路径 -> (上次扫描时的修改时间 ns 或 None, [子目录路径, ...])
+        """
+        try:
+            rows = []
+            for root in roots:
+                self.cursor.execute(
+                    "SELECT id, parent_id, path, scan_mtime_ns FROM directories WHERE path >= ? AND path < ?",
+                    _directory_range(root))
+                rows.extend(self.cursor.fetchall())
+            paths = {row['id']: row['path'] for row in rows}
+            children = {}
+            for row in rows:
+                if row['parent_id'] in paths:
+                    children.setdefault(paths[row['parent_id']], []).append(row['path'])
+            return {row['path']: (row['scan_mtime_ns'], children.get(row['path'], [])) for row in rows}
+        except sqlite3.Error as e:
+            logger.error(f"读取已扫描目录失败: {e}", exc_info=True)
+            return {}
+
+    @_serialized_write
+    def save_scanned_directories(self, items):
+        """
+        保存素材库扫描结果，单个事务提交：登记目录和其中的音频文件，并记录扫描时目录的修改时间。
+
+        Args:
+            items (list): [(directory, mtime_ns, file_names), ...]，directory 以分隔符结尾。
+
+        Returns:
+            int: 新增的音频数量；失败时返回 -1。
+        """
+        try:
+            directory_ids = self._ensure_directory_ids([directory for directory, _mtime_ns, _names in items])
+            self.cursor.executemany("INSERT OR IGNORE INTO audios (directory_id, name) VALUES (?, ?)",
+                                    [(directory_ids[directory], name) for directory, _mtime_ns, names in items for name in names])
+            added = self.cursor.rowcount
+            self.cursor.executemany("UPDATE directories SET scan_mtime_ns = ? WHERE id = ?",
+                                    [(mtime_ns, directory_ids[directory]) for directory, mtime_ns, _names in items])
+            self.conn.commit()
+            logger.debug(f"已保存 {len(items)} 个目录的扫描结果，新增 {added} 个音频。")
+            return added
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存素材库扫描结果失败: {e}", exc_info=True)
+            return -1
+
+    @_timed
+    def suggest_labels(self, term, limit=10):
+        """
+        容错的标签建议：用 trigram 全文索引的词表（fts5vocab）找出共享足够多 trigram 的候选标签，
+        再只对这些候选计算有界编辑距离，按距离从小到大返回。
+        只用文档频率最低的若干个 trigram 探测候选（见 fuzzy_match.select_probe_trigrams），避免扫描 " hi"、"oop" 这类高频 trigram。
+
+        Args:
+            term (str): 用户输入（可能含拼写错误）。
+            limit (int): 最多返回多少个建议。
+
+        Returns:
+            list: [(label_name, distance), ...]；搜索词少于 3 个字符或 trigram 索引不可用时返回空列表。
+        """
+        term = term.strip()
+        term_trigrams = trigrams(term)
+        if not term_trigrams or self._fts_tokenizers.get("labels_fts") != "trigram":
+            return []
+        max_distance = max_typo_distance(term)
+        try:
+            placeholders = ",".join("?" * len(term_trigrams))
+            self.cursor.execute(f"SELECT term, doc FROM labels_fts_terms WHERE term IN ({placeholders})", term_trigrams)
+            frequencies = {row['term']: row['doc'] for row in self.cursor.fetchall()}
+            probes, min_shared = select_probe_trigrams(term_trigrams, frequencies, max_distance)
+            placeholders = ",".join("?" * len(probes))
+            self.cursor.execute(f'''
+                SELECT l.name,
+                       IFNULL((SELECT s.usage_count FROM label_stats s WHERE s.label_id = l.id), 0) AS usage_count
+                FROM (
+                    SELECT doc, COUNT(DISTINCT term) AS shared
+                    FROM labels_fts_vocab
+                    WHERE term IN ({placeholders})
+                    GROUP BY doc
+                    HAVING shared >= ?
+                    ORDER BY shared DESC
+                    LIMIT ?
+                ) candidates
+                JOIN labels l ON l.id = candidates.doc
+            ''', probes + [min_shared, FUZZY_CANDIDATE_LIMIT])
+            candidates = [(row['name'], row['usage_count']) for row in self.cursor.fetchall()]
+            suggestions = rank_candidates(term, candidates, limit, max_distance)
+            logger.debug(f"标签 '{term}' 的容错建议: {len(candidates)} 个候选, {len(suggestions)} 个建议。")
+            return suggestions
+        except sqlite3.Error as e:
+            logger.error(f"查询标签建议失败: {e} (Term: {term})", exc_info=True)
+            return []
+
+    @_serialized_write
+    def import_label_assignments(self, rows):
+        """
+        导入一批 (音频路径, 标签名) 标签关联，单个事务提交（供 core.label_io 批量导入使用）。
+        整批先写入临时表，再用几条集合语句创建缺少的音频和标签并解析 id，不逐行查询。
+        导入后补全索引整体重新加载，而不是逐个标签重新计数。
+
+        Returns:
+            int: 新增的标签关联数量（已存在的关联不计）；失败时返回 -1。
+        """
+        splits = {} # 同一音频的多个标签相邻出现，每个路径只拆分一次
+        keys = []
+        for path, label in rows:
+            if path and label:
+                split = splits.get(path)
+                if split is None:
+                    split = splits[path] = _split_path(path)
+                keys.append((split[0], split[1], label))
+        if not keys:
+            return 0
+        # 大批量导入期间由 begin/end_bulk_label_import 统一设置和恢复页缓存；单独导入一批时在本方法内恢复
+        previous_cache_size = None if self._in_bulk_label_import() else self._enlarge_cache()
+        try:
+            directory_ids = self._ensure_directory_ids({directory for directory, _name in splits.values()})
+            self.cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS bulk_label_import (directory_id INTEGER, name TEXT, label TEXT)
+            ''')
+            self.cursor.execute("DELETE FROM bulk_label_import")
+            self.cursor.executemany("INSERT INTO bulk_label_import (directory_id, name, label) VALUES (?, ?, ?)",
+                                    [(directory_ids[directory], name, label) for directory, name, label in keys])
+            # 只插入不存在的标签（反连接比 INSERT OR IGNORE 逐行触发冲突快得多）
+            self.cursor.execute('''
+                INSERT INTO labels (name)
+                SELECT DISTINCT b.label FROM bulk_label_import b LEFT JOIN labels l ON l.name = b.label WHERE l.id IS NULL
+            ''')
+            self.cursor.execute("INSERT OR IGNORE INTO audios (directory_id, name) SELECT DISTINCT directory_id, name FROM bulk_label_import")
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO audio_labels (audio_id, label_id)
+                SELECT a.id, l.id
+                FROM bulk_label_import b
+                JOIN audios a ON a.directory_id = b.directory_id AND a.name = b.name
+                JOIN labels l ON l.name = b.label
+            ''')
+            added = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM bulk_label_import")
+            if added:
+                self.cursor.execute(self._BUMP_LABEL_GENERATION_SQL) # 大批量导入期间 audio_labels 上没有写代数触发器
+            self.conn.commit()
+            if added:
+                with self._label_trie_lock:
+                    self._label_trie = None # 下次使用时重新加载
+            return added
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"批量导入标签失败: {e} ({len(keys)} 条)", exc_info=True)
+            return -1
+        finally:
+            if previous_cache_size is not None:
+                self._restore_cache(previous_cache_size)
+
+    def _in_bulk_label_import(self):
+        return getattr(self._thread_state(), 'bulk_import_cache_size', None) is not None
+
+    def _enlarge_cache(self):
+        """把当前线程连接的页缓存调大到 BULK_IMPORT_CACHE_KIB，返回原来的 cache_size 设置。"""
+        previous = self.cursor.execute("PRAGMA cache_size").fetchone()[0]
+        self.cursor.execute(f"PRAGMA cache_size = -{BULK_IMPORT_CACHE_KIB}")
+        return previous
+
+    def _restore_cache(self, previous):
+        try:
+            self.cursor.execute(f"PRAGMA cache_size = {int(previous)}")
+        except sqlite3.Error as e:
+            logger.warning(f"恢复页缓存大小失败: {e}")
+
+    @_timed
+    def count_label_assignments(self):
+        """Returns: int: 标签关联总数；失败时返回 -1。"""
+        try:
+            return self.cursor.execute("SELECT COUNT(*) FROM audio_labels").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"统计标签关联数量失败: {e}", exc_info=True)
+            return -1
+
+    @_serialized_write
+    def begin_bulk_label_import(self):
+        """
+        开始大批量导入：暂时删除 idx_audio_labels_label 索引和标签计数触发器，导入结束后由 end_bulk_label_import
+        一次性排序重建索引、重新统计 label_stats，比逐行随机插入索引和更新计数快得多。
+        导入期间按标签搜索会变慢；程序被中断时，下次启动会重新创建索引和触发器并重新统计（见 _create_tables）。
+
+        Returns:
+            bool: 是否成功暂停了索引维护。
+        """
+        try:
+            if not self._in_bulk_label_import():
+                # 导入期间当前线程的连接使用较大的页缓存，end_bulk_label_import 时恢复
+                self._thread_state().bulk_import_cache_size = self._enlarge_cache()
+            self.cursor.execute("DROP INDEX IF EXISTS idx_audio_labels_label")
+            for trigger in self._LABEL_STATS_TRIGGERS + self._BULK_IMPORT_GENERATION_TRIGGERS:
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self.conn.commit()
+            logger.info("已暂停标签索引和使用次数的维护，开始大批量导入。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            self._finish_bulk_import_cache()
+            logger.error(f"准备大批量导入失败: {e}", exc_info=True)
+            return False
+
+    def _finish_bulk_import_cache(self):
+        state = self._thread_state()
+        previous = getattr(state, 'bulk_import_cache_size', None)
+        if previous is not None:
+            state.bulk_import_cache_size = None
+            self._restore_cache(previous)
+
+    @_serialized_write
+    def end_bulk_label_import(self):
+        """结束大批量导入：重建 idx_audio_labels_label 索引，重新统计标签使用次数并恢复计数触发器。"""
+        try:
+            start = time.perf_counter()
+            self.cursor.execute(self._AUDIO_LABELS_LABEL_INDEX_SQL)
+            self._rebuild_label_stats() # 借助刚重建的索引按标签顺序统计
+            self.cursor.execute(self._BUMP_LABEL_GENERATION_SQL)
+            self.conn.commit()
+            self.cursor.executescript(self._LABEL_STATS_TRIGGERS_SQL + self._LABEL_GENERATION_TRIGGERS_SQL)
+            logger.info(f"已重建标签索引和使用次数，耗时 {time.perf_counter() - start:.2f}s。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"重建标签索引失败: {e}", exc_info=True)
+            return False
+        finally:
+            self._finish_bulk_import_cache()
+
+    def iter_label_assignments(self, fetch_size=EXPORT_FETCH_SIZE):
+        """
+        逐批读取所有 (音频路径, 标签名) 标签关联（供 core.label_io 导出使用），内存占用与标签数量无关。
+        按 audio_labels 主键顺序读取，同一音频的标签相邻，不需要额外排序。
+
+        Yields:
+            tuple: (path, label)
+        """
+        cursor = self.conn.cursor() # 独立游标，遍历期间不影响其他查询
+        try:
+            cursor.execute('''
+                SELECT d.path || a.name AS path, l.name AS label
+                FROM audio_labels al
+                JOIN audios a ON a.id = al.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                JOIN labels l ON l.id = al.label_id
+                ORDER BY al.audio_id, al.label_id
+            ''')
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0], row[1]
+        except sqlite3.Error as e:
+            logger.error(f"读取标签关联失败: {e}", exc_info=True)
+        finally:
+            cursor.close()
+
+    def _rebuild_label_stats(self):
+        """
+        按 audio_labels 重新统计 label_stats（不提交事务）。
+        使用次数增加的标签把最近使用时间记为现在，其余标签保留原来的时间。
+        """
+        self.cursor.execute("DELETE FROM label_stats WHERE label_id NOT IN (SELECT id FROM labels)")
+        self.cursor.execute('''
+            INSERT OR REPLACE INTO label_stats (label_id, usage_count, last_used)
+            SELECT l.id, counts.usage_count,
+                   CASE WHEN counts.usage_count > IFNULL(s.usage_count, 0) THEN ? ELSE s.last_used END
+            FROM labels l
+            JOIN (SELECT label_id, COUNT(*) AS usage_count FROM audio_labels GROUP BY label_id) counts
+                ON counts.label_id = l.id
+            LEFT JOIN label_stats s ON s.label_id = l.id
+        ''', (time.time(),))
+        # 没有任何关联的标签
+        self.cursor.execute('''
+            INSERT OR REPLACE INTO label_stats (label_id, usage_count, last_used)
+            SELECT l.id, 0, s.last_used
+            FROM labels l
+            LEFT JOIN label_stats s ON s.label_id = l.id
+            WHERE NOT EXISTS (SELECT 1 FROM audio_labels al WHERE al.label_id = l.id)
+        ''')
+
+    def _label_usage_counts(self, where_sql="", params=()):
+        """返回 [(标签名, 使用该标签的音频数), ...]，可用 where_sql 限定 labels 表（别名 l）的范围。"""
+        self.cursor.execute(f'''
+            SELECT l.name, IFNULL(s.usage_count, 0) AS usage_count
+            FROM labels l
+            LEFT JOIN label_stats s ON s.label_id = l.id
+            {where_sql}
+        ''', params)
+        return [(row['name'], row['usage_count']) for row in self.cursor.fetchall()]
+
+    @_timed
+    def get_label_trie(self):
+        """
+        返回标签自动补全用的前缀索引（core.label_trie.LabelTrie），首次调用时从 labels 表加载。
+        之后通过本类写入标签时会增量更新，无需重新加载。
+
+        Returns:
+            LabelTrie | None: 加载失败时返回 None（下次调用会重试）。
+        """
+        with self._label_trie_lock:
+            if self._label_trie is None:
+                try:
+                    trie = LabelTrie()
+                    with self._label_snapshot_lock:
+                        snapshot = self._fresh_label_snapshot()
+                        # 快照与数据库一致时从快照中读取标签名和使用次数，启动时不必扫描标签表
+                        trie.build(snapshot.label_counts() if snapshot is not None else self._label_usage_counts())
+                    self._label_trie = trie
+                    logger.info(f"标签自动补全索引已加载，共 {len(trie)} 个标签。")
+                except sqlite3.Error as e:
+                    logger.error(f"加载标签自动补全索引失败: {e}", exc_info=True)
+            return self._label_trie
+
+    def complete_labels(self, prefix, limit=10):
+        """
+        标签名自动补全：返回以 prefix 开头（不区分大小写）的标签，按使用次数从多到少排列。
+
+        Returns:
+            list: 标签名列表。
+        """
+        trie = self.get_label_trie()
+        if trie is None or not prefix:
+            return []
+        return trie.complete(prefix, limit)
+
+    # 浏览标签的排序方式 -> label_stats 上对应索引的排序列
+    _LABEL_BROWSE_ORDERS = {'usage': 'usage_count', 'recent': 'last_used'}
+
+    @_timed
+    def count_used_labels(self):
+        """Returns: int: 至少用于一个音频的标签数量；失败时返回 -1。"""
+        try:
+            return self.cursor.execute("SELECT COUNT(*) FROM label_stats WHERE usage_count > 0").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"统计标签数量失败: {e}", exc_info=True)
+            return -1
+
+    @_timed
+    def get_label_usage_page(self, order='usage', after=None, limit=LABEL_BROWSE_PAGE_SIZE):
+        """
+        按使用次数（order='usage'）或最近使用时间（order='recent'）从高到低分页列出标签，只包含正在使用的标签。
+        沿 label_stats 上的索引按键集定位，每页的开销只与页大小有关。
+
+        Args:
+            after (tuple, optional): 上一次调用返回的 next_key；为 None 时从第一页开始。
+
+        Returns:
+            tuple: ([(标签名, 使用次数, 最近使用时间), ...], next_key)。next_key 为 None 表示已经是最后一页；
+                   查询失败时返回 ([], None)。
+        """
+        column = self._LABEL_BROWSE_ORDERS[order]
+        # 一元加号使 usage_count > 0 只作为逐行过滤条件，不占用排序列上的索引范围
+        condition = "+usage_count > 0" if order == 'usage' else "+usage_count > 0 AND last_used IS NOT NULL"
+        if after is None:
+            ids_sql = f"SELECT label_id FROM label_stats WHERE {condition} ORDER BY {column} DESC, label_id DESC LIMIT ?"
+            params = [limit]
+        else:
+            # 键集拆成"排序值相同、id 更小"和"排序值更小"两段，各自是一次索引定位；
+            # 写成行值比较时 SQLite 只用第一列定位，大量次数相同的标签（例如只用过一次的）会被每页重复扫描
+            ids_sql = f'''
+                SELECT label_id FROM (SELECT label_id FROM label_stats
+                                      WHERE {column} = ? AND label_id < ? AND {condition}
+                                      ORDER BY label_id DESC LIMIT ?)
+                UNION ALL
+                SELECT label_id FROM (SELECT label_id FROM label_stats
+                                      WHERE {column} < ? AND {condition}
+                                      ORDER BY {column} DESC, label_id DESC LIMIT ?)
+            '''
+            params = [after[0], after[1], limit, after[0], limit]
+        try:
+            self.cursor.execute(f'''
+                SELECT l.name, s.usage_count, s.last_used, s.{column} AS sort_key, s.label_id
+                FROM ({ids_sql}) page
+                JOIN label_stats s ON s.label_id = page.label_id
+                JOIN labels l ON l.id = s.label_id
+                ORDER BY s.{column} DESC, s.label_id DESC
+                LIMIT ?
+            ''', params + [limit])
+            rows = self.cursor.fetchall()
+            labels = [(row['name'], row['usage_count'], row['last_used']) for row in rows]
+            next_key = (rows[-1]['sort_key'], rows[-1]['label_id']) if len(rows) == limit else None
+            return labels, next_key
+        except sqlite3.Error as e:
+            logger.error(f"分页读取标签失败: {e} (排序: {order})", exc_info=True)
+            return [], None
+
+    def _refresh_label_trie(self, where_sql, params):
+        """标签写入提交后，更新已加载的补全索引中受影响标签的使用次数；索引尚未加载时无需处理。"""
+        if self._label_trie is None:
+            return
+        try:
+            for name, usage_count in self._label_usage_counts(where_sql, params):
+                self._label_trie.set_count(name, usage_count)
+        except sqlite3.Error as e:
+            logger.warning(f"更新标签自动补全索引失败: {e}")
+
+    def _resolve_label_ids(self, names, create=True):
+        """
+        将标签名（或别名）解析为标签 id，不存在的标签在 create 为 True 时创建（不提交）。
+
+        Returns:
+            dict: {名称: 标签 id}，无法解析的名称不在结果中。
+        """
+        label_ids = {}
+        for name in dict.fromkeys(names):
+            row = self.cursor.execute("SELECT id FROM labels WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                row = self.cursor.execute("SELECT label_id FROM label_aliases WHERE alias = ?", (name,)).fetchone()
+            if row is not None:
+                label_ids[name] = row[0]
+            elif create:
+                self.cursor.execute("INSERT INTO labels (name) VALUES (?)", (name,))
+                label_ids[name] = self.cursor.lastrowid
+        return label_ids
+
+    def _move_label_subtree(self, label_id, parent_id):
+        """
+        把标签连同其所有下级标签移动到 parent_id 之下（parent_id 为 None 时成为顶级标签），只修改 label_tree，
+        audio_labels 不变。先删除子树与原祖先之间的行，再插入新祖先与子树的笛卡尔积。
+
+        Returns:
+            bool | None: 已移动返回 True；父标签本来就是 parent_id 时返回 None；
+                         parent_id 是该标签自身或其下级标签（会形成环）时返回 False。
+        """
+        current = self.cursor.execute(
+            "SELECT ancestor_id FROM label_tree WHERE descendant_id = ? AND depth = 1", (label_id,)).fetchone()
+        if (current[0] if current else None) == parent_id:
+            return None
+        if parent_id is not None and self.cursor.execute(
+                "SELECT 1 FROM label_tree WHERE ancestor_id = ? AND descendant_id = ?", (label_id, parent_id)).fetchone():
+            return False
+        self.cursor.execute('''
+            DELETE FROM label_tree
+            WHERE descendant_id IN (SELECT descendant_id FROM label_tree WHERE ancestor_id = ?)
+              AND ancestor_id IN (SELECT ancestor_id FROM label_tree WHERE descendant_id = ? AND depth > 0)
+        ''', (label_id, label_id))
+        if parent_id is not None:
+            self.cursor.execute('''
+                INSERT INTO label_tree (ancestor_id, descendant_id, depth)
+                SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+                FROM label_tree sup
+                CROSS JOIN label_tree sub
+                WHERE sup.descendant_id = ? AND sub.ancestor_id = ?
+            ''', (parent_id, label_id))
+        return True
+
+    def _set_label_parents(self, pairs):
+        """set_label_parents 的实现（不提交），返回实际移动的标签数。"""
+        pairs = [(label, parent or None) for label, parent in pairs if label]
+        label_ids = self._resolve_label_ids([name for pair in pairs for name in pair if name])
+        moved = 0
+        for label, parent in pairs:
+            result = self._move_label_subtree(label_ids[label], label_ids[parent] if parent else None)
+            if result is False:
+                logger.warning(f"无法把标签 '{label}' 移动到 '{parent}' 之下：'{parent}' 是它自身或它的下级标签。")
+            elif result:
+                moved += 1
+        return moved
+
+    @_serialized_write
+    def set_label_parents(self, pairs):
+        """
+        批量设置标签的父标签（在单个事务中完成）。标签的所有下级标签随之移动，audio_labels 不需要改写，
+        按上级标签搜索立即包含移动过来的子树。不存在的标签会自动创建；名称也可以是别名。
+        会形成环的移动被跳过并记录警告。
+
+        Args:
+            pairs (iterable): [(标签名, 父标签名), ...]，父标签名为 None 或空字符串时成为顶级标签。
+
+        Returns:
+            int: 实际移动的标签数；失败时返回 -1。
+        """
+        try:
+            moved = self._set_label_parents(list(pairs))
+            self.conn.commit()
+            logger.info(f"已调整 {moved} 个标签的父标签。")
+            return moved
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"设置父标签失败: {e}", exc_info=True)
+            return -1
+
+    @_serialized_write
+    def link_label_paths(self, separator='/'):
+        """
+        按路径形式的标签名建立层级：例如 "weapons/gun/pistol" 成为 "weapons/gun" 的下级，"weapons/gun" 又是
+        "weapons" 的下级，缺少的上级标签自动创建。已有的标签和 audio_labels 都不改名、不改写。
+
+        Returns:
+            int: 实际移动的标签数；失败时返回 -1。
+        """
+        try:
+            self.cursor.execute("SELECT name FROM labels WHERE instr(name, ?) > 0", (separator,))
+            pairs = {}
+            for (name,) in self.cursor.fetchall():
+                while separator in name:
+                    parent = name.rsplit(separator, 1)[0]
+                    if not parent.strip() or name in pairs:
+                        break
+                    pairs[name] = parent
+                    name = parent
+            moved = self._set_label_parents(pairs.items())
+            self.conn.commit()
+            logger.info(f"按 '{separator}' 分隔的标签名建立层级：检查 {len(pairs)} 个标签，移动 {moved} 个。")
+            return moved
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"按标签名建立层级失败: {e}", exc_info=True)
+            return -1
+
+    @_serialized_write
+    def set_label_aliases(self, pairs):
+        """
+        批量添加（或改指向）标签别名，按别名搜索等同于按目标标签搜索（包括其下级标签）。
+        不存在的目标标签会自动创建；与已有标签同名的别名被跳过。
+
+        Args:
+            pairs (iterable): [(别名, 标签名), ...]
+
+        Returns:
+            int: 写入的别名数；失败时返回 -1。
+        """
+        pairs = [(alias.strip(), label) for alias, label in pairs if alias and alias.strip() and label]
+        try:
+            label_ids = self._resolve_label_ids(label for _alias, label in pairs)
+            saved = 0
+            for alias, label in pairs:
+                if self.cursor.execute("SELECT 1 FROM labels WHERE name = ? COLLATE NOCASE", (alias,)).fetchone():
+                    logger.warning(f"别名 '{alias}' 与已有标签同名，已跳过。")
+                    continue
+                self.cursor.execute("INSERT OR REPLACE INTO label_aliases (alias, label_id) VALUES (?, ?)",
+                                    (alias, label_ids[label]))
+                saved += 1
+            self.conn.commit()
+            return saved
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"添加标签别名失败: {e}", exc_info=True)
+            return -1
+
+    @_serialized_write
+    def remove_label_aliases(self, aliases):
+        """删除标签别名，返回删除的数量；失败时返回 -1。"""
+        try:
+            self.cursor.executemany("DELETE FROM label_aliases WHERE alias = ?", [(alias,) for alias in aliases])
+            removed = self.cursor.rowcount
+            self.conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"删除标签别名失败: {e}", exc_info=True)
+            return -1
+
+    def get_label_subtree(self, label_name):
+        """
+        标签（或别名指向的标签）及其所有下级标签。
+
+        Returns:
+            list: [(标签名, 层级深度, 父标签名), ...]，标签自身深度为 0，按深度和名称排列；顶级标签的父标签名为 None。
+        """
+        try:
+            self.cursor.execute(f'''
+                SELECT l.name, t.depth, pl.name AS parent_name
+                FROM label_tree t
+                JOIN labels l ON l.id = t.descendant_id
+                LEFT JOIN label_tree pt ON pt.descendant_id = t.descendant_id AND pt.depth = 1
+                LEFT JOIN labels pl ON pl.id = pt.ancestor_id
+                WHERE t.ancestor_id = (SELECT id FROM ({self._NAMED_LABEL_IDS_SQL}) LIMIT 1)
+                ORDER BY t.depth, l.name
+            ''', (label_name, label_name))
+            return [(row['name'], row['depth'], row['parent_name']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询下级标签失败: {e} (Label: {label_name})", exc_info=True)
+            return []
+
+    def get_label_ancestors(self, label_name):
+        """标签的所有上级标签名，从顶级标签到直接父标签排列。"""
+        try:
+            self.cursor.execute('''
+                SELECT l.name
+                FROM labels d
+                JOIN label_tree t ON t.descendant_id = d.id AND t.depth > 0
+                JOIN labels l ON l.id = t.ancestor_id
+                WHERE d.name = ?
+                ORDER BY t.depth DESC
+            ''', (label_name,))
+            return [row['name'] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询上级标签失败: {e} (Label: {label_name})", exc_info=True)
+            return []
+
+    def get_label_aliases(self, label_name):
+        """指向该标签的所有别名。"""
+        try:
+            self.cursor.execute('''
+                SELECT la.alias
+                FROM labels l
+                JOIN label_aliases la ON la.label_id = l.id
+                WHERE l.name = ?
+                ORDER BY la.alias
+            ''', (label_name,))
+            return [row['alias'] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询标签别名失败: {e} (Label: {label_name})", exc_info=True)
+            return []
+
+    def get_label_generation(self):
+        """
+        Returns:
+            tuple | None: (数据库实例标识, 标签写代数)，查询失败时返回 None。
+        """
+        try:
+            row = self.cursor.execute("SELECT instance, generation FROM label_index_state WHERE id = 0").fetchone()
+            return (row['instance'], row['generation']) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"查询标签写代数失败: {e}", exc_info=True)
+            return None
+
+    def _open_label_snapshot(self):
+        """返回已映射的标签快照，必要时打开快照文件；文件不存在或无效时返回 None。调用方持有 _label_snapshot_lock。"""
+        if self._label_snapshot is None:
+            snapshot_path = self._get_label_snapshot_path()
+            if not os.path.exists(snapshot_path):
+                return None
+            try:
+                self._label_snapshot = LabelSnapshot(snapshot_path)
+                logger.info(f"已映射标签快照 '{snapshot_path}'，共 {self._label_snapshot.label_count} 个标签、"
+                            f"{self._label_snapshot.audio_count} 个音频。")
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法打开标签快照 '{snapshot_path}': {e}")
+                return None
+        return self._label_snapshot
+
+    def _fresh_label_snapshot(self):
+        """快照与数据库当前的写代数一致时返回快照，否则返回 None（调用方退回 SQLite）。调用方持有 _label_snapshot_lock。"""
+        snapshot = self._open_label_snapshot()
+        if snapshot is None:
+            return None
+        if (snapshot.instance, snapshot.generation) != self.get_label_generation():
+            return None
+        return snapshot
+
+    def label_snapshot_is_stale(self, current=None):
+        """快照不存在、属于另一个数据库或落后于 current（默认为数据库当前的写代数）时返回 True。"""
+        if current is None:
+            current = self.get_label_generation()
+        with self._label_snapshot_lock:
+            snapshot = self._open_label_snapshot()
+            return snapshot is None or (snapshot.instance, snapshot.generation) != current
+
+    @_timed
+    def write_label_snapshot(self):
+        """
+        在一个读事务中导出标签、别名、层级和标签关联，写入标签快照（见 core.label_snapshot）。
+        先写临时文件再替换，写入失败时保留原有快照（它已过期，查询会退回 SQLite）。
+
+        Returns:
+            bool: 是否写入成功。
+        """
+        snapshot_path = self._get_label_snapshot_path()
+        temp_path = snapshot_path + ".tmp"
+        start = time.perf_counter()
+        try:
+            self.cursor.execute("BEGIN") # 各次查询看到同一个数据库版本
+            try:
+                instance, generation = self.cursor.execute(
+                    "SELECT instance, generation FROM label_index_state WHERE id = 0").fetchone()
+                label_ids, label_names = [], []
+                for label_id, name in self.cursor.execute("SELECT id, name FROM labels ORDER BY id"):
+                    label_ids.append(label_id)
+                    label_names.append(name)
+                label_index = {label_id: index for index, label_id in enumerate(label_ids)}
+                keys = list(zip(label_names, range(len(label_names))))
+                keys += [(alias, label_index[label_id])
+                         for alias, label_id in self.cursor.execute("SELECT alias, label_id FROM label_aliases")
+                         if label_id in label_index]
+                audio_index, paths = {}, []
+                self.cursor.execute('''
+                    SELECT a.id, d.path || a.name
+                    FROM audios a
+                    JOIN directories d ON d.id = a.directory_id
+                    WHERE a.id IN (SELECT audio_id FROM audio_labels)
+                    ORDER BY a.id
+                ''')
+                for audio_id, path in self.cursor:
+                    audio_index[audio_id] = len(paths)
+                    paths.append(path)
+                postings = self._grouped_positions(
+                    "SELECT label_id, audio_id FROM audio_labels ORDER BY label_id, audio_id", label_index, audio_index)
+                descendants = self._grouped_positions(
+                    "SELECT ancestor_id, descendant_id FROM label_tree WHERE depth > 0 ORDER BY ancestor_id, depth",
+                    label_index, label_index)
+            finally:
+                self.conn.rollback() # 只读事务
+            write_snapshot(temp_path, instance, generation, label_names, keys, postings, descendants, paths)
+            with self._label_snapshot_lock:
+                if self._label_snapshot is not None: # 先解除映射，Windows 上被映射的文件不能被替换
+                    self._label_snapshot.close()
+                    self._label_snapshot = None
+                os.replace(temp_path, snapshot_path)
+            logger.info(f"标签快照已写入 '{snapshot_path}'（写代数 {generation}，{len(label_names)} 个标签、"
+                        f"{len(postings[1])} 条关联），耗时 {time.perf_counter() - start:.2f} 秒。")
+            return True
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"写入标签快照失败: {e}", exc_info=True)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+
+    def _grouped_positions(self, sql, group_index, value_index):
+        """
+        把按分组列排序的 (分组 id, 值 id) 查询结果转换为 (起止位置数组, 值序号数组)，
+        分组按 group_index 中的序号排列，没有行的分组起止位置相同。
+        """
+        offsets, values = array('I', [0]), array('I')
+        for group_id, value_id in self.cursor.execute(sql):
+            position = value_index.get(value_id)
+            group = group_index.get(group_id)
+            if position is None or group is None: # 外键约束未启用，关联行可能指向已不存在的标签或音频
+                continue
+            while len(offsets) <= group:
+                offsets.append(len(values))
+            values.append(position)
+        while len(offsets) <= len(group_index):
+            offsets.append(len(values))
+        return offsets, values
+
+    @_timed
+    def get_audios_with_label(self, label_name, include_descendants=True):
+        """
+        带有该标签（名称或别名，不区分大小写）的所有音频路径，include_descendants 时还包括其所有下级标签，按音频 id 排列。
+        标签快照与数据库一致时直接从映射的快照中读取，不访问数据库中的标签表；否则退回 SQLite。
+
+        Returns:
+            list: 音频完整路径列表。
+        """
+        with self._label_snapshot_lock:
+            snapshot = self._fresh_label_snapshot()
+            if snapshot is not None:
+                return snapshot.audio_paths(label_name, include_descendants)
+        depth_sql = "" if include_descendants else "AND t.depth = 0"
+        try:
+            self.cursor.execute(f'''
+                SELECT d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                WHERE a.id IN (
+                    SELECT al.audio_id
+                    FROM label_tree t
+                    JOIN audio_labels al ON al.label_id = t.descendant_id
+                    WHERE t.ancestor_id IN ({self._NAMED_LABEL_IDS_SQL}) {depth_sql}
+                )
+                ORDER BY a.id
+            ''', (label_name, label_name))
+            return [row['path'] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询标签的音频失败: {e} (Label: {label_name})", exc_info=True)
+            return []
+
+    # 可过滤的流属性列，对应 audio_properties 表
+    _PROPERTY_FILTER_COLUMNS = ('duration_ms', 'sample_rate', 'channels', 'file_size')
+
+    # 试听热度：最近播放时间加上按播放次数折算的秒数（从未试听过的为 0），取负值使热度高的排在前面。
+    # 不依赖当前时间，同一次搜索的各页排序保持一致
+    _PLAY_SCORE_SQL = (f"-(IFNULL(ps.last_played, 0) + {PLAY_COUNT_BOOST_SECONDS} * "
+                       f"MIN(IFNULL(ps.play_count, 0), {PLAY_COUNT_BOOST_CAP}))")
+
+    @classmethod
+    def _relevance_sql(cls, term):
+        """
+        搜索词的相关度档次：0 标签与搜索词完全相同（不区分大小写），1 标签以搜索词开头或是该标签（或别名）的下级标签，
+        2 标签包含搜索词，3 只有文件名包含搜索词，4 只有内嵌元数据匹配。
+        只查看该音频自己的几个标签（audio_labels 主键范围），不扫描全表；下级标签集合只计算一次。
+
+        Returns:
+            tuple: (sql, params)
+        """
+        pattern = _escape_like(term)
+        subtree_sql = f"SELECT t.descendant_id FROM label_tree t WHERE t.ancestor_id IN ({cls._NAMED_LABEL_IDS_SQL})"
+        sql = f'''IFNULL(
+            (SELECT MIN(CASE WHEN rl_l.name = ? COLLATE NOCASE THEN 0
+                             WHEN rl_l.name LIKE ? ESCAPE '\\' OR rl.label_id IN ({subtree_sql}) THEN 1 ELSE 2 END)
+             FROM audio_labels rl JOIN labels rl_l ON rl_l.id = rl.label_id
+             WHERE rl.audio_id = a.id AND (rl_l.name LIKE ? ESCAPE '\\' OR rl.label_id IN ({subtree_sql}))),
+            CASE WHEN a.name LIKE ? ESCAPE '\\' THEN 3 ELSE 4 END)'''
+        return sql, [term, pattern + '%', term, term, f"%{pattern}%", term, term, f"%{pattern}%"]
+
+    def _search_query_parts(self, label_term, filters):
+        """
+        将标签搜索词与结构化过滤条件编译为 FROM/WHERE 子句和按相关度排列的排序键。
+        只在用到相应字段时才连接 audio_analysis / audio_properties，过滤条件直接作用在带索引的列上。
+        排序依次为：相关度档次（见 _relevance_sql，布尔查询不分档）、试听热度、速度（按速度过滤时）、路径。
+
+        Returns:
+            tuple: (from_sql, where_sql, params, order_keys, order_params)，order_keys 为排序列表达式的元组，
+                   以 (d.path, a.name) 结尾，因此排序是确定的（各页之间不会重复或遗漏）；order_params 为排序表达式中的参数。
+        """
+        conditions = []
+        params = []
+        uses_analysis = False
+        uses_properties = False
+        for field, op, value in filters:
+            if field == 'bpm':
+                uses_analysis = True
+                if op == 'between':
+                    conditions.append("an.bpm BETWEEN ? AND ?")
+                    params.extend(value)
+                elif op == '=':
+                    # 速度是估计值，等值匹配放宽到 ±0.5 BPM
+                    conditions.append("an.bpm BETWEEN ? AND ?")
+                    params.extend((value - 0.5, value + 0.5))
+                else:
+                    conditions.append(f"an.bpm {op} ?")
+                    params.append(value)
+            elif field == 'key':
+                uses_analysis = True
+                conditions.append("an.key_root = ? AND an.key_mode = ?")
+                params.extend(value)
+            elif field in self._PROPERTY_FILTER_COLUMNS:
+                uses_properties = True
+                if op == 'between':
+                    conditions.append(f"p.{field} BETWEEN ? AND ?")
+                    params.extend(value)
+                else:
+                    conditions.append(f"p.{field} {op} ?")
+                    params.append(value)
+            elif field == 'folder':
+                # 目录子树是 directories.path 上的一个连续区间，走唯一索引的范围扫描
+                conditions.append("d.path >= ? AND d.path < ?")
+                params.extend(_directory_range(value))
+            elif field == 'label':
+                match_sql, match_params = self._label_term_match_sql(value)
+                conditions.append(f"a.id IN ({match_sql})")
+                params.extend(match_params)
+            else:
+                logger.warning(f"忽略未知的搜索过滤字段: {field}")
+
+        if label_term:
+            match_sql, match_params = self._label_term_match_sql(label_term)
+            conditions.append(f"a.id IN ({match_sql})")
+            params.extend(match_params)
+
+        from_sql = "audios a JOIN directories d ON d.id = a.directory_id"
+        if uses_analysis:
+            from_sql += " JOIN audio_analysis an ON an.audio_id = a.id"
+        if uses_properties:
+            from_sql += " JOIN audio_properties p ON p.audio_id = a.id"
+        from_sql += " LEFT JOIN audio_play_stats ps ON ps.audio_id = a.id"
+
+        order_keys = []
+        order_params = []
+        # 相关度按普通搜索词计算；只有显式标签子句（例如 label "impact"）时按该标签计算
+        rank_term = label_term if label_term and not is_boolean_query(label_term) else None
+        if not label_term:
+            rank_term = next((value for field, _op, value in filters if field == 'label' and not is_boolean_query(value)), None)
+        if rank_term and rank_term.strip():
+            relevance_sql, relevance_params = self._relevance_sql(rank_term.strip())
+            order_keys.append(relevance_sql)
+            order_params.extend(relevance_params)
+        order_keys.append(self._PLAY_SCORE_SQL)
+        if uses_analysis:
+            order_keys.append("IFNULL(an.bpm, -1)") # 未估计出速度的音频排在最前
+        order_keys.extend(("d.path", "a.name"))
+        return from_sql, " AND ".join(conditions) or "1", params, tuple(order_keys), order_params
+
+    @_cached('_search_cache', _search_key, '_search_cache_generation')
+    @_timed
+    def search_audios(self, label_term, filters):
+        """
+        按标签搜索词与结构化过滤条件组合搜索音频。
+        过滤条件直接作用在带索引的数值列上（索引范围扫描），不在 Python 中逐条过滤。
+
+        Args:
+            label_term (str): 标签搜索词，为空时只按过滤条件搜索。
+            filters (list): [(字段, 运算符, 值), ...]，见 core.search_filters.parse_search_query。
+
+        Returns:
+            list: 匹配的音频路径。
+        """
+        try:
+            from_sql, where_sql, params, order_keys, order_params = self._search_query_parts(label_term, filters)
+            self.cursor.execute(f'''
+                SELECT d.path || a.name AS path
+                FROM {from_sql}
+                WHERE {where_sql}
+                ORDER BY {", ".join(order_keys)}
+            ''', params + order_params)
+            results = [row['path'] for row in self.cursor.fetchall()]
+            logger.debug(f"组合搜索 (标签: '{label_term}', 条件: {filters}) 找到 {len(results)} 个音频文件。")
+            return results
+        except sqlite3.Error as e:
+            logger.error(f"组合搜索音频失败: {e} (Label: {label_term}, Filters: {filters})", exc_info=True)
+            self._mark_query_failed()
+            return []
+
+    @_cached('_ranked_ids_cache', _search_key, '_search_cache_generation')
+    @_timed
+    def _ranked_audio_ids(self, label_term, filters):
+        """
+        按 _search_query_parts 的排序计算一次全部匹配，返回排好序的音频 id（array('q')），供 search_audios_page 按位置分页。
+        排序键（相关度、试听热度）是逐行计算的表达式，没有索引可用，每次计算都要遍历全部匹配；
+        物化后同一搜索的后续各页只需按 id 取回路径。查询失败时返回 None（不缓存）。
+        """
+        try:
+            from_sql, where_sql, params, order_keys, order_params = self._search_query_parts(label_term, filters)
+            # 参数按在语句中出现的顺序绑定：过滤条件在前，排序表达式在后
+            self.cursor.execute(f'''
+                SELECT a.id
+                FROM {from_sql}
+                WHERE {where_sql}
+                ORDER BY {", ".join(order_keys)}
+            ''', params + order_params)
+            return array('q', (row[0] for row in self.cursor))
+        except sqlite3.Error as e:
+            logger.error(f"计算搜索结果排序失败: {e} (Label: {label_term}, Filters: {filters})", exc_info=True)
+            self._mark_query_failed()
+            return None
+
+    @_cached('_search_cache', _search_key, '_search_cache_generation')
+    @_timed
+    def search_audios_page(self, label_term, filters, after=None, limit=RESULTS_PAGE_SIZE):
+        """
+        分页版的 search_audios：结果按相关度排列（见 _search_query_parts），第一页就是最有用的结果。
+        第一次请求某个搜索时由 _ranked_audio_ids 对全部匹配排序一次（耗时与匹配数成正比），排序结果缓存在内存中；
+        之后各页只按位置取出 limit 个 id 再按主键查询路径，翻到多深都不再计算排序键。
+        排序结果与搜索结果缓存一起失效（见 _search_cache_generation）；失效后继续翻页时重新排序，从同一位置接着取。
+
+        Args:
+            label_term (str): 标签搜索词，为空时只按过滤条件搜索。
+            filters (list): [(字段, 运算符, 值), ...]，见 core.search_filters.parse_search_query。
+            after (tuple, optional): 上一次调用返回的 next_key；为 None 时从第一页开始。
+            limit (int): 每页条数。
+
+        Returns:
+            tuple: (paths, next_key)。next_key 为 None 表示已经是最后一页；查询失败时返回 ([], None)。
+        """
+        ranked_ids = self._ranked_audio_ids(label_term, filters)
+        if ranked_ids is None:
+            self._mark_query_failed()
+            return [], None
+        start = after[0] if after is not None else 0
+        page_ids = ranked_ids[start:start + limit].tolist()
+        try:
+            self.cursor.execute(f'''
+                SELECT a.id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                WHERE a.id IN ({", ".join("?" * len(page_ids))})
+            ''', page_ids)
+            paths_by_id = {row['id']: row['path'] for row in self.cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"分页搜索音频失败: {e} (Label: {label_term}, Filters: {filters})", exc_info=True)
+            self._mark_query_failed()
+            return [], None
+        # 排序之后被删除的音频直接跳过
+        paths = [paths_by_id[audio_id] for audio_id in page_ids if audio_id in paths_by_id]
+        end = start + len(page_ids)
+        next_key = (end,) if end < len(ranked_ids) else None
+        return paths, next_key
+
+    @_cached('_search_cache', _search_key, '_search_cache_generation')
+    @_timed
+    def count_audios(self, label_term, filters):
+        """
+        统计组合搜索的匹配数量，只走索引不取回路径，可在结果列表填充前立即显示。
+
+        Returns:
+            int: 匹配数量；查询失败时返回 -1。
+        """
+        try:
+            from_sql, where_sql, params, _order_keys, _order_params = self._search_query_parts(label_term, filters)
+            row = self.cursor.execute(f"SELECT COUNT(*) FROM {from_sql} WHERE {where_sql}", params).fetchone()
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"统计搜索结果数量失败: {e} (Label: {label_term}, Filters: {filters})", exc_info=True)
+            self._mark_query_failed()
+            return -1
+
+    @_cached('_label_cache', _path_key, '_label_cache_generation')
+    @_timed
+    def get_labels_for_audio(self, audio_path):
+        """
+        获取指定音频文件的所有标签。结果按标签代数缓存（只有标签、标签关联与路径的修改使其失效），重复朗读同一文件的标签不会再查询数据库。
+        """
+        try:
+            self.cursor.execute(f'''
+                SELECT l.name
+                FROM labels l
+                JOIN audio_labels al ON l.id = al.label_id
+                JOIN audios a ON a.id = al.audio_id
+                WHERE {_AUDIO_BY_PATH_SQL}
+            ''', _split_path(audio_path))
+            results = [row['name'] for row in self.cursor.fetchall()]
+            return results
+        except sqlite3.Error as e:
+            logger.error(f"获取音频标签失败: {e} (Path: {audio_path})", exc_info=True)
+            self._mark_query_failed()
+            return []
+
+    @_timed
+    def get_audios_without_features(self, version):
+        """
+        获取尚未计算特征向量或向量版本过期的音频。
+
+        Returns:
+            list: [(audio_id, path), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                LEFT JOIN audio_features f ON f.audio_id = a.id
+                WHERE f.audio_id IS NULL OR f.version != ?
+            ''', (version,))
+            return [(row['id'], row['path']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询待计算特征的音频失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write(generation=None)
+    def save_audio_features(self, items, version):
+        """
+        批量保存特征向量，单个事务提交。
+
+        Args:
+            items (list): [(audio_path, vector_blob), ...]
+            version (int): 特征版本号。
+        """
+        try:
+            audio_ids = self._ensure_audio_ids(path for path, _ in items)
+            self.cursor.executemany('''
+                INSERT OR REPLACE INTO audio_features (audio_id, version, vector) VALUES (?, ?, ?)
+            ''', [(audio_ids[path], version, blob) for path, blob in items])
+            self.conn.commit()
+            logger.debug(f"已保存 {len(items)} 条音频特征向量。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存音频特征向量失败: {e}", exc_info=True)
+            return False
+
+    @_timed
+    def get_audio_features(self, audio_path, version):
+        """获取指定音频的特征向量字节串，不存在或版本不符时返回 None。"""
+        try:
+            self.cursor.execute(f'''
+                SELECT f.vector
+                FROM audio_features f
+                JOIN audios a ON a.id = f.audio_id
+                WHERE {_AUDIO_BY_PATH_SQL} AND f.version = ?
+            ''', (*_split_path(audio_path), version))
+            row = self.cursor.fetchone()
+            return row['vector'] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"获取音频特征向量失败: {e} (Path: {audio_path})", exc_info=True)
+            return None
+
+    @_timed
+    def load_audio_features(self, version):
+        """
+        加载全部指定版本的特征向量，用于构建内存相似度索引。
+
+        Returns:
+            list: [(audio_id, path, vector_blob), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path, f.vector
+                FROM audio_features f
+                JOIN audios a ON a.id = f.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                WHERE f.version = ?
+            ''', (version,))
+            return [(row['id'], row['path'], row['vector']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"加载音频特征向量失败: {e}", exc_info=True)
+            return []
+
+    @_timed
+    def get_audios_without_fingerprint(self, version):
+        """
+        获取尚未计算指纹或指纹版本过期的音频。
+
+        Returns:
+            list: [(audio_id, path), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                LEFT JOIN fingerprinted_audios f ON f.audio_id = a.id
+                WHERE f.audio_id IS NULL OR f.version != ?
+            ''', (version,))
+            return [(row['id'], row['path']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询待计算指纹的音频失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write(generation=None)
+    def save_fingerprints(self, items, version):
+        """
+        批量保存音频指纹，单个事务提交。
+
+        Args:
+            items (list): [(audio_path, [(hash, time_offset), ...]), ...]
+            version (int): 指纹版本号。
+        """
+        try:
+            audio_ids = self._ensure_audio_ids(audio_path for audio_path, _ in items)
+            for audio_path, hashes in items:
+                audio_id = audio_ids[audio_path]
+                if self.cursor.execute("SELECT 1 FROM fingerprinted_audios WHERE audio_id = ?", (audio_id,)).fetchone():
+                    self.cursor.execute("DELETE FROM fingerprint_hashes WHERE audio_id = ?", (audio_id,))
+                self.cursor.executemany(
+                    "INSERT OR IGNORE INTO fingerprint_hashes (hash, audio_id, time_offset) VALUES (?, ?, ?)",
+                    [(h, audio_id, offset) for h, offset in hashes])
+                self.cursor.execute(
+                    "INSERT OR REPLACE INTO fingerprinted_audios (audio_id, version, hash_count) VALUES (?, ?, ?)",
+                    (audio_id, version, len(hashes)))
+            self.conn.commit()
+            logger.debug(f"已保存 {len(items)} 个音频的指纹。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存音频指纹失败: {e}", exc_info=True)
+            return False
+
+    @_timed
+    def find_fingerprint_matches(self, min_matches, min_ratio, after_id=0, batch_size=FINGERPRINT_MATCH_BATCH):
+        """
+        查找时间对齐的指纹匹配对：只有同一哈希、且两文件中时间偏移差一致的命中才计数，偶然的哈希碰撞会被过滤掉。
+        每次只处理 audio_id 大于 after_id 的 batch_size 个源音频：
+          1. 每个源音频在 audio_id 更大的音频也有的哈希中（停用哈希除外）取倒排表最短的 FINGERPRINT_PROBE_HASHES 个，
+             在倒排表中查找 audio_id 更大的候选，对齐命中不少于 FINGERPRINT_CANDIDATE_MATCHES 的成为候选对。
+             只与更小 id 共享的哈希不参与排名，否则同一素材有多个副本时，前两个副本独有的稀有哈希会占满探测名额，
+             之后的副本（例如只保留了部分哈希的另一种格式）永远不会被探测到；这样每个副本至少与一个更大 id 的副本配对，
+             并查集（见 DuplicateDetector）即可把所有副本合为一组；
+          2. 对候选对用两者的全部哈希（主键查找）统计对齐命中数，按 min_matches 和 min_ratio 判定。
+        每个源音频的代价由探测哈希数和停用阈值限定，不再随音频数平方增长。
+
+        Returns:
+            tuple: ([(path_a, path_b), ...], 本批最后一个源音频的 id)；没有更多源音频时 id 为 None。失败时返回 ([], None)。
+        """
+        try:
+            row = self.cursor.execute('''
+                SELECT MAX(audio_id) FROM (
+                    SELECT audio_id FROM fingerprinted_audios WHERE audio_id > ? ORDER BY audio_id LIMIT ?
+                )
+            ''', (after_id, batch_size)).fetchone()
+            last_id = row[0]
+            if last_id is None:
+                return [], None
+            self.cursor.execute('''
+                WITH probes AS (
+                    SELECT audio_id, hash, time_offset FROM (
+                        SELECT h.audio_id, h.hash, h.time_offset,
+                               ROW_NUMBER() OVER (PARTITION BY h.audio_id ORDER BY st.postings, h.hash, h.time_offset) AS probe_rank
+                        FROM fingerprint_hashes h
+                        JOIN fingerprint_hash_stats st ON st.hash = h.hash
+                        WHERE h.audio_id > ? AND h.audio_id <= ? AND st.postings BETWEEN 2 AND ?
+                          AND EXISTS (SELECT 1 FROM fingerprint_hashes h3 WHERE h3.hash = h.hash AND h3.audio_id > h.audio_id)
+                    )
+                    WHERE probe_rank <= ?
+                ),
+                candidates AS (
+                    SELECT DISTINCT id_a, id_b FROM (
+                        SELECT p.audio_id AS id_a, h2.audio_id AS id_b
+                        FROM probes p
+                        JOIN fingerprint_hashes h2 ON h2.hash = p.hash AND h2.audio_id > p.audio_id
+                        GROUP BY p.audio_id, h2.audio_id, h2.time_offset - p.time_offset
+                        HAVING COUNT(*) >= ?
+                    )
+                ),
+                aligned AS (
+                    SELECT c.id_a, c.id_b, COUNT(*) AS aligned
+                    FROM candidates c
+                    JOIN fingerprint_hashes h1 ON h1.audio_id = c.id_a
+                    JOIN fingerprint_hashes h2 ON h2.hash = h1.hash AND h2.audio_id = c.id_b
+                    GROUP BY c.id_a, c.id_b, h2.time_offset - h1.time_offset
+                    HAVING aligned >= ?
+                )
+                SELECT da.path || pa.name AS path_a, db.path || pb.name AS path_b
+                FROM aligned m
+                JOIN fingerprinted_audios fa ON fa.audio_id = m.id_a
+                JOIN fingerprinted_audios fb ON fb.audio_id = m.id_b
+                JOIN audios pa ON pa.id = m.id_a
+                JOIN audios pb ON pb.id = m.id_b
+                JOIN directories da ON da.id = pa.directory_id
+                JOIN directories db ON db.id = pb.directory_id
+                WHERE m.aligned >= ? * MIN(fa.hash_count, fb.hash_count)
+                GROUP BY m.id_a, m.id_b
+            ''', (after_id, last_id, FINGERPRINT_STOP_HASH_POSTINGS, FINGERPRINT_PROBE_HASHES,
+                  FINGERPRINT_CANDIDATE_MATCHES, min_matches, min_ratio))
+            return [(row['path_a'], row['path_b']) for row in self.cursor.fetchall()], last_id
+        except sqlite3.Error as e:
+            logger.error(f"查找指纹匹配失败: {e}", exc_info=True)
+            return [], None
+
+    @_serialized_write
+    def share_labels_among(self, audio_paths):
+        """
+        让一组音频（例如同一重复组）拥有彼此标签的并集。
+
+        Returns:
+            int: 新增的标签关联数量；失败时返回 -1。
+        """
+        try:
+            audio_ids = list(self._lookup_audio_ids(audio_paths).values())
+            placeholders = ",".join("?" * len(audio_ids))
+            self.cursor.execute(f'''
+                INSERT OR IGNORE INTO audio_labels (audio_id, label_id)
+                SELECT a.id, shared.label_id
+                FROM audios a,
+                     (SELECT DISTINCT al.label_id
+                      FROM audio_labels al
+                      WHERE al.audio_id IN ({placeholders})) shared
+                WHERE a.id IN ({placeholders})
+            ''', audio_ids * 2)
+            added = self.cursor.rowcount
+            self.conn.commit()
+            if added:
+                self._refresh_label_trie(f'''
+                    WHERE l.id IN (SELECT al.label_id FROM audio_labels al
+                                   WHERE al.audio_id IN ({placeholders}))''', audio_ids)
+            logger.debug(f"已在 {len(audio_paths)} 个音频之间同步标签，新增 {added} 条关联。")
+            return added
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"同步标签失败: {e}", exc_info=True)
+            return -1
+
+    @_timed
+    def get_audios_without_metadata(self):
+        """
+        获取尚未建立内嵌元数据或流属性索引的音频。
+
+        Returns:
+            list: [(audio_id, path), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                LEFT JOIN audio_metadata m ON m.audio_id = a.id
+                LEFT JOIN audio_properties p ON p.audio_id = a.id
+                WHERE m.audio_id IS NULL OR p.audio_id IS NULL
+            ''')
+            return [(row['id'], row['path']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询待索引元数据的音频失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write
+    def save_audio_metadata(self, items):
+        """
+        批量保存内嵌元数据与流属性，单个事务提交；全文索引由触发器同步。
+
+        Args:
+            items (list): [(audio_path, tags_dict, props_dict, mtime), ...]，
+                          tags_dict 的键见 tag_reader.METADATA_FIELDS，props_dict 的键见 tag_reader.PROPERTY_FIELDS。
+        """
+        try:
+            audio_ids = self._ensure_audio_ids(path for path, _, _, _ in items)
+            self.cursor.executemany('''
+                INSERT INTO audio_metadata (audio_id, title, artist, album, comment, description, mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (audio_id) DO UPDATE SET
+                    title = excluded.title, artist = excluded.artist, album = excluded.album,
+                    comment = excluded.comment, description = excluded.description, mtime = excluded.mtime
+            ''', [(audio_ids[path], tags.get('title'), tags.get('artist'), tags.get('album'), tags.get('comment'),
+                   tags.get('description'), mtime) for path, tags, _props, mtime in items])
+            self.cursor.executemany('''
+                INSERT INTO audio_properties (audio_id, duration_ms, sample_rate, channels, file_size)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (audio_id) DO UPDATE SET
+                    duration_ms = excluded.duration_ms, sample_rate = excluded.sample_rate,
+                    channels = excluded.channels, file_size = excluded.file_size
+            ''', [(audio_ids[path], props.get('duration_ms'), props.get('sample_rate'), props.get('channels'),
+                   props.get('file_size')) for path, _tags, props, _mtime in items])
+            self.conn.commit()
+            logger.debug(f"已保存 {len(items)} 个音频的内嵌元数据。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存内嵌元数据失败: {e}", exc_info=True)
+            return False
+
+    @_timed
+    def get_audios_without_analysis(self, version):
+        """
+        获取尚未做速度/调性分析或分析版本过期的音频。
+
+        Returns:
+            list: [(audio_id, path), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                LEFT JOIN audio_analysis an ON an.audio_id = a.id
+                WHERE an.audio_id IS NULL OR an.version != ?
+            ''', (version,))
+            return [(row['id'], row['path']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询待分析的音频失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write
+    def save_music_analysis(self, items, version):
+        """
+        批量保存速度/调性分析结果，单个事务提交。
+
+        Args:
+            items (list): [(audio_path, result_dict), ...]，result_dict 见 music_analysis.analyze_file。
+            version (int): 分析版本号。
+        """
+        try:
+            audio_ids = self._ensure_audio_ids(path for path, _ in items)
+            self.cursor.executemany('''
+                INSERT OR REPLACE INTO audio_analysis
+                    (audio_id, version, bpm, bpm_confidence, key_root, key_mode, key_confidence)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(audio_ids[path], version, r['bpm'], r['bpm_confidence'], r['key_root'], r['key_mode'], r['key_confidence'])
+                  for path, r in items])
+            self.conn.commit()
+            logger.debug(f"已保存 {len(items)} 个音频的速度/调性分析结果。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存速度/调性分析结果失败: {e}", exc_info=True)
+            return False
+
+    # 以 audio_id 关联音频的表；合并重复的音频记录时需要一并迁移或清理
+    _AUDIO_DEPENDENT_TABLES = ('audio_labels', 'audio_features', 'fingerprint_hashes', 'fingerprinted_audios',
+                               'audio_metadata', 'audio_properties', 'audio_analysis', 'audio_files', 'audio_play_stats')
+
+    @_timed
+    def get_audio_file_states(self, after_id=0, limit=RECONCILE_PAGE_SIZE):
+        """
+        按 id 分页读取音频及上次核对时的文件状态，用于后台核对。
+
+        Returns:
+            list: [(audio_id, path, file_size, mtime_ns, partial_hash, missing_since, first_seen, labelled), ...]；
+                  从未核对过的音频 first_seen 为 None。
+        """
+        try:
+            self.cursor.execute('''
+                SELECT a.id, d.path || a.name AS path, f.file_size, f.mtime_ns, f.partial_hash, f.missing_since, f.first_seen,
+                       EXISTS (SELECT 1 FROM audio_labels al WHERE al.audio_id = a.id) AS labelled
+                FROM audios a
+                JOIN directories d ON d.id = a.directory_id
+                LEFT JOIN audio_files f ON f.audio_id = a.id
+                WHERE a.id > ?
+                ORDER BY a.id
+                LIMIT ?
+            ''', (after_id, limit))
+            return [tuple(row) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"读取音频文件状态失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write(generation=None)
+    def save_audio_file_states(self, present, missing, checked_at):
+        """
+        保存一批核对结果，单个事务提交。
+
+        Args:
+            present (list): 存在的文件 [(audio_id, file_size, mtime_ns, partial_hash), ...]，同时清除缺失标记；
+                            大小或修改时间有变化时清空完整哈希。
+            missing (list): 缺失文件的 audio_id；已标记缺失的保留原来的 missing_since，
+                            从未核对过的记录元数据索引中的文件大小，供移动检测按大小匹配。
+            checked_at (float): 本次核对的时间戳，作为新文件的 first_seen 和新缺失文件的 missing_since。
+        """
+        try:
+            self.cursor.executemany('''
+                INSERT INTO audio_files (audio_id, file_size, mtime_ns, partial_hash, first_seen, missing_since)
+                VALUES (?, ?, ?, ?, ?, NULL)
+                ON CONFLICT (audio_id) DO UPDATE SET
+                    file_size = excluded.file_size, mtime_ns = excluded.mtime_ns,
+                    partial_hash = excluded.partial_hash, missing_since = NULL,
+                    full_hash = CASE WHEN audio_files.file_size IS excluded.file_size AND audio_files.mtime_ns IS excluded.mtime_ns
+                                     THEN audio_files.full_hash END
+            ''', [(audio_id, file_size, mtime_ns, partial_hash, checked_at)
+                  for audio_id, file_size, mtime_ns, partial_hash in present])
+            self.cursor.executemany('''
+                INSERT INTO audio_files (audio_id, file_size, first_seen, missing_since)
+                SELECT a.id, p.file_size, ?, ? FROM audios a LEFT JOIN audio_properties p ON p.audio_id = a.id WHERE a.id = ?
+                ON CONFLICT (audio_id) DO UPDATE SET missing_since = IFNULL(audio_files.missing_since, excluded.missing_since)
+            ''', [(checked_at, checked_at, audio_id) for audio_id in missing])
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存音频文件状态失败: {e}", exc_info=True)
+            return False
+
+    @_timed
+    def find_moved_audio_candidates(self, seen_since):
+        """
+        一次连接找出所有缺失文件的移动候选：大小相同、且在 seen_since 之后才第一次核对到的现存文件。
+
+        Returns:
+            list: [(missing_id, missing_name, missing_partial_hash, missing_full_hash, found_id, found_path, found_name), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT m.audio_id AS missing_id, ma.name AS missing_name, m.partial_hash, m.full_hash,
+                       c.audio_id AS found_id, d.path || ca.name AS found_path, ca.name AS found_name
+                FROM audio_files m
+                JOIN audios ma ON ma.id = m.audio_id
+                JOIN audio_files c ON c.file_size = m.file_size AND c.first_seen >= ?
+                JOIN audios ca ON ca.id = c.audio_id
+                JOIN directories d ON d.id = ca.directory_id
+                WHERE m.missing_since IS NOT NULL AND m.file_size IS NOT NULL AND c.missing_since IS NULL
+                ORDER BY m.audio_id, c.audio_id
+            ''', (seen_since,))
+            return [tuple(row) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查找移动文件候选失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write
+    def relink_moved_audios(self, pairs):
+        """
+        将缺失的音频记录重新链接到移动后的位置，单个事务提交。
+        保留原记录的 id（标签、特征、指纹、分析结果都随之保留），新位置上的记录并入后删除。
+
+        Args:
+            pairs (list): [(missing_id, found_id), ...]
+
+        Returns:
+            int: 重新链接的数量；失败时返回 -1。
+        """
+        try:
+            for missing_id, found_id in pairs:
+                location = self.cursor.execute("SELECT directory_id, name FROM audios WHERE id = ?", (found_id,)).fetchone()
+                if location is None:
+                    continue
+                # 新位置上已经打过的标签并入原记录
+                self.cursor.execute('''
+                    INSERT OR IGNORE INTO audio_labels (audio_id, label_id)
+                    SELECT ?, label_id FROM audio_labels WHERE audio_id = ?
+                ''', (missing_id, found_id))
+                self.cursor.execute('''
+                    UPDATE audio_files SET
+                        (file_size, mtime_ns, first_seen, partial_hash, full_hash) = (
+                            SELECT c.file_size, c.mtime_ns, c.first_seen, IFNULL(c.partial_hash, audio_files.partial_hash),
+                                   IFNULL(c.full_hash, audio_files.full_hash)
+                            FROM audio_files c WHERE c.audio_id = ?),
+                        missing_since = NULL
+                    WHERE audio_id = ?
+                ''', (found_id, missing_id))
+                # 在新位置上的试听记录也并入原记录
+                if self.cursor.execute("UPDATE play_history SET audio_id = ? WHERE audio_id = ?", (missing_id, found_id)).rowcount:
+                    self.cursor.execute('''
+                        INSERT OR REPLACE INTO audio_play_stats (audio_id, play_count, last_played)
+                        SELECT audio_id, COUNT(*), MAX(played_at) FROM play_history WHERE audio_id = ? GROUP BY audio_id
+                    ''', (missing_id,))
+                for table in self._AUDIO_DEPENDENT_TABLES:
+                    self.cursor.execute(f"DELETE FROM {table} WHERE audio_id = ?", (found_id,))
+                self.cursor.execute("DELETE FROM audios WHERE id = ?", (found_id,))
+                self.cursor.execute("UPDATE audios SET directory_id = ?, name = ? WHERE id = ?",
+                                    (location['directory_id'], location['name'], missing_id))
+            self.conn.commit()
+            if pairs:
+                placeholders = ",".join("?" * len(pairs))
+                self._refresh_label_trie(f'''
+                    WHERE l.id IN (SELECT al.label_id FROM audio_labels al
+                                   WHERE al.audio_id IN ({placeholders}))''', [missing_id for missing_id, _found_id in pairs])
+            logger.info(f"已将 {len(pairs)} 个缺失的音频记录重新链接到移动后的位置。")
+            return len(pairs)
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"重新链接移动的音频失败: {e}", exc_info=True)
+            return -1
+
+    # 内容哈希的计算阶段及对应的列：先为大小相同的文件计算部分哈希，再为部分哈希也相同的文件计算完整哈希
+    _CONTENT_HASH_COLUMNS = {'partial': 'partial_hash', 'full': 'full_hash'}
+
+    @_timed
+    def get_content_hash_jobs(self, stage, after_id=0, limit=CONTENT_HASH_PAGE_SIZE):
+        """
+        按 audio_id 分页读取需要计算内容哈希的现存文件（只在数据库中按大小 / 部分哈希分组，不读取文件）。
+
+        Args:
+            stage (str): 'partial' 为与其他文件大小相同、还没有部分哈希的文件；
+                         'full' 为大小和部分哈希都与其他文件相同、还没有完整哈希的文件。
+
+        Returns:
+            list: [(audio_id, path, file_size, mtime_ns, partial_hash), ...]
+        """
+        if stage == 'partial':
+            condition = '''f.partial_hash IS NULL AND f.file_size IN (
+                SELECT file_size FROM audio_files WHERE missing_since IS NULL AND file_size > 0
+                GROUP BY file_size HAVING COUNT(*) > 1)'''
+        else:
+            condition = '''f.full_hash IS NULL AND (f.file_size, f.partial_hash) IN (
+                SELECT file_size, partial_hash FROM audio_files WHERE missing_since IS NULL AND partial_hash IS NOT NULL
+                GROUP BY file_size, partial_hash HAVING COUNT(*) > 1)'''
+        try:
+            self.cursor.execute(f'''
+                SELECT f.audio_id, d.path || a.name AS path, f.file_size, f.mtime_ns, f.partial_hash
+                FROM audio_files f
+                JOIN audios a ON a.id = f.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                WHERE f.audio_id > ? AND f.missing_since IS NULL AND {condition}
+                ORDER BY f.audio_id
+                LIMIT ?
+            ''', (after_id, limit))
+            return [tuple(row) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"读取待计算哈希的文件失败: {e}", exc_info=True)
+            return []
+
+    @_serialized_write(generation=None)
+    def save_content_hashes(self, stage, items):
+        """
+        保存一批内容哈希，单个事务提交。计算期间文件状态被核对更新过的（大小或修改时间不同）不写入。
+
+        Args:
+            stage (str): 'partial' 或 'full'。
+            items (list): [(audio_id, file_size, mtime_ns, hash), ...]
+        """
+        column = self._CONTENT_HASH_COLUMNS[stage]
+        try:
+            self.cursor.executemany(f"UPDATE audio_files SET {column} = ? WHERE audio_id = ? AND file_size = ? AND mtime_ns = ?",
+                                    [(digest, audio_id, file_size, mtime_ns) for audio_id, file_size, mtime_ns, digest in items])
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存内容哈希失败: {e}", exc_info=True)
+            return False
+
+    @_timed
+    def get_exact_duplicate_groups(self):
+        """
+        按完整哈希找出字节完全相同的现存文件。
+
+        Returns:
+            list: [(file_size, [path, ...]), ...]，按可节省的空间从大到小排列。
+        """
+        try:
+            self.cursor.execute('''
+                SELECT f.file_size, f.full_hash, d.path || a.name AS path
+                FROM audio_files f
+                JOIN audios a ON a.id = f.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                WHERE f.missing_since IS NULL AND (f.full_hash, f.file_size) IN (
+                    SELECT full_hash, file_size FROM audio_files WHERE full_hash IS NOT NULL AND missing_since IS NULL
+                    GROUP BY full_hash, file_size HAVING COUNT(*) > 1)
+                ORDER BY f.full_hash, path
+            ''')
+            groups = {}
+            for row in self.cursor.fetchall():
+                groups.setdefault((row['full_hash'], row['file_size']), []).append(row['path'])
+            return sorted(((file_size, paths) for (_digest, file_size), paths in groups.items()),
+                          key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+        except sqlite3.Error as e:
+            logger.error(f"查询完全相同的文件失败: {e}", exc_info=True)
+            return []
+
+    @_timed
+    def get_duplicate_storage_report(self):
+        """
+        统计完全相同的文件占用的空间（只使用 audio_files 表中已有的哈希，不读取文件）。
+
+        Returns:
+            dict: groups（组数）、redundant_files / redundant_bytes（每组保留一份时多余的副本数和空间）、
+                  total_files / total_bytes（核对过的现存文件总数和总大小）。
+        """
+        report = {'groups': 0, 'redundant_files': 0, 'redundant_bytes': 0, 'total_files': 0, 'total_bytes': 0}
+        try:
+            row = self.cursor.execute('''
+                SELECT COUNT(*) AS groups, IFNULL(SUM(copies - 1), 0) AS redundant_files,
+                       IFNULL(SUM(file_size * (copies - 1)), 0) AS redundant_bytes
+                FROM (SELECT file_size, COUNT(*) AS copies FROM audio_files
+                      WHERE full_hash IS NOT NULL AND missing_since IS NULL
+                      GROUP BY full_hash, file_size HAVING copies > 1)
+            ''').fetchone()
+            report.update(dict(row))
+            row = self.cursor.execute('''
+                SELECT COUNT(*) AS total_files, IFNULL(SUM(file_size), 0) AS total_bytes
+                FROM audio_files WHERE missing_since IS NULL
+            ''').fetchone()
+            report.update(dict(row))
+        except sqlite3.Error as e:
+            logger.error(f"统计重复文件占用空间失败: {e}", exc_info=True)
+        return report
+
+    @_serialized_write(generation='play_generation')
+    def record_plays(self, events):
+        """
+        保存一批试听记录（由 core.play_history 定时成批调用）：播放历史和播放统计在同一个事务中写入，只提交一次。
+        不使标签缓存失效；缓存的搜索结果最多在 PLAY_RANKING_MAX_STALENESS_SECONDS 秒后才按新的播放统计重新排序。
+
+        Args:
+            events (list): [(音频路径, 播放时间戳), ...]
+
+        Returns:
+            bool: 是否保存成功。
+        """
+        if not events:
+            return True
+        try:
+            audio_ids = self._ensure_audio_ids({path for path, _played_at in events})
+            rows = [(audio_ids[path], played_at) for path, played_at in events]
+            self.cursor.executemany("INSERT INTO play_history (audio_id, played_at) VALUES (?, ?)", rows)
+            totals = {} # audio_id -> (本批播放次数, 本批最近播放时间)
+            for audio_id, played_at in rows:
+                count, last_played = totals.get(audio_id, (0, played_at))
+                totals[audio_id] = (count + 1, max(last_played, played_at))
+            self.cursor.executemany('''
+                INSERT INTO audio_play_stats (audio_id, play_count, last_played) VALUES (?, ?, ?)
+                ON CONFLICT (audio_id) DO UPDATE SET
+                    play_count = audio_play_stats.play_count + excluded.play_count,
+                    last_played = MAX(audio_play_stats.last_played, excluded.last_played)
+            ''', [(audio_id, count, last_played) for audio_id, (count, last_played) in totals.items()])
+            self.conn.commit()
+            logger.debug(f"已保存 {len(rows)} 条试听记录（{len(totals)} 个音频）。")
+            return True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logger.error(f"保存试听记录失败: {e} ({len(events)} 条)", exc_info=True)
+            return False
+
+    @_timed
+    def get_recent_plays(self, limit=PLAY_HISTORY_LIMIT, since=None):
+        """
+        最近试听过的音频，每个音频只出现一次，最近播放的在前。
+
+        Args:
+            since (float, optional): 只返回该时间戳之后播放过的音频。
+
+        Returns:
+            list: [(path, play_count, last_played), ...]
+        """
+        try:
+            self.cursor.execute('''
+                SELECT d.path || a.name AS path, ps.play_count, ps.last_played
+                FROM audio_play_stats ps
+                JOIN audios a ON a.id = ps.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                WHERE ps.last_played >= ?
+                ORDER BY ps.last_played DESC
+                LIMIT ?
+            ''', (since or 0, limit))
+            return [(row['path'], row['play_count'], row['last_played']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询最近播放的音频失败: {e}", exc_info=True)
+            return []
+
+    @_timed
+    def get_most_played(self, limit=PLAY_HISTORY_LIMIT, since=None):
+        """
+        播放次数最多的音频。不指定 since 时直接读取 audio_play_stats 的索引；
+        指定时只统计该时间戳之后的播放记录（按时间索引的范围扫描）。
+
+        Returns:
+            list: [(path, play_count, last_played), ...]，次数相同时最近播放的在前。
+        """
+        try:
+            if since is None:
+                stats_sql = "SELECT audio_id, play_count, last_played FROM audio_play_stats"
+                params = ()
+            else:
+                stats_sql = '''
+                    SELECT audio_id, COUNT(*) AS play_count, MAX(played_at) AS last_played
+                    FROM play_history WHERE played_at >= ? GROUP BY audio_id
+                '''
+                params = (since,)
+            self.cursor.execute(f'''
+                SELECT d.path || a.name AS path, ps.play_count, ps.last_played
+                FROM ({stats_sql}) ps
+                JOIN audios a ON a.id = ps.audio_id
+                JOIN directories d ON d.id = a.directory_id
+                ORDER BY ps.play_count DESC, ps.last_played DESC
+                LIMIT ?
+            ''', params + (limit,))
+            return [(row['path'], row['play_count'], row['last_played']) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"查询最常播放的音频失败: {e}", exc_info=True)
+            return []
+
+    # 空闲时的数据库维护步骤，按此顺序执行（见 core.db_maintenance.MaintenanceScheduler）；
+    # WAL 检查点放在最后，增量清理释放的页在检查点之后才从数据库文件中截去
+    MAINTENANCE_TASKS = ('optimize', 'fts_merge', 'incremental_vacuum', 'wal_checkpoint')
+
+    def run_maintenance_task(self, task, time_budget):
+        """
+        执行一段维护工作，超过 time_budget 秒后在当前步骤结束时返回（至少完成一步）。
+        持有写锁，同一进程中的写操作最多等待一个步骤；维护不修改数据，不使查询缓存失效。
+
+        Args:
+            task (str): MAINTENANCE_TASKS 之一。
+
+        Returns:
+            tuple | None: (是否已完成, 回收的字节数)；失败时返回 None。
+        """
+        deadline = time.perf_counter() + time_budget
+        try:
+            with self._write_lock:
+                return getattr(self, f"_maintenance_{task}")(deadline)
+        except sqlite3.Error as e:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            logger.error(f"数据库维护 '{task}' 失败: {e}", exc_info=True)
+            return None
+
+    def _maintenance_optimize(self, deadline):
+        """更新查询规划器需要的统计信息；只分析自上次以来变化较大的表，analysis_limit 限制每个索引的扫描行数。"""
+        self.cursor.execute(f"PRAGMA analysis_limit={MAINTENANCE_ANALYSIS_LIMIT}")
+        self.cursor.execute("PRAGMA optimize").fetchall()
+        return True, 0
+
+    def _maintenance_fts_merge(self, deadline):
+        """
+        逐步合并全文索引的段（FTS5 'merge' 命令），每次最多写入 FTS_MERGE_PAGES 页。
+        命令执行前后 total_changes 的差小于 2 说明该表已无可合并的段。
+        """
+        for table_name in list(self._fts_tokenizers):
+            while True:
+                changes_before = self.conn.total_changes
+                self.cursor.execute(f"INSERT INTO {table_name} ({table_name}, rank) VALUES ('merge', ?)", (FTS_MERGE_PAGES,))
+                self.conn.commit()
+                if self.conn.total_changes - changes_before < 2:
+                    break
+                if time.perf_counter() >= deadline:
+                    return False, 0
+        return True, 0
+
+    def _maintenance_incremental_vacuum(self, deadline):
+        """把空闲页移到文件末尾并截去；数据库不是增量清理模式（auto_vacuum=INCREMENTAL）时什么也不做。"""
+        if self.cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return True, 0
+        page_size = self.cursor.execute("PRAGMA page_size").fetchone()[0]
+        reclaimed = 0
+        while True:
+            free_pages = self.cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages == 0:
+                return True, reclaimed
+            self.cursor.execute(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})").fetchall()
+            reclaimed += (free_pages - self.cursor.execute("PRAGMA freelist_count").fetchone()[0]) * page_size
+            if time.perf_counter() >= deadline:
+                return False, reclaimed
+
+    def _maintenance_wal_checkpoint(self, deadline):
+        """
+        把 WAL 中的内容写回数据库文件。先做不等待的 PASSIVE 检查点；全部写回后再用 TRUNCATE 把 WAL 文件截为零长度，
+        等待读者的时间不超过剩余的时间片。仍有读者占用时留到下次空闲。
+        """
+        wal_path = self.db_path + "-wal"
+        size_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        busy, log_frames, checkpointed = self.cursor.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if busy == 0 and 0 <= log_frames == checkpointed:
+            remaining_ms = max(int((deadline - time.perf_counter()) * 1000), 0)
+            self.cursor.execute(f"PRAGMA busy_timeout={remaining_ms}")
+            try:
+                self.cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            finally:
+                self.cursor.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_SECONDS * 1000)}")
+        size_after = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        return True, max(size_before - size_after, 0)
+
+    def enable_incremental_vacuum(self):
+        """
+        把已有数据库转换为增量清理模式：需要一次完整的 VACUUM（重写整个文件，期间阻塞所有写入，
+        并需要与数据库大小相当的临时空间），因此不在空闲维护中自动执行。
+
+        Returns:
+            bool: 是否成功。
+        """
+        try:
+            with self._write_lock:
+                if self.cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                    return True
+                start = time.perf_counter()
+                self.cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                self.cursor.execute("VACUUM")
+                logger.info(f"数据库已转换为增量清理模式，耗时 {time.perf_counter() - start:.1f} 秒。")
+                return True
+        except sqlite3.Error as e:
+            logger.error(f"转换数据库为增量清理模式失败: {e}", exc_info=True)
+            return False
+
+    def close_connection(self):
+        """关闭所有线程的数据库连接。"""
+        with self._connections_lock:
+            if self._closed:
+                return
+            self._closed = True
+            connections, self._connections = self._connections, []
+        with self._label_snapshot_lock:
+            if self._label_snapshot is not None:
+                self._label_snapshot.close()
+                self._label_snapshot = None
+        self.query_metrics.log_summary()
+        self._label_cache.log_summary()
+        self._search_cache.log_summary()
+        self._ranked_ids_cache.log_summary()
+        for connection in connections:
+            try:
+                connection.close()
+            except sqlite3.Error as e:
+                logger.warning(f"关闭数据库连接失败: {e}")
+        self._local = threading.local()
+        logger.info("数据库连接已关闭。")
 
 # 简单的测试用例
 if __name__ == '__main__':
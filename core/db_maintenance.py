@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+from utils.logger_config import logger
+
+IDLE_SECONDS = 120.0          # 没有选中文件或快捷键操作超过该时间才开始维护
+CHECK_INTERVAL_SECONDS = 5.0  # 检查是否空闲的间隔
+SLICE_SECONDS = 0.2           # 每个时间片最多持有写锁的时间；时间片之间重新检查是否空闲
+SLICE_PAUSE_SECONDS = 0.05    # 时间片之间的间隔，让其他写操作有机会获得写锁
+MIN_CYCLE_INTERVAL_SECONDS = 3600.0 # 两轮完整维护之间的最短间隔
+
+
+def database_size(db_path):
+    """数据库文件与 WAL 文件的总字节数。"""
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+
+class MaintenanceScheduler:
+    """
+    空闲时的数据库维护：界面在用户选中文件或按快捷键时调用 note_activity()；后台线程发现空闲超过 IDLE_SECONDS、
+    且上一轮维护之后数据库有过写入时，依次执行 DatabaseManager.MAINTENANCE_TASKS（更新统计信息、合并全文索引、
+    增量清理空闲页、WAL 检查点）。每个时间片不超过 SLICE_SECONDS，用户一有操作就在当前时间片结束后暂停，
+    下次空闲时从未完成的步骤继续。每轮结束后记录各步骤的耗时和回收的字节数。
+    """
+    def __init__(self, db_manager, idle_seconds=IDLE_SECONDS, check_interval=CHECK_INTERVAL_SECONDS,
+                 slice_seconds=SLICE_SECONDS, min_cycle_interval=MIN_CYCLE_INTERVAL_SECONDS):
+        self.db_manager = db_manager
+        self.idle_seconds = idle_seconds
+        self.check_interval = check_interval
+        self.slice_seconds = slice_seconds
+        self.min_cycle_interval = min_cycle_interval
+        self._last_activity = time.monotonic()
+        self._last_cycle_end = None
+        self._maintained_generation = None # 上一轮完整维护时的写代数，没有新写入时不再维护
+        self._pending_tasks = list(db_manager.MAINTENANCE_TASKS)
+        self._task_stats = {} # 本轮各步骤的 [耗时, 回收字节数]，被打断后继续累计
+        self._cycle_generation = None
+        self._size_before = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def note_activity(self):
+        """记录一次用户操作（可在任何线程中调用）。"""
+        self._last_activity = time.monotonic()
+
+    def is_idle(self):
+        return time.monotonic() - self._last_activity >= self.idle_seconds
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if self.is_running():
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(f"空闲时数据库维护已启动，空闲 {self.idle_seconds:g} 秒后开始。")
+        return True
+
+    def stop(self):
+        """停止后台线程；正在执行的时间片完成后退出。"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.slice_seconds + 5.0)
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            if self.is_idle() and self._is_due():
+                self.run_cycle()
+
+    def _is_due(self):
+        if self._task_stats: # 上一轮被打断，继续
+            return True
+        if self.db_manager.write_generation == self._maintained_generation:
+            return False
+        return self._last_cycle_end is None or time.monotonic() - self._last_cycle_end >= self.min_cycle_interval
+
+    def run_cycle(self, require_idle=True):
+        """
+        在调用线程中执行尚未完成的维护步骤。require_idle 为 True 时用户有操作或调用了 stop() 就暂停。
+
+        Returns:
+            bool: 本轮是否全部完成。
+        """
+        if not self._task_stats:
+            self._cycle_generation = self.db_manager.write_generation
+            self._size_before = database_size(self.db_manager.db_path)
+        while self._pending_tasks:
+            task = self._pending_tasks[0]
+            if self._stop_event.is_set() or (require_idle and not self.is_idle()):
+                logger.info(f"数据库维护在 '{task}' 步骤暂停，下次空闲时继续。")
+                return False
+            start = time.perf_counter()
+            result = self.db_manager.run_maintenance_task(task, self.slice_seconds)
+            stats = self._task_stats.setdefault(task, [0.0, 0])
+            stats[0] += time.perf_counter() - start
+            if result is None: # 已记录错误日志，跳过该步骤
+                self._pending_tasks.pop(0)
+                continue
+            finished, reclaimed = result
+            stats[1] += reclaimed
+            if finished:
+                self._pending_tasks.pop(0)
+            else:
+                self._stop_event.wait(SLICE_PAUSE_SECONDS)
+        self._finish_cycle()
+        return True
+
+    def _finish_cycle(self):
+        size_after = database_size(self.db_manager.db_path)
+        details = ", ".join(f"{task} {seconds * 1000:.0f}ms/{reclaimed / 1024:.0f} KB"
+                            for task, (seconds, reclaimed) in self._task_stats.items())
+        total_seconds = sum(seconds for seconds, _reclaimed in self._task_stats.values())
+        logger.info(f"数据库维护完成，耗时 {total_seconds:.2f} 秒，文件从 {self._size_before / 1024 / 1024:.1f} MB "
+                    f"变为 {size_after / 1024 / 1024:.1f} MB（{details}）。")
+        self._maintained_generation = self._cycle_generation
+        self._last_cycle_end = time.monotonic()
+        self._pending_tasks = list(self.db_manager.MAINTENANCE_TASKS)
+        self._task_stats = {}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.db_maintenance 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="立即执行一轮数据库维护（程序运行时也会在空闲时自动执行）。")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="先用一次完整的 VACUUM 把旧数据库转换为增量清理模式（耗时较长，需要与数据库大小相当的临时空间）")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if args.enable_incremental_vacuum:
+        db_manager.enable_incremental_vacuum()
+    MaintenanceScheduler(db_manager).run_cycle(require_idle=False)
+    db_manager.close_connection()
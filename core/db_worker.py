@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import wx
+
+from utils.logger_config import logger
+
+DEFAULT_READ_WORKERS = 2
+
+
+class DatabaseWorker:
+    """
+    DatabaseManager 的非阻塞门面：读请求在小型读线程池中执行，写请求在单个写线程中按提交顺序串行执行。
+    每个线程使用各自的数据库连接（见 DatabaseManager.conn），wx 主循环不再等待任何查询。
+
+    用法:
+        worker.read(db.search_audios, term, filters, callback=self._show_results)
+        future = worker.write(db.add_audio_label, path, label)
+    """
+    def __init__(self, db_manager, read_workers=DEFAULT_READ_WORKERS):
+        self.db_manager = db_manager
+        self._read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-reader")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._shutdown = False
+
+    def read(self, func, *args, callback=None, error_callback=None, **kwargs):
+        """
+        在读线程池中执行 func(*args, **kwargs)。
+
+        Args:
+            callback (callable, optional): 成功后在主线程调用 callback(result)。
+            error_callback (callable, optional): 抛出异常时在主线程调用 error_callback(exception)。
+
+        Returns:
+            concurrent.futures.Future
+        """
+        return self._submit(self._read_executor, func, args, kwargs, callback, error_callback)
+
+    def write(self, func, *args, callback=None, error_callback=None, **kwargs):
+        """在写线程中执行 func(*args, **kwargs)，所有写请求按提交顺序串行执行。参数同 read。"""
+        return self._submit(self._write_executor, func, args, kwargs, callback, error_callback)
+
+    def _submit(self, executor, func, args, kwargs, callback, error_callback):
+        if self._shutdown:
+            raise RuntimeError("数据库工作线程已关闭。")
+        name = getattr(func, '__name__', repr(func))
+        submitted_at = time.perf_counter()
+
+        def run():
+            # 排队等待时间单独统计，便于区分"查询慢"和"队列堵塞"
+            self.db_manager.query_metrics.record(f"queue_wait:{name}", time.perf_counter() - submitted_at)
+            return func(*args, **kwargs)
+
+        future = executor.submit(run)
+        if callback or error_callback:
+            future.add_done_callback(lambda f: self._deliver(f, name, callback, error_callback))
+        return future
+
+    def _deliver(self, future, name, callback, error_callback):
+        """在主线程中分发结果或异常。"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"数据库后台调用 {name} 失败: {error}", exc_info=error)
+            if error_callback:
+                wx.CallAfter(error_callback, error)
+            return
+        if callback:
+            wx.CallAfter(callback, future.result())
+
+    def shutdown(self):
+        """停止接收新请求：丢弃尚未开始的读请求，等待已提交的写请求全部完成。"""
+        if self._shutdown:
+            return
+        self._shutdown = True
+        self._read_executor.shutdown(wait=False, cancel_futures=True)
+        self._write_executor.shutdown(wait=True)
+        logger.info("数据库工作线程已关闭。")
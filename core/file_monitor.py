@@ -11,6 +11,7 @@ import wx # for wx.CallAfter (indirectly via main_frame)
 from utils.logger_config import logger
 # 导入新的音频命令队列
 from core.audio_manager import audio_command_queue, get_last_played_file_path
+from core.library_indexer import AUDIO_EXTENSIONS
 
 monitoring_enabled = False
 monitor_thread = None
@@ -20,9 +21,8 @@ monitor_stop_event = threading.Event()
 
 def is_audio_file(file_path):
     """判断文件是否是支持的音频格式。"""
-    audio_extensions = ('.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a', '.wma', '.aiff', '.opus')
     if file_path and os.path.isfile(file_path):
-        return file_path.lower().endswith(audio_extensions)
+        return file_path.lower().endswith(AUDIO_EXTENSIONS)
     return False
 
 def get_file_hash(file_path):
@@ -0,0 +1,139 @@
+"""
+容错（拼写错误）匹配的纯函数工具：trigram 拆分与有界编辑距离。
+
+候选项由数据库中的 trigram 全文索引给出（见 DatabaseManager.suggest_labels），
+这里只对少量候选计算编辑距离，不做全量两两比较。
+"""
+
+# 文档频率不超过该值的 trigram 扫描代价很小，总是用作候选探测
+MAX_PROBE_FREQUENCY = 1000
+# 单次探测最多扫描的 (trigram, 标签) 倒排条目数，保证高频 trigram 很多时仍是交互速度
+MAX_PROBE_POSTINGS = 20000
+
+
+def trigrams(text):
+    """
+    按 FTS5 trigram 分词器的规则拆分：小写后取所有连续 3 个字符（包括空格）。
+
+    Returns:
+        list: 去重后的 trigram，保持出现顺序。
+    """
+    text = text.lower()
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def max_typo_distance(term):
+    """根据搜索词长度确定允许的最大编辑距离：短词 1 处，较长的词最多 3 处。"""
+    length = len(term)
+    if length <= 4:
+        return 1
+    if length <= 8:
+        return 2
+    return 3
+
+
+def select_probe_trigrams(term_trigrams, frequencies, max_distance,
+                          max_frequency=MAX_PROBE_FREQUENCY, max_postings=MAX_PROBE_POSTINGS):
+    """
+    选出用于探测候选的 trigram 子集及所需的最少共享数。
+
+    每处编辑最多破坏 3 个 trigram，因此对任意子集 S，距离不超过 max_distance 的字符串至少与 S 共享
+    len(S) - 3 * max_distance 个 trigram；S 至少有 3 * max_distance + 1 个元素时候选不会遗漏。
+    按文档频率从低到高选取（不存在的 trigram 频率为 0，不增加扫描量），倒排条目总数超出 max_postings 时停止，
+    此时退化为"至少共享 1 个低频 trigram"的尽力匹配（至少会扫描一个实际存在的 trigram）。
+
+    Args:
+        term_trigrams (list): 搜索词的 trigram。
+        frequencies (dict): trigram -> 包含它的标签数量。
+        max_distance (int): 允许的最大编辑距离。
+        max_frequency (int): 凑足 3 * max_distance + 1 个之后，仍继续选用频率不超过该值的 trigram。
+        max_postings (int): 探测扫描的倒排条目上限。
+
+    Returns:
+        tuple: (probes, min_shared)
+    """
+    required = 3 * max_distance + 1
+    probes = []
+    postings = 0
+    for trigram in sorted(term_trigrams, key=lambda trigram: frequencies.get(trigram, 0)):
+        frequency = frequencies.get(trigram, 0)
+        if len(probes) >= required and frequency > max_frequency:
+            break
+        if postings and postings + frequency > max_postings:
+            break
+        probes.append(trigram)
+        postings += frequency
+    return probes, max(1, len(probes) - 3 * max_distance)
+
+
+def bounded_levenshtein(source, target, max_distance, substring=False):
+    """
+    计算编辑距离（含相邻字符互换，即 OSA 距离），超过 max_distance 时提前终止。
+
+    Args:
+        source (str): 搜索词。
+        target (str): 候选字符串。
+        max_distance (int): 距离上限。
+        substring (bool): 为 True 时计算 source 与 target 任一子串之间的最小距离
+                          （target 的前缀和后缀不计代价），与子串搜索语义一致。
+
+    Returns:
+        int | None: 编辑距离；超过上限时返回 None。
+    """
+    source = source.lower()
+    target = target.lower()
+    if not substring and abs(len(source) - len(target)) > max_distance:
+        return None
+    # 行为 source 的字符，列为 target 的字符
+    before_previous = None
+    previous = [0] * (len(target) + 1) if substring else list(range(len(target) + 1))
+    for i, source_char in enumerate(source, start=1):
+        current = [i] + [0] * len(target)
+        row_min = i
+        for j, target_char in enumerate(target, start=1):
+            cost = 0 if source_char == target_char else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # 相邻字符互换（"impcat" -> "impact"）按一次编辑计算
+            if (before_previous is not None and j > 1 and source_char == target[j - 2]
+                    and source[i - 2] == target_char and before_previous[j - 2] + 1 < value):
+                value = before_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return None # 本行最小值已超过上限，后续只会更大
+        before_previous, previous = previous, current
+    distance = min(previous) if substring else previous[-1]
+    return distance if distance <= max_distance else None
+
+
+def rank_candidates(term, candidates, limit, max_distance=None):
+    """
+    对候选字符串按编辑距离排序，返回最好的 limit 个。
+
+    Args:
+        candidates (iterable): [(name, usage_count), ...]
+        max_distance (int, optional): 默认由 max_typo_distance(term) 决定。
+
+    Returns:
+        list: [(name, distance), ...]，距离小者在前；距离相同时使用次数更多、整体长度更接近者在前。
+    """
+    if max_distance is None:
+        max_distance = max_typo_distance(term)
+    ranked = []
+    for name, usage_count in candidates:
+        distance = bounded_levenshtein(term, name, max_distance, substring=True)
+        if distance is None:
+            continue
+        ranked.append((distance, -(usage_count or 0), abs(len(name) - len(term)), name))
+    ranked.sort()
+    return [(name, distance) for distance, _usage, _length_gap, name in ranked[:limit]]
+
+
+if __name__ == '__main__':
+    print(trigrams("Impact"))
+    print(bounded_levenshtein("explsion", "big explosion", 2, substring=True)) # 1
+    print(bounded_levenshtein("kitten", "sitting", 3))                       # 3
+    print(bounded_levenshtein("kitten", "sitting", 2))                       # None
+    print(bounded_levenshtein("impcat", "impact", 1))                        # 1
+    print(rank_candidates("metl hit", [("metal hit", 5), ("metal hits", 9), ("wood hit", 2)], 5))
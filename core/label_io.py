@@ -0,0 +1,262 @@
+"""
+标签的批量导入与导出（CSV / JSONL），用于在不同电脑之间迁移标签，或与外部维护的标签集同步。
+读写都是流式的，内存占用与文件大小无关；导入按大批量事务写入（见 DatabaseManager.import_label_assignments）。
+
+文件格式：
+    CSV    第一列为音频路径，之后每一列为一个标签（通常为 "path,label" 两列，每行一条关联）；
+           第一行为 path,label 表头时跳过。导出时每行一条关联，使用 UTF-8 (带 BOM，便于 Excel 打开)。
+    JSONL  每行一个对象：{"path": "...", "labels": ["...", ...]}，也接受 {"path": "...", "label": "..."}。
+           导出时同一音频的标签合并为一行。
+"""
+import csv
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from utils.logger_config import logger
+
+IMPORT_BATCH_SIZE = 100000 # 每个导入事务包含的标签关联数
+# 预计导入的关联数（按文件大小估算）达到现有关联数的两倍、且不少于该值时，导入期间暂停索引维护，结束后统一重建
+BULK_IMPORT_MIN_ROWS = 200000
+ESTIMATED_BYTES_PER_ROW = 60
+PROGRESS_LOG_INTERVAL = 5.0 # 秒
+LABEL_FILE_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# 导入/导出统计：rows 为读取或写出的标签关联数，skipped 为无法解析的行，added 为导入时新增的关联（导出时为 0）
+LabelTransferStats = namedtuple('LabelTransferStats', ['rows', 'skipped', 'added', 'elapsed'])
+
+
+def detect_format(file_path, file_format=None):
+    """根据 file_format 参数或文件扩展名确定格式（'csv' 或 'jsonl'）；无法识别时抛出 ValueError。"""
+    if file_format:
+        if file_format not in LABEL_FILE_FORMATS.values():
+            raise ValueError(f"不支持的格式: {file_format}")
+        return file_format
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in LABEL_FILE_FORMATS:
+        raise ValueError(f"无法根据扩展名 '{extension}' 判断文件格式，请指定 csv 或 jsonl。")
+    return LABEL_FILE_FORMATS[extension]
+
+
+def _map_path(path, prefix_map):
+    """把路径开头的旧前缀替换为新前缀（第一个匹配的生效），用于素材库在另一台电脑上位于不同位置的情况。"""
+    for old_prefix, new_prefix in prefix_map:
+        if path.startswith(old_prefix):
+            return new_prefix + path[len(old_prefix):]
+    return path
+
+
+def _iter_csv(f):
+    """逐行产生 (path, labels)；无法解析的行产生 None。"""
+    reader = csv.reader(f)
+    first = next(reader, None)
+    if first is not None and [cell.strip().lower() for cell in first[:2]] != ['path', 'label']:
+        reader = itertools.chain([first], reader)
+    for row in reader:
+        if len(row) == 2: # 最常见的 path,label 两列格式
+            path, label = row[0].strip(), row[1].strip()
+            yield (path, (label,)) if path and label else None
+            continue
+        path = row[0].strip() if row else ''
+        labels = [label for label in (cell.strip() for cell in row[1:]) if label]
+        yield (path, labels) if path and labels else None
+
+
+def _iter_jsonl(f):
+    """逐行产生 (path, labels)；无法解析的行产生 None，空行跳过。"""
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            path = item.get('path')
+            labels = item.get('labels', [item.get('label')])
+        except (ValueError, AttributeError):
+            yield None
+            continue
+        if isinstance(labels, str):
+            labels = [labels]
+        labels = [label.strip() for label in labels or () if isinstance(label, str) and label.strip()]
+        if not isinstance(path, str) or not path.strip() or not labels:
+            yield None
+            continue
+        yield path.strip(), labels
+
+
+def _read_batches(file_path, file_format, prefix_map, batch_size, batches, counters):
+    """在读取线程中解析文件，把每批 [(path, label), ...] 放入 batches 队列，结束时放入 None。"""
+    try:
+        batch = []
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for item in (_iter_csv(f) if file_format == 'csv' else _iter_jsonl(f)):
+                if counters['cancelled']: # 写入失败，导入已中止
+                    return
+                if item is None:
+                    counters['skipped'] += 1
+                    continue
+                path, labels = item
+                if prefix_map:
+                    path = _map_path(path, prefix_map)
+                for label in labels:
+                    batch.append((path, label))
+                if len(batch) >= batch_size:
+                    batches.put(batch)
+                    batch = []
+        if batch and not counters['cancelled']:
+            batches.put(batch)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        counters['error'] = e
+    finally:
+        batches.put(None)
+
+
+def import_labels(db_manager, file_path, file_format=None, prefix_map=(), batch_size=IMPORT_BATCH_SIZE):
+    """
+    从 CSV / JSONL 文件导入标签关联。不存在的音频和标签会自动创建，已存在的关联不会重复添加。
+    文件在读取线程中解析，与数据库写入同时进行（队列只保留两批，内存占用与文件大小无关）。
+
+    Args:
+        prefix_map (iterable): [(旧路径前缀, 新路径前缀), ...]，导入前替换路径前缀。
+
+    Returns:
+        LabelTransferStats
+
+    Raises:
+        OSError / UnicodeDecodeError / csv.Error: 文件无法读取或解析（此前的批次已经写入）。
+        RuntimeError: 某一批写入数据库失败（错误详情已记录日志）；导入在该批停止，此前的批次已经写入。
+    """
+    file_format = detect_format(file_path, file_format)
+    start_time = time.time()
+    last_progress = start_time
+    rows = added = 0
+    batches = queue.Queue(maxsize=2)
+    counters = {'skipped': 0, 'error': None, 'cancelled': False}
+    reader = threading.Thread(target=_read_batches, daemon=True,
+                              args=(file_path, file_format, list(prefix_map), batch_size, batches, counters))
+    reader.start()
+
+    estimated_rows = os.path.getsize(file_path) // ESTIMATED_BYTES_PER_ROW
+    bulk = (estimated_rows >= max(BULK_IMPORT_MIN_ROWS, 2 * db_manager.count_label_assignments())
+            and db_manager.begin_bulk_label_import())
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            batch_added = db_manager.import_label_assignments(batch)
+            if batch_added < 0:
+                counters['cancelled'] = True
+                while batches.get() is not None: # 让读取线程从阻塞的 put 中返回并退出
+                    pass
+                message = f"写入标签失败，导入已在第 {rows + 1} 条附近停止（此前已写入 {rows} 条，新增 {added} 条）。"
+                logger.error(message)
+                raise RuntimeError(message)
+            added += batch_added
+            rows += len(batch)
+            if time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                last_progress = time.time()
+                logger.info(f"正在导入标签: 已读取 {rows} 条 ({rows / (last_progress - start_time):.0f} 条/秒)，新增 {added} 条。")
+    finally:
+        if bulk:
+            db_manager.end_bulk_label_import()
+    if counters['error'] is not None:
+        logger.error(f"读取标签文件 '{file_path}' 失败（已导入 {rows} 条）: {counters['error']}")
+        raise counters['error']
+    elapsed = time.time() - start_time
+    logger.info(f"标签导入完成: 从 '{file_path}' 读取 {rows} 条关联，新增 {added} 条，跳过无法解析的行 {counters['skipped']} 行，"
+                f"耗时 {elapsed:.2f}s ({rows / elapsed if elapsed > 0 else 0:.0f} 条/秒)。")
+    return LabelTransferStats(rows, counters['skipped'], added, elapsed)
+
+
+def export_labels(db_manager, file_path, file_format=None):
+    """
+    将所有标签关联导出到 CSV / JSONL 文件。
+
+    Returns:
+        LabelTransferStats
+    """
+    file_format = detect_format(file_path, file_format)
+    start_time = time.time()
+    last_progress = start_time
+    rows = 0
+    assignments = db_manager.iter_label_assignments()
+    if file_format == 'csv':
+        with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['path', 'label'])
+            for path, label in assignments:
+                writer.writerow((path, label))
+                rows += 1
+                if rows % 100000 == 0 and time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                    last_progress = time.time()
+                    logger.info(f"正在导出标签: 已写出 {rows} 条。")
+    else:
+        with open(file_path, 'w', encoding='utf-8', newline='\n') as f:
+            current_path, labels = None, []
+            for path, label in assignments:
+                # 同一音频的标签在导出顺序中相邻，合并为一行
+                if path != current_path and labels:
+                    f.write(json.dumps({'path': current_path, 'labels': labels}, ensure_ascii=False) + '\n')
+                    labels = []
+                current_path = path
+                labels.append(label)
+                rows += 1
+                if rows % 100000 == 0 and time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                    last_progress = time.time()
+                    logger.info(f"正在导出标签: 已写出 {rows} 条。")
+            if labels:
+                f.write(json.dumps({'path': current_path, 'labels': labels}, ensure_ascii=False) + '\n')
+    elapsed = time.time() - start_time
+    logger.info(f"标签导出完成: 向 '{file_path}' 写出 {rows} 条关联，耗时 {elapsed:.2f}s "
+                f"({rows / elapsed if elapsed > 0 else 0:.0f} 条/秒)。")
+    return LabelTransferStats(rows, 0, 0, elapsed)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.label_io 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="批量导入或导出音频标签（CSV / JSONL）。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="从文件导入标签")
+    import_parser.add_argument("file", help="CSV 或 JSONL 文件")
+    import_parser.add_argument("--map-prefix", nargs=2, action="append", default=[], metavar=("OLD", "NEW"),
+                               help="导入前把路径开头的 OLD 替换为 NEW，可重复指定")
+    export_parser = subparsers.add_parser("export", help="将所有标签导出到文件")
+    export_parser.add_argument("file", help="CSV 或 JSONL 文件")
+    for subparser in (import_parser, export_parser):
+        subparser.add_argument("--format", choices=sorted(set(LABEL_FILE_FORMATS.values())),
+                               help="文件格式；省略时根据扩展名判断")
+    args = parser.parse_args()
+
+    try:
+        detect_format(args.file, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    db_manager = DatabaseManager()
+    try:
+        if args.command == "import":
+            stats = import_labels(db_manager, args.file, args.format, prefix_map=args.map_prefix)
+            print(f"读取 {stats.rows} 条，新增 {stats.added} 条，跳过 {stats.skipped} 行，"
+                  f"耗时 {stats.elapsed:.2f}s ({stats.rows / stats.elapsed if stats.elapsed else 0:.0f} 条/秒)")
+        else:
+            stats = export_labels(db_manager, args.file, args.format)
+            print(f"导出 {stats.rows} 条，耗时 {stats.elapsed:.2f}s ({stats.rows / stats.elapsed if stats.elapsed else 0:.0f} 条/秒)")
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"无法读写文件 '{args.file}': {e}", file=sys.stderr)
+        sys.exit(1)
+    except RuntimeError as e:
+        print(f"导入失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db_manager.close_connection()
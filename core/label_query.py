@@ -0,0 +1,137 @@
+"""
+标签布尔查询：将 `drum AND (kick OR snare) NOT acoustic` 这样的输入解析为语法树。
+编译为 SQL 的部分见 DatabaseManager._boolean_match_sql。
+
+语法（运算符必须大写，以免与标签中的普通单词混淆）：
+    query   := or_expr
+    or_expr := and_expr ("OR" and_expr)*
+    and_expr:= unary (["AND"] unary)*        相邻的子表达式之间默认为 AND，因此 "a NOT b" 即 "a AND NOT b"
+    unary   := "NOT" unary | "(" or_expr ")" | term
+    term    := 连续的普通单词（组成一个短语，例如 metal hit）| '带引号的短语' | "带引号的短语"
+也接受 &&、||、! 作为 AND、OR、NOT 的写法。
+"""
+import re
+from collections import namedtuple
+
+Term = namedtuple('Term', ['text'])
+And = namedtuple('And', ['children'])
+Or = namedtuple('Or', ['children'])
+Not = namedtuple('Not', ['child'])
+
+_OPERATORS = {'AND': 'AND', '&&': 'AND', 'OR': 'OR', '||': 'OR', 'NOT': 'NOT', '!': 'NOT'}
+_TOKEN = re.compile(r'''\(|\)|"[^"]*"|'[^']*'|[^\s()]+''')
+
+
+def _tokenize(text):
+    """返回 [(kind, value), ...]，kind 为 'op'、'('、')'、'word' 或 'phrase'。"""
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in ('(', ')'):
+            tokens.append((token, token))
+        elif token in _OPERATORS:
+            tokens.append(('op', _OPERATORS[token]))
+        elif len(token) >= 2 and token[0] == token[-1] and token[0] in '"\'':
+            tokens.append(('phrase', token[1:-1].strip()))
+        else:
+            tokens.append(('word', token))
+    return tokens
+
+
+def is_boolean_query(text):
+    """输入中含有布尔运算符、括号或引号短语时返回 True；否则整段输入按一个短语搜索（原有行为）。"""
+    return any(kind in ('op', '(', ')', 'phrase') for kind, _value in _tokenize(text))
+
+
+class _Parser:
+    """
+    递归下降解析器。对不完整的输入尽量宽容：缺少的右括号自动补齐，多余的右括号和悬空的运算符被忽略。
+    """
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        nodes = []
+        while self.pos < len(self.tokens):
+            node = self.parse_or()
+            if node is not None:
+                nodes.append(node)
+            elif self.peek()[0] is not None:
+                self.take() # 跳过无法解析的记号（例如多余的右括号）
+        return _combine(And, nodes)
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ('op', 'OR'):
+            self.take()
+            children.append(self.parse_and())
+        return _combine(Or, [child for child in children if child is not None])
+
+    def parse_and(self):
+        children = []
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value == 'AND':
+                self.take()
+                continue
+            if kind is None or kind == ')' or (kind == 'op' and value == 'OR'):
+                break
+            node = self.parse_unary()
+            if node is not None:
+                children.append(node)
+        return _combine(And, children)
+
+    def parse_unary(self):
+        kind, value = self.take()
+        if kind == 'op' and value == 'NOT':
+            child = self.parse_unary()
+            return Not(child) if child is not None else None
+        if kind == '(':
+            node = self.parse_or()
+            if self.peek()[0] == ')':
+                self.take()
+            return node
+        if kind == 'phrase':
+            return Term(value) if value else None
+        if kind == 'word':
+            # 连续的普通单词组成一个短语
+            words = [value]
+            while self.peek()[0] == 'word':
+                words.append(self.take()[1])
+            return Term(" ".join(words))
+        return None
+
+
+def _combine(node_type, children):
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+    # 展平嵌套的同类节点：a AND (b AND c) -> And([a, b, c])
+    flattened = []
+    for child in children:
+        flattened.extend(child.children if isinstance(child, node_type) else [child])
+    return node_type(tuple(flattened))
+
+
+def parse_label_query(text):
+    """
+    解析标签布尔查询。
+
+    Returns:
+        Term | And | Or | Not | None: 语法树；没有任何搜索词时返回 None。
+    """
+    return _Parser(_tokenize(text)).parse()
+
+
+if __name__ == '__main__':
+    for text in ["drum AND (kick OR snare) NOT acoustic", "metal hit OR 'glass break'", "NOT ambient", "(a OR b", "kick"]:
+        print(f"{text!r}: boolean={is_boolean_query(text)} -> {parse_label_query(text)}")
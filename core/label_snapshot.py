@@ -0,0 +1,250 @@
+"""
+标签索引的只读快照：把标签名、带标签音频的路径和"标签 -> 音频"倒排表写成一个紧凑的二进制文件，
+启动时用 mmap 映射，查询时直接在映射的内存上二分查找和切片，不解析、不预先加载，也不访问（可能位于网络共享上的）数据库。
+快照记录写入时数据库的实例标识和标签写代数（见 DatabaseManager.get_label_generation），不一致时调用方退回 SQLite。
+快照只回答按标签名（或别名）精确查找的只读查询：标签浏览器中列出某个标签的音频、加载自动补全索引。
+搜索框的搜索要对标签、文件名和元数据做子串匹配并按相关度与试听热度排序，这些信息不在快照中，仍由 SQLite 执行。
+
+文件布局（小端，所有整数数组为 uint32，各段按 4 字节对齐）：
+    头部            HEADER（魔数、版本、写代数、数据库实例标识、各段长度）
+    name_offsets    [标签数 + 1]  标签名在 names 中的起止位置，按标签 id 排列
+    key_offsets     [键数 + 1]    查找键（标签名和别名）在 keys 中的起止位置，按 ASCII 忽略大小写排序
+    key_targets     [键数]        查找键对应的标签序号
+    posting_offsets [标签数 + 1]  每个标签的倒排表在 postings 中的起止位置
+    postings        [关联数]      带该标签的音频序号（升序）
+    child_offsets   [标签数 + 1]  每个标签的所有下级标签在 descendants 中的起止位置
+    descendants     [下级关联数]  下级标签的序号
+    path_offsets    [音频数 + 1]  音频路径在 paths 中的起止位置，音频按 id 升序排列
+    names / keys / paths          UTF-8 字符串
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+SNAPSHOT_MAGIC = b'IAPLBLS1'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = "label_snapshot.bin" # 保存在程序目录（本地磁盘）中
+SNAPSHOT_CHECK_INTERVAL = 10.0 # 秒；写代数在两次检查之间保持不变（写入告一段落）时才重写快照
+# 魔数、版本、写代数、实例标识，以及标签数、键数、关联数、下级关联数、音频数和三个字符串段的字节数
+HEADER = struct.Struct('<8sIq32s8I')
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def nocase_key(text):
+    """与 SQLite 的 COLLATE NOCASE 一致：只折叠 ASCII 字母的大小写。"""
+    return text.translate(_ASCII_LOWER)
+
+
+def _offsets(strings):
+    """把字符串编码为 UTF-8 并拼接，返回 (起止位置数组, 拼接后的字节串)。"""
+    offsets = array('I', [0])
+    chunks = []
+    position = 0
+    for text in strings:
+        data = text.encode('utf-8')
+        chunks.append(data)
+        position += len(data)
+        offsets.append(position)
+    return offsets, b"".join(chunks)
+
+
+def write_snapshot(file_path, instance, generation, label_names, keys, postings, descendants, paths):
+    """
+    写入快照文件。调用方应写入临时文件后再替换正式文件（见 DatabaseManager.write_label_snapshot），
+    读取方不会看到写了一半的文件。
+
+    Args:
+        label_names (list): 按标签序号排列的标签名。
+        keys (list): [(查找键, 标签序号), ...]，无需排序。
+        postings (tuple): (posting_offsets, postings) 两个 uint32 数组。
+        descendants (tuple): (child_offsets, descendants) 两个 uint32 数组。
+        paths (list): 按音频序号排列的音频路径。
+    """
+    keys = sorted(keys, key=lambda item: nocase_key(item[0]))
+    name_offsets, names_blob = _offsets(label_names)
+    key_offsets, keys_blob = _offsets(key for key, _target in keys)
+    key_targets = array('I', (target for _key, target in keys))
+    posting_offsets, posting_values = postings
+    child_offsets, descendant_values = descendants
+    path_offsets, paths_blob = _offsets(paths)
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation, instance.encode('ascii'),
+                         len(label_names), len(keys), len(posting_values), len(descendant_values), len(paths),
+                         len(names_blob), len(keys_blob), len(paths_blob))
+    with open(file_path, 'wb') as f:
+        f.write(header)
+        for values in (name_offsets, key_offsets, key_targets, posting_offsets, posting_values,
+                       child_offsets, descendant_values, path_offsets):
+            if sys.byteorder != 'little':
+                values = array('I', values)
+                values.byteswap()
+            f.write(values.tobytes())
+        for blob in (names_blob, keys_blob, paths_blob):
+            f.write(blob)
+
+
+class LabelSnapshot:
+    """映射到内存的只读标签快照。线程安全（只读）；close() 之后不可再使用。"""
+    def __init__(self, file_path):
+        """
+        Raises:
+            OSError: 文件无法打开。
+            ValueError: 文件不是有效的快照（魔数、版本或长度不符，或平台不是小端序）。
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except (ValueError, struct.error, TypeError):
+            self.close()
+            raise
+
+    def _parse(self):
+        if sys.byteorder != 'little':
+            raise ValueError("标签快照只支持小端序平台")
+        (magic, version, self.generation, instance, self.label_count, key_count, posting_count, descendant_count,
+         self.audio_count, names_size, keys_size, paths_size) = HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("不是有效的标签快照文件")
+        self.instance = instance.decode('ascii')
+        view = memoryview(self._mmap)
+        position = HEADER.size
+
+        def take(count):
+            nonlocal position
+            section = view[position:position + count * 4].cast('I')
+            position += count * 4
+            return section
+
+        self._name_offsets = take(self.label_count + 1)
+        self._key_offsets = take(key_count + 1)
+        self._key_targets = take(key_count)
+        self._posting_offsets = take(self.label_count + 1)
+        self._postings = take(posting_count)
+        self._child_offsets = take(self.label_count + 1)
+        self._descendants = take(descendant_count)
+        self._path_offsets = take(self.audio_count + 1)
+        self._names = view[position:position + names_size]
+        position += names_size
+        self._keys = view[position:position + keys_size]
+        position += keys_size
+        self._paths = view[position:position + paths_size]
+        if position + paths_size != len(self._mmap):
+            raise ValueError("标签快照文件长度不符")
+        self._views = [self._name_offsets, self._key_offsets, self._key_targets, self._posting_offsets,
+                       self._postings, self._child_offsets, self._descendants, self._path_offsets,
+                       self._names, self._keys, self._paths, view]
+
+    def close(self):
+        for view in getattr(self, '_views', ()):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    @staticmethod
+    def _string(blob, offsets, index):
+        return str(blob[offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def label_counts(self):
+        """逐个产生 (标签名, 使用该标签的音频数)，用于建立自动补全索引。"""
+        for index in range(self.label_count):
+            yield (self._string(self._names, self._name_offsets, index),
+                   self._posting_offsets[index + 1] - self._posting_offsets[index])
+
+    def find_labels(self, name):
+        """名称或别名与 name 相同（ASCII 忽略大小写）的标签序号，二分查找，只解码查找路径上的几个键。"""
+        wanted = nocase_key(name)
+        low, high = 0, len(self._key_targets)
+        while low < high:
+            middle = (low + high) // 2
+            if nocase_key(self._string(self._keys, self._key_offsets, middle)) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        labels = []
+        while low < len(self._key_targets) and nocase_key(self._string(self._keys, self._key_offsets, low)) == wanted:
+            labels.append(self._key_targets[low])
+            low += 1
+        return labels
+
+    def audio_paths(self, name, include_descendants=True):
+        """
+        带有该标签（或别名指向的标签，include_descendants 时还包括其所有下级标签）的音频路径，按音频 id 排列。
+        只有一个标签时直接按倒排表的顺序解码路径，不需要合并和排序。
+        """
+        labels = self.find_labels(name)
+        if include_descendants:
+            labels += [self._descendants[position] for label in labels
+                       for position in range(self._child_offsets[label], self._child_offsets[label + 1])]
+        lists = [self._postings[self._posting_offsets[label]:self._posting_offsets[label + 1]]
+                 for label in dict.fromkeys(labels)]
+        if len(lists) == 1:
+            indexes = lists[0]
+        else:
+            indexes = sorted(set().union(*lists))
+        return [self._string(self._paths, self._path_offsets, index) for index in indexes]
+
+
+class LabelSnapshotUpdater:
+    """
+    后台线程：每隔 SNAPSHOT_CHECK_INTERVAL 秒比较数据库的标签写代数与快照，快照过期、
+    且写代数在两次检查之间没有变化（一批写入已经结束）时重写快照（见 DatabaseManager.write_label_snapshot）。
+    """
+    def __init__(self, db_manager, interval=SNAPSHOT_CHECK_INTERVAL):
+        self.db_manager = db_manager
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if self.is_running():
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="label-snapshot", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+
+    def _run(self):
+        last_seen = None
+        while not self._stop_event.wait(self.interval):
+            current = self.db_manager.get_label_generation()
+            if current is not None and current == last_seen and self.db_manager.label_snapshot_is_stale(current):
+                self.db_manager.write_label_snapshot()
+            last_seen = current
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.label_snapshot 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="写入或查询标签索引快照。")
+    parser.add_argument("label", nargs="?", help="要查询的标签；省略时只重写快照")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if args.label is None:
+        db_manager.write_label_snapshot()
+    else:
+        start = time.perf_counter()
+        paths = db_manager.get_audios_with_label(args.label)
+        print("\n".join(paths))
+        print(f"{len(paths)} 个音频，耗时 {(time.perf_counter() - start) * 1000:.1f}ms", file=sys.stderr)
+    db_manager.close_connection()
@@ -0,0 +1,129 @@
+"""
+标签层级与别名的批量维护。层级保存在 label_tree 闭包表中（见 DatabaseManager.set_label_parents），
+调整父标签只修改闭包表，不改写 audio_labels，因此整棵子树的移动与标签被使用的次数无关。
+
+文件格式（CSV，UTF-8）：
+    parents  每行 "标签,父标签"，父标签为空表示顶级标签；第一行为 label,parent 表头时跳过。
+    aliases  每行 "别名,标签"；第一行为 alias,label 表头时跳过。
+"""
+import csv
+import itertools
+
+from utils.logger_config import logger
+
+TAXONOMY_BATCH_SIZE = 5000 # 每个事务处理的行数
+
+
+def _iter_pairs(file_path, header):
+    """逐行产生 (第一列, 第二列)；列数不足或第一列为空的行被跳过。"""
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is not None and [cell.strip().lower() for cell in first[:2]] != list(header):
+            reader = itertools.chain([first], reader)
+        for row in reader:
+            if row and row[0].strip():
+                yield row[0].strip(), row[1].strip() if len(row) > 1 else ''
+
+
+def _apply_in_batches(pairs, apply, batch_size):
+    total = 0
+    while True:
+        batch = list(itertools.islice(pairs, batch_size))
+        if not batch:
+            return total
+        total += max(apply(batch), 0)
+
+
+def import_label_parents(db_manager, file_path, batch_size=TAXONOMY_BATCH_SIZE):
+    """
+    从 CSV 文件读取 "标签,父标签" 并批量调整层级。
+
+    Returns:
+        int: 实际移动的标签数。
+
+    Raises:
+        OSError / UnicodeDecodeError / csv.Error: 文件无法读取或解析（此前的批次已经写入）。
+    """
+    moved = _apply_in_batches(_iter_pairs(file_path, ('label', 'parent')), db_manager.set_label_parents, batch_size)
+    logger.info(f"从 '{file_path}' 导入标签层级，移动了 {moved} 个标签。")
+    return moved
+
+
+def import_label_aliases(db_manager, file_path, batch_size=TAXONOMY_BATCH_SIZE):
+    """从 CSV 文件读取 "别名,标签" 并批量添加别名，返回写入的别名数。"""
+    pairs = ((alias, label) for alias, label in _iter_pairs(file_path, ('alias', 'label')) if label)
+    saved = _apply_in_batches(pairs, db_manager.set_label_aliases, batch_size)
+    logger.info(f"从 '{file_path}' 导入 {saved} 个标签别名。")
+    return saved
+
+
+def format_label_tree(db_manager, label_name):
+    """返回标签子树的文本形式（每行一个标签，按深度缩进），标签不存在时返回空字符串。"""
+    lines = []
+    ancestors = db_manager.get_label_ancestors(label_name)
+    if ancestors:
+        lines.append("上级: " + " > ".join(ancestors))
+    aliases = db_manager.get_label_aliases(label_name)
+    if aliases:
+        lines.append("别名: " + ", ".join(aliases))
+    subtree = db_manager.get_label_subtree(label_name)
+    children = {}
+    for name, depth, parent in subtree[1:]:
+        children.setdefault(parent, []).append(name)
+    stack = [(subtree[0][0], 0)] if subtree else []
+    while stack: # 深度优先，下级标签紧跟在上级之后
+        name, depth = stack.pop()
+        lines.append("  " * depth + name)
+        stack.extend((child, depth + 1) for child in reversed(children.get(name, [])))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.label_taxonomy 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="维护标签层级与别名。")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    move_parser = subparsers.add_parser("move", help="把标签（连同下级标签）移动到另一个标签之下")
+    move_parser.add_argument("label")
+    move_parser.add_argument("parent", nargs="?", help="父标签；省略时成为顶级标签")
+    parents_parser = subparsers.add_parser("import-parents", help="从 CSV 文件（标签,父标签）批量调整层级")
+    parents_parser.add_argument("file")
+    paths_parser = subparsers.add_parser("link-paths", help="按 weapons/gun/pistol 形式的标签名建立层级")
+    paths_parser.add_argument("--separator", default="/")
+    alias_parser = subparsers.add_parser("alias", help="为标签添加别名")
+    alias_parser.add_argument("alias")
+    alias_parser.add_argument("label")
+    aliases_parser = subparsers.add_parser("import-aliases", help="从 CSV 文件（别名,标签）批量添加别名")
+    aliases_parser.add_argument("file")
+    tree_parser = subparsers.add_parser("tree", help="显示标签的上级、别名和所有下级标签")
+    tree_parser.add_argument("label")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    try:
+        if args.command == "move":
+            print(f"移动了 {db_manager.set_label_parents([(args.label, args.parent)])} 个标签")
+        elif args.command == "import-parents":
+            print(f"移动了 {import_label_parents(db_manager, args.file)} 个标签")
+        elif args.command == "link-paths":
+            print(f"移动了 {db_manager.link_label_paths(args.separator)} 个标签")
+        elif args.command == "alias":
+            print(f"写入了 {db_manager.set_label_aliases([(args.alias, args.label)])} 个别名")
+        elif args.command == "import-aliases":
+            print(f"写入了 {import_label_aliases(db_manager, args.file)} 个别名")
+        else:
+            print(format_label_tree(db_manager, args.label) or f"没有标签 '{args.label}'")
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"无法读取文件 '{args.file}': {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db_manager.close_connection()
@@ -0,0 +1,128 @@
+import heapq
+import threading
+
+# 每个节点缓存的补全候选数量；补全直接读取缓存，不遍历子树
+DEFAULT_TOP_K = 10
+# 前缀树只展开到该深度；更长的前缀在深度节点的桶中按前缀过滤（桶通常只有几十个标签）
+MAX_TRIE_DEPTH = 4
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top', 'bucket')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []     # 子树中使用次数最多的标签名，按 (-使用次数, 名称) 排序
+        self.bucket = []  # [(小写键, 标签名), ...]：键在此结束，或键的前 MAX_TRIE_DEPTH 个字符落在此节点的标签
+
+
+class LabelTrie:
+    """
+    标签名的内存前缀索引，用于输入时的自动补全。
+    匹配不区分大小写。深度不超过 MAX_TRIE_DEPTH 的节点缓存子树中使用次数最多的 top_k 个标签，
+    短前缀的补全只需沿前缀走几步读取缓存；更长的前缀在深度节点的桶里过滤。所有方法都是线程安全的。
+    """
+    def __init__(self, top_k=DEFAULT_TOP_K):
+        self.top_k = top_k
+        self._root = _TrieNode()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, name):
+        return name in self._counts
+
+    def _sort_key(self, name):
+        return -self._counts[name], name
+
+    def build(self, items):
+        """
+        批量加载 [(标签名, 使用次数), ...]，替换现有内容。
+        按使用次数降序插入，每个节点的缓存只需追加，不必排序。
+        """
+        root = _TrieNode()
+        counts = {name: usage_count for name, usage_count in items if name}
+        for name in sorted(counts, key=lambda name: (-counts[name], name)):
+            key = name.lower()
+            node = root
+            if len(node.top) < self.top_k:
+                node.top.append(name)
+            for char in key[:MAX_TRIE_DEPTH]:
+                node = node.children.setdefault(char, _TrieNode())
+                if len(node.top) < self.top_k:
+                    node.top.append(name)
+            node.bucket.append((key, name))
+        with self._lock:
+            self._root = root
+            self._counts = counts
+
+    def set_count(self, name, usage_count):
+        """插入标签或更新其使用次数。"""
+        if not name:
+            return
+        with self._lock:
+            old_count = self._counts.get(name)
+            if old_count == usage_count:
+                return
+            self._counts[name] = usage_count
+            key = name.lower()
+            path = [self._root]
+            node = self._root
+            for char in key[:MAX_TRIE_DEPTH]:
+                node = node.children.setdefault(char, _TrieNode())
+                path.append(node)
+            if old_count is None:
+                node.bucket.append((key, name))
+            for node in path:
+                self._update_top(node, name, old_count is not None and usage_count < old_count)
+
+    def complete(self, prefix, limit=DEFAULT_TOP_K):
+        """
+        返回以 prefix 开头（不区分大小写）的标签，按使用次数降序，最多 min(limit, top_k) 个。
+        """
+        key = prefix.lower()
+        limit = min(limit, self.top_k)
+        with self._lock:
+            node = self._root
+            for char in key[:MAX_TRIE_DEPTH]:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            if len(key) <= MAX_TRIE_DEPTH:
+                return node.top[:limit]
+            matches = [name for bucket_key, name in node.bucket if bucket_key.startswith(key)]
+            return heapq.nsmallest(limit, matches, key=self._sort_key)
+
+    def _update_top(self, node, name, decreased):
+        top = node.top
+        if name in top:
+            top.remove(name)
+            if decreased and len(top) == self.top_k - 1:
+                # 名次下降且缓存原本是满的：子树中可能有别的标签应当补进来，重新收集
+                node.top = top = self._collect_top(node)
+                if name in top:
+                    return
+        top.append(name)
+        top.sort(key=self._sort_key)
+        del top[self.top_k:]
+
+    def _collect_top(self, node):
+        names = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            names.extend(name for _key, name in current.bucket)
+            stack.extend(current.children.values())
+        return heapq.nsmallest(self.top_k, names, key=self._sort_key)
+
+
+if __name__ == '__main__':
+    trie = LabelTrie()
+    trie.build([("Impact", 12), ("impact metal", 30), ("Impulse", 4), ("爆炸", 8), ("爆炸 远处", 2)])
+    print(trie.complete("imp"))        # ['impact metal', 'Impact', 'Impulse']
+    print(trie.complete("impact m"))   # ['impact metal']
+    print(trie.complete("爆"))          # ['爆炸', '爆炸 远处']
+    trie.set_count("Impulse", 50)
+    print(trie.complete("im", 2))      # ['Impulse', 'impact metal']
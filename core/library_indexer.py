@@ -0,0 +1,228 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from core.database_manager import APPLICATION_ROOT
+from utils.logger_config import logger
+
+LIBRARY_ROOTS_FILE = "library_roots.dat" # 素材库根目录配置文件，每行一个目录
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac', '.aac', '.m4a', '.wma', '.aiff', '.opus')
+# 每积累多少个新文件（或多少个已扫描目录）写一次数据库（单个事务）
+LIBRARY_WRITE_BATCH = 20000
+LIBRARY_DIRECTORY_BATCH = 2000
+PROGRESS_LOG_INTERVAL = 5.0 # 秒
+
+# 扫描统计：directories 为检查过的目录数，dirty_directories 为修改时间变化、需要重新列出的目录数
+ScanStats = namedtuple('ScanStats', ['directories', 'dirty_directories', 'files', 'new_files', 'elapsed'])
+
+
+def load_library_roots():
+    """读取配置的素材库根目录列表；配置文件不存在时返回空列表。"""
+    config_file_path = os.path.join(APPLICATION_ROOT, LIBRARY_ROOTS_FILE)
+    if not os.path.exists(config_file_path):
+        return []
+    try:
+        with open(config_file_path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except Exception as e:
+        logger.error(f"读取素材库配置文件 '{LIBRARY_ROOTS_FILE}' 失败: {e}", exc_info=True)
+        return []
+
+
+def save_library_roots(roots):
+    config_file_path = os.path.join(APPLICATION_ROOT, LIBRARY_ROOTS_FILE)
+    try:
+        with open(config_file_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(roots))
+        logger.info(f"已将 {len(roots)} 个素材库目录保存到配置文件 '{LIBRARY_ROOTS_FILE}'。")
+        return True
+    except Exception as e:
+        logger.error(f"保存素材库配置文件 '{LIBRARY_ROOTS_FILE}' 失败: {e}", exc_info=True)
+        return False
+
+
+def normalize_roots(roots):
+    """转换为以分隔符结尾的绝对路径（与 directories 表中的格式一致），并去掉位于其他根目录之内的重复根目录。"""
+    normalized = sorted({os.path.join(os.path.abspath(root), '') for root in roots if root})
+    result = []
+    for root in normalized:
+        if not any(root.startswith(parent) for parent in result):
+            result.append(root)
+    return result
+
+
+def list_audio_files(directory):
+    """返回目录及其所有子目录中的音频文件路径（不读取数据库），用于对整个文件夹批量编辑标签。"""
+    paths = []
+    for dirpath, _dirnames, filenames in os.walk(directory):
+        paths.extend(os.path.join(dirpath, name) for name in filenames if name.lower().endswith(AUDIO_EXTENSIONS))
+    return paths
+
+
+def _scan_directory(directory, known_mtime_ns, known_children, full):
+    """
+    检查一个目录（在线程池中执行）。
+    修改时间与上次扫描时相同的目录，其中的文件和子目录都没有增删，直接沿用数据库中记录的子目录，不再列出内容。
+
+    Returns:
+        tuple: (directory, mtime_ns, file_names, subdirectories)；目录未变化时 file_names 为 None。
+    """
+    mtime_ns = os.stat(directory).st_mtime_ns # 先取修改时间再列目录：列出期间发生的变化会在下次扫描时被发现
+    if not full and mtime_ns == known_mtime_ns:
+        return directory, mtime_ns, None, known_children
+    file_names = []
+    subdirectories = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # 跳过隐藏目录和 $RECYCLE.BIN 等系统目录
+            if entry.name.startswith(('.', '$')):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(os.path.join(entry.path, ''))
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                    file_names.append(entry.name)
+            except OSError:
+                continue
+    return directory, mtime_ns, file_names, subdirectories
+
+
+class LibraryIndexer:
+    """
+    素材库索引器：用线程池并行遍历根目录（os.scandir），将音频文件按大批量事务写入 audios 表，
+    未打过标签的文件也能按文件名、元数据和声学特征搜索。
+    每个目录记录扫描时的修改时间；重新扫描时修改时间未变的目录只需一次 stat，不重新列出内容。
+    """
+    def __init__(self, db_manager, max_workers=8):
+        self.db_manager = db_manager
+        self.max_workers = max_workers
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, roots, full=False, on_finished=None):
+        """
+        在后台线程中扫描 roots。on_finished(stats) 在后台线程中调用（界面代码需自行使用 wx.CallAfter）。
+
+        Returns:
+            bool: 是否启动了新的扫描（已有扫描在进行时返回 False）。
+        """
+        if self.is_running():
+            logger.info("素材库扫描已在进行中。")
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(roots, full, on_finished), daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _run(self, roots, full, on_finished):
+        stats = self.scan(roots, full)
+        if on_finished and not self._stop_event.is_set():
+            on_finished(stats)
+
+    def scan(self, roots, full=False):
+        """
+        扫描素材库（在调用线程中执行，命令行模式直接调用）。
+
+        Args:
+            roots (list): 根目录。
+            full (bool): 为 True 时忽略记录的修改时间，重新列出所有目录。
+
+        Returns:
+            ScanStats
+        """
+        roots = normalize_roots(roots)
+        start_time = time.time()
+        known = self.db_manager.get_scanned_directories(roots)
+        logger.info(f"素材库扫描已启动: {len(roots)} 个根目录，数据库中已有 {len(known)} 个目录，{self.max_workers} 个线程。")
+        results = queue.Queue()
+        outstanding = 0
+        directories = dirty_directories = files = new_files = 0
+        batch = []
+        batch_files = 0
+        last_progress = start_time
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(directory):
+                known_mtime_ns, known_children = known.get(directory, (None, ()))
+                future = executor.submit(_scan_directory, directory, known_mtime_ns, known_children, full)
+                future.add_done_callback(lambda done: results.put((directory, done)))
+
+            for root in roots:
+                submit(root)
+                outstanding += 1
+            while outstanding:
+                directory, future = results.get()
+                outstanding -= 1
+                if self._stop_event.is_set():
+                    continue # 等待已提交的任务结束，不再提交新的目录
+                try:
+                    _directory, mtime_ns, file_names, subdirectories = future.result()
+                except OSError as e:
+                    logger.debug(f"无法访问目录，已跳过: {directory} ({e})")
+                    continue
+                directories += 1
+                for subdirectory in subdirectories:
+                    submit(subdirectory)
+                    outstanding += 1
+                if time.time() - last_progress >= PROGRESS_LOG_INTERVAL:
+                    last_progress = time.time()
+                    logger.info(f"素材库扫描中: 已检查 {directories} 个目录（{dirty_directories} 个有变化），"
+                                f"{files} 个音频文件，新增 {new_files} 个。")
+                if file_names is None:
+                    continue
+                dirty_directories += 1
+                files += len(file_names)
+                batch.append((directory, mtime_ns, file_names))
+                batch_files += len(file_names)
+                if batch_files >= LIBRARY_WRITE_BATCH or len(batch) >= LIBRARY_DIRECTORY_BATCH:
+                    new_files += max(self.db_manager.save_scanned_directories(batch), 0)
+                    batch = []
+                    batch_files = 0
+        if batch and not self._stop_event.is_set():
+            new_files += max(self.db_manager.save_scanned_directories(batch), 0)
+
+        elapsed = time.time() - start_time
+        rate = files / elapsed if elapsed > 0 else 0.0
+        logger.info(f"素材库扫描{'已中断' if self._stop_event.is_set() else '完成'}: 检查 {directories} 个目录，"
+                    f"其中 {dirty_directories} 个有变化；列出 {files} 个音频文件，新增 {new_files} 个，"
+                    f"耗时 {elapsed:.2f}s ({rate:.0f} 文件/秒)。")
+        return ScanStats(directories, dirty_directories, files, new_files, elapsed)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.library_indexer 运行时 sys.argv[0] 位于 core 目录；改用程序目录，与界面程序共用数据库和配置文件
+    APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    core.database_manager.APPLICATION_ROOT = APPLICATION_ROOT
+
+    parser = argparse.ArgumentParser(description="扫描音频素材库并写入数据库（无需启动界面）。")
+    parser.add_argument("roots", nargs="*", help=f"素材库根目录；省略时使用 {LIBRARY_ROOTS_FILE} 中配置的目录")
+    parser.add_argument("--full", action="store_true", help="忽略记录的目录修改时间，重新列出所有目录")
+    parser.add_argument("--save", action="store_true", help=f"将命令行给出的根目录保存到 {LIBRARY_ROOTS_FILE}")
+    args = parser.parse_args()
+
+    roots = args.roots or load_library_roots()
+    if not roots:
+        parser.error(f"没有指定素材库目录，且 {LIBRARY_ROOTS_FILE} 中没有配置。")
+    if args.roots and args.save:
+        save_library_roots(normalize_roots(args.roots))
+    db_manager = DatabaseManager()
+    stats = LibraryIndexer(db_manager).scan(roots, full=args.full)
+    print(f"目录 {stats.directories}（有变化 {stats.dirty_directories}），音频文件 {stats.files}，新增 {stats.new_files}，"
+          f"耗时 {stats.elapsed:.2f}s ({stats.files / stats.elapsed if stats.elapsed else 0:.0f} 文件/秒)")
+    db_manager.close_connection()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from core.tag_reader import read_tags_bulk
+from utils.logger_config import logger
+
+# 每积累多少个文件的元数据写一次数据库（单个事务）
+METADATA_WRITE_BATCH = 500
+
+
+class MetadataIndexer:
+    """
+    内嵌元数据的批量索引器：后台线程读取标签与流属性，按批写入数据库的全文索引和属性表。
+    DatabaseManager 为每个线程提供独立连接，写入直接在后台线程完成，不占用界面线程。
+    """
+    def __init__(self, db_manager, max_workers=8):
+        self.db_manager = db_manager
+        self.max_workers = max_workers
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """为尚未建立元数据或流属性索引的音频启动后台索引（待处理列表也在后台线程中查询）。"""
+        self._start_thread(None)
+
+    def index_paths(self, paths):
+        """在后台读取并索引指定文件的元数据（已在运行时忽略本次请求）。"""
+        if paths:
+            self._start_thread(list(paths))
+
+    def _start_thread(self, paths):
+        if self._thread and self._thread.is_alive():
+            logger.debug("元数据索引线程正在运行，本次请求将在下次启动时补齐。")
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._index_loop, args=(paths,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _index_loop(self, paths):
+        if paths is None:
+            paths = [path for _audio_id, path in self.db_manager.get_audios_without_metadata()]
+        if not paths:
+            return
+        logger.info(f"后台元数据索引已启动，待处理 {len(paths)} 个文件。")
+        start_time = time.time()
+        processed = 0
+        batch = []
+        for path, tags, props, mtime in read_tags_bulk(paths, self.max_workers):
+            if self._stop_event.is_set():
+                break
+            if mtime is None:
+                continue
+            batch.append((path, tags, props, mtime))
+            processed += 1
+            if len(batch) >= METADATA_WRITE_BATCH:
+                self.db_manager.save_audio_metadata(batch)
+                batch = []
+        if batch:
+            self.db_manager.save_audio_metadata(batch)
+        elapsed = time.time() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        logger.info(f"元数据索引完成: {processed} 个文件，耗时 {elapsed:.2f}s ({rate:.0f} 文件/秒)。")
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+
+from core.audio_decoder import np, decode_audio, is_analysis_available, ANALYSIS_SAMPLE_RATE
+from core.audio_features import HOP_LENGTH, log_mel_spectrogram, power_spectrogram
+from utils.logger_config import logger
+
+# 修改算法时递增 ANALYSIS_VERSION，旧结果会在后台自动重算
+ANALYSIS_VERSION = 1
+MIN_BPM = 60.0
+MAX_BPM = 200.0
+PRIOR_BPM = 120.0  # 对数高斯先验的中心，用于抑制倍速/半速误判
+PRIOR_OCTAVE_WIDTH = 1.0
+CHROMA_N_FFT = 4096
+CHROMA_HOP_LENGTH = 2048
+CHROMA_MIN_HZ = 55.0
+CHROMA_MAX_HZ = 5000.0
+
+ANALYSIS_WRITE_BATCH = 32
+
+KEY_MODE_MAJOR = 0
+KEY_MODE_MINOR = 1
+PITCH_CLASS_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+_FLAT_TO_SHARP = {"DB": "C#", "EB": "D#", "GB": "F#", "AB": "G#", "BB": "A#", "CB": "B", "FB": "E"}
+
+# Krumhansl-Kessler 调性轮廓
+_MAJOR_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+_MINOR_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+
+def format_key(key_root, key_mode):
+    """将 (主音, 调式) 格式化为 'A minor' 这样的文本。"""
+    if key_root is None or key_mode is None:
+        return ""
+    return f"{PITCH_CLASS_NAMES[key_root]} {'minor' if key_mode == KEY_MODE_MINOR else 'major'}"
+
+
+def parse_key(text):
+    """
+    解析调性文本，支持 'A minor'、'Am'、'F# major'、'Bb'、'A小调'、'降E大调' 等写法。
+
+    Returns:
+        tuple: (key_root, key_mode)；无法解析时返回 None。未写调式时默认为大调。
+    """
+    text = text.strip().replace("♯", "#").replace("♭", "b")
+    if not text:
+        return None
+    flat = text.startswith("降")
+    sharp = text.startswith("升")
+    if flat or sharp:
+        text = text[1:]
+    root = text[0].upper()
+    if root not in "ABCDEFG":
+        return None
+    rest = text[1:]
+    # 主音后的 '#' 或小写 'b' 即升降号（调式词 m/min/maj 都不以 b 开头，不会混淆）
+    if rest[:1] == "#":
+        root += "#"
+        rest = rest[1:]
+    elif rest[:1] == "b":
+        root += "B"
+        rest = rest[1:]
+    if flat:
+        root += "B"
+    elif sharp:
+        root += "#"
+    root = _FLAT_TO_SHARP.get(root, root)
+    if root not in PITCH_CLASS_NAMES:
+        return None
+
+    mode_text = rest.strip().lower()
+    if mode_text in ("", "maj", "major", "大调", "大"):
+        mode = KEY_MODE_MAJOR
+    elif mode_text in ("m", "min", "minor", "小调", "小"):
+        mode = KEY_MODE_MINOR
+    else:
+        return None
+    return PITCH_CLASS_NAMES.index(root), mode
+
+
+def onset_envelope(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """对数 mel 频谱的正向谱通量，作为起音强度包络。"""
+    log_mel = log_mel_spectrogram(samples, sample_rate)
+    flux = np.maximum(np.diff(log_mel, axis=0), 0.0).sum(axis=1)
+    return flux - flux.mean() if len(flux) else flux
+
+
+def estimate_tempo(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """
+    用起音包络的自相关估计速度。
+
+    Returns:
+        tuple: (bpm, confidence)；素材过短或无明显节拍时返回 (None, 0.0)。
+    """
+    envelope = onset_envelope(samples, sample_rate)
+    frame_rate = sample_rate / float(HOP_LENGTH)
+    min_lag = int(np.floor(frame_rate * 60.0 / MAX_BPM))
+    max_lag = int(np.ceil(frame_rate * 60.0 / MIN_BPM))
+    if len(envelope) < max_lag * 2:
+        return None, 0.0
+
+    # 基于 FFT 的自相关
+    n = 1 << int(np.ceil(np.log2(2 * len(envelope))))
+    spectrum = np.fft.rfft(envelope, n)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum), n)[:max_lag + 2]
+    if autocorr[0] <= 0:
+        return None, 0.0
+    autocorr = autocorr / autocorr[0]
+
+    lags = np.arange(min_lag, max_lag + 1)
+    bpms = 60.0 * frame_rate / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / PRIOR_BPM) / PRIOR_OCTAVE_WIDTH) ** 2)
+    weighted = autocorr[lags] * prior
+    best = int(np.argmax(weighted))
+    lag = float(lags[best])
+
+    # 抛物线插值得到亚帧精度
+    if 0 < best < len(lags) - 1:
+        y0, y1, y2 = autocorr[lags[best] - 1], autocorr[lags[best]], autocorr[lags[best] + 1]
+        denominator = y0 - 2 * y1 + y2
+        if denominator != 0:
+            lag += 0.5 * (y0 - y2) / denominator
+
+    confidence = float(np.clip(autocorr[lags[best]], 0.0, 1.0))
+    return 60.0 * frame_rate / lag, confidence
+
+
+def chroma_vector(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """整段音频的 12 维音级能量分布。"""
+    power = power_spectrogram(samples, CHROMA_N_FFT, CHROMA_HOP_LENGTH).sum(axis=0)
+    frequencies = np.arange(len(power)) * sample_rate / float(CHROMA_N_FFT)
+    valid = (frequencies >= CHROMA_MIN_HZ) & (frequencies <= CHROMA_MAX_HZ)
+    pitch_classes = np.round(12 * np.log2(frequencies[valid] / 440.0)).astype(int) + 9 # A = 9
+    chroma = np.bincount(pitch_classes % 12, weights=np.sqrt(power[valid]), minlength=12)
+    return chroma.astype(np.float64)
+
+
+def estimate_key(samples, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """
+    将音级分布与 24 个大小调轮廓做相关，取最相关者。
+
+    Returns:
+        tuple: (key_root, key_mode, confidence)；无音高内容时返回 (None, None, 0.0)。
+    """
+    chroma = chroma_vector(samples, sample_rate)
+    if chroma.sum() <= 0:
+        return None, None, 0.0
+    scores = []
+    for mode, profile in ((KEY_MODE_MAJOR, _MAJOR_PROFILE), (KEY_MODE_MINOR, _MINOR_PROFILE)):
+        for root in range(12):
+            scores.append((np.corrcoef(chroma, np.roll(profile, root))[0, 1], root, mode))
+    scores.sort(reverse=True)
+    best_score, root, mode = scores[0]
+    # 置信度：最佳相关系数与次佳之差（归一化到 0-1），差距越大越可信
+    confidence = float(np.clip((best_score - scores[1][0]) * 5.0, 0.0, 1.0)) if best_score > 0 else 0.0
+    return root, mode, confidence
+
+
+def analyze_file(path):
+    """
+    解码并分析单个文件的速度与调性。
+
+    Returns:
+        dict | None: {'bpm', 'bpm_confidence', 'key_root', 'key_mode', 'key_confidence'}；解码失败时返回 None。
+    """
+    samples = decode_audio(path)
+    if samples is None or len(samples) == 0:
+        return None
+    try:
+        bpm, bpm_confidence = estimate_tempo(samples)
+        key_root, key_mode, key_confidence = estimate_key(samples)
+    except Exception as e:
+        logger.error(f"分析速度/调性失败: {path}, {e}", exc_info=True)
+        return None
+    return {
+        'bpm': round(float(bpm), 2) if bpm else None,
+        'bpm_confidence': round(bpm_confidence, 3),
+        'key_root': key_root,
+        'key_mode': key_mode,
+        'key_confidence': round(key_confidence, 3),
+    }
+
+
+class MusicAnalyzer:
+    """
+    后台速度/调性分析阶段：后台线程解码并计算，结果按批写入带索引的数值列。
+    """
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """为尚未分析（或版本过期）的音频启动后台分析。"""
+        if not is_analysis_available():
+            logger.warning("numpy 不可用，跳过速度/调性分析。")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._analysis_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+
+    def _analysis_loop(self):
+        pending = self.db_manager.get_audios_without_analysis(ANALYSIS_VERSION)
+        if not pending:
+            logger.info("所有音频的速度/调性分析均已是最新。")
+            return
+        logger.info(f"后台速度/调性分析已启动，待处理 {len(pending)} 个文件。")
+        start_time = time.time()
+        processed = 0
+        batch = []
+        for _audio_id, path in pending:
+            if self._stop_event.is_set():
+                break
+            if not os.path.exists(path):
+                continue
+            result = analyze_file(path)
+            if result is not None:
+                batch.append((path, result))
+                processed += 1
+            if len(batch) >= ANALYSIS_WRITE_BATCH:
+                self.db_manager.save_music_analysis(batch, ANALYSIS_VERSION)
+                batch = []
+        if batch:
+            self.db_manager.save_music_analysis(batch, ANALYSIS_VERSION)
+        logger.info(f"速度/调性分析结束: {processed} 个文件，耗时 {time.time() - start_time:.1f}s。")
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+
+from utils.logger_config import logger
+
+FLUSH_INTERVAL_SECONDS = 30.0 # 试听记录写入数据库的间隔；每次写入是一个事务
+HISTORY_BUFFER_SIZE = 4096    # 内存中最多暂存的试听记录数，写入持续失败时丢弃最早的记录
+
+
+class PlayHistoryRecorder:
+    """
+    记录试听历史：音频线程每次开始播放时调用 record()，只把 (路径, 时间) 追加到内存中的环形缓冲区，
+    不访问数据库；后台线程每隔 FLUSH_INTERVAL_SECONDS 把缓冲区中的记录用一个事务写入 play_history 表
+    （见 DatabaseManager.record_plays）。没有新记录时不写数据库；停止时写入剩余的记录。
+    """
+    def __init__(self, db_manager, flush_interval=FLUSH_INTERVAL_SECONDS, buffer_size=HISTORY_BUFFER_SIZE):
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=buffer_size)
+        self._buffer_lock = threading.Lock()
+        self._dropped = 0 # 缓冲区已满时被挤掉的记录数
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record(self, audio_path, played_at=None):
+        """记录一次试听（可在任何线程中调用，只做内存操作）。"""
+        if not audio_path:
+            return
+        with self._buffer_lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append((audio_path, played_at if played_at is not None else time.time()))
+
+    def pending_count(self):
+        with self._buffer_lock:
+            return len(self._buffer)
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if self.is_running():
+            return False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="play-history", daemon=True)
+        self._thread.start()
+        logger.info(f"试听历史记录已启动，每 {self.flush_interval:g} 秒写入一次数据库。")
+        return True
+
+    def stop(self):
+        """停止后台线程，并写入尚未保存的记录。"""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        把缓冲区中的记录写入数据库（在调用线程中执行）。写入失败时记录放回缓冲区，下次再试。
+
+        Returns:
+            int: 写入的记录数。
+        """
+        with self._buffer_lock:
+            if not self._buffer:
+                return 0
+            events = list(self._buffer)
+            self._buffer.clear()
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            logger.warning(f"试听记录缓冲区已满，丢弃了最早的 {dropped} 条记录。")
+        if not self.db_manager.record_plays(events):
+            with self._buffer_lock:
+                # 放回缓冲区前端，保持时间顺序；放不下的最早记录被丢弃
+                space = self._buffer.maxlen - len(self._buffer)
+                self._dropped += max(len(events) - space, 0)
+                self._buffer.extendleft(reversed(events[-space:] if space else []))
+            return 0
+        return len(events)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    import core.database_manager
+    from core.database_manager import DatabaseManager
+
+    # 以 python -m core.play_history 运行时使用程序目录中的数据库，与界面程序一致
+    core.database_manager.APPLICATION_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(description="查看试听历史。")
+    parser.add_argument("--most-played", action="store_true", help="按播放次数排列（默认按最近播放时间）")
+    parser.add_argument("--days", type=float, help="只统计最近若干天的播放")
+    parser.add_argument("--limit", type=int, default=20, help="最多列出多少个音频")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    since = time.time() - args.days * 86400 if args.days else None
+    if args.most_played:
+        plays = db_manager.get_most_played(args.limit, since)
+    else:
+        plays = db_manager.get_recent_plays(args.limit, since)
+    for path, play_count, last_played in plays:
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last_played))}  {play_count:4d} 次  {path}")
+    db_manager.close_connection()
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+from utils.logger_config import logger
+
+_MISSING = object()
+
+
+class GenerationalLRUCache:
+    """
+    按条目数限制大小的 LRU 缓存，每个条目记录写入时的"写代数"。
+    读取时代数与当前代数不一致的条目视为过期（数据库在此之后提交过写事务），因此写入后无需逐个清理。
+    线程安全，并统计命中率。
+    """
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (generation, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation):
+        """
+        Returns:
+            缓存的值；不存在或已过期时返回模块内部的 _MISSING 哨兵（用 is_missing 判断）。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            if entry[0] != generation:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, generation):
+        """
+        写入缓存。generation 应为查询开始前读取的代数：查询期间有写事务提交时，
+        该条目从一开始就是过期的，不会把旧数据当作新数据返回。
+        """
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'entries', 'hits', 'misses', 'stale', 'evictions', 'hit_rate'}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def log_summary(self):
+        stats = self.stats()
+        logger.info(f"查询缓存 {self.name}: 命中率 {stats['hit_rate']:.1%} ({stats['hits']} 命中 / {stats['misses']} 未命中), "
+                    f"过期 {stats['stale']}, 淘汰 {stats['evictions']}, 当前 {stats['entries']} 条")
+
+
+def is_missing(value):
+    return value is _MISSING
+
+
+if __name__ == '__main__':
+    cache = GenerationalLRUCache("demo", max_entries=2)
+    cache.put("a", [1], generation=0)
+    cache.put("b", [2], generation=0)
+    print(cache.get("a", 0))              # [1]
+    cache.put("c", [3], generation=0)     # 淘汰最久未使用的 "b"
+    print(is_missing(cache.get("b", 0)))  # True
+    print(is_missing(cache.get("a", 1)))  # True：写代数已变化
+    print(cache.stats())
@@ -0,0 +1,177 @@
+import re
+from collections import namedtuple
+
+from core.music_analysis import parse_key
+from core.label_query import is_boolean_query
+
+# 解析结果：label_term 为剩余的标签搜索词（可能为空），filters 为 [(字段, 运算符, 值), ...]
+ParsedQuery = namedtuple('ParsedQuery', ['label_term', 'filters'])
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_COMPARISON = r'(<=|>=|==|<|>|=|:)'
+_TEMPO_WORDS = r'(?:bpm|tempo|速度)'
+_KEY_WORDS = r'(?:key|调性)'
+_LABEL_WORDS = r'(?:label|标签)'
+_FOLDER_WORDS = r'(?:folder|dir|目录|文件夹)'
+_CHANNEL_KEYWORDS = r'(?:channels|channel|ch|声道数|声道)'
+
+# 数值属性：(字段, 关键词正则, 单位表, 无单位时的换算函数)。单位换算到数据库列的存储单位。
+_UNIT_FIELDS = [
+    ('duration_ms', r'(?:duration|dur|length|时长)',
+     {'ms': 1, '毫秒': 1, 's': 1000, 'sec': 1000, '秒': 1000, 'min': 60000, 'm': 60000, '分钟': 60000, '分': 60000},
+     lambda value: value * 1000), # 默认单位为秒
+    ('sample_rate', r'(?:samplerate|sample_rate|sample rate|sr|采样率)',
+     {'hz': 1, 'khz': 1000, 'k': 1000},
+     lambda value: value * 1000 if value < 1000 else value), # "44.1"、"48" 视为 kHz
+    ('channels', _CHANNEL_KEYWORDS,
+     {}, lambda value: value),
+    ('file_size', r'(?:filesize|file_size|size|大小)',
+     {'b': 1, 'kb': 1024, 'k': 1024, 'mb': 1024 ** 2, 'm': 1024 ** 2, 'gb': 1024 ** 3, 'g': 1024 ** 3},
+     lambda value: value), # 默认单位为字节
+]
+
+# 声道数的常用写法；只在声道关键词之后识别（例如 channels:stereo、声道:立体声），
+# 单独出现的 "stereo"、"立体声" 等词可能是标签或文件名的一部分，仍作为标签搜索词
+_CHANNEL_WORDS = {'mono': 1, '单声道': 1, 'stereo': 2, '立体声': 2, '双声道': 2}
+
+
+def _unit_pattern(units):
+    if not units:
+        return r'()'
+    alternatives = "|".join(sorted((re.escape(unit) for unit in units), key=len, reverse=True))
+    return rf'\s*({alternatives})?(?![A-Za-z])'
+
+
+def _to_storage(value, unit, units, default):
+    if unit:
+        return value * units[unit.lower()]
+    return default(value)
+
+
+def _unit_clause_patterns(field, words, units, default):
+    """为一个带单位的数值属性生成区间子句与比较子句。"""
+    unit = _unit_pattern(units)
+    words = rf'(?<!\w){words}' # 避免匹配到 "punch"、"oversize" 等词的结尾
+
+    def build_between(m):
+        low = _to_storage(float(m.group(1)), m.group(2) or m.group(4), units, default)
+        high = _to_storage(float(m.group(3)), m.group(4) or m.group(2), units, default)
+        return [(field, 'between', (min(low, high), max(low, high)))]
+
+    def build_comparison(m):
+        op = m.group(1)
+        value = _to_storage(float(m.group(2)), m.group(3), units, default)
+        if op in (':', '=', '=='):
+            if field == 'duration_ms':
+                # 时长的等值匹配放宽到所写单位的 ±0.5
+                tolerance = _to_storage(0.5, m.group(3), units, default)
+                return [(field, 'between', (value - tolerance, value + tolerance))]
+            op = '='
+        return [(field, op, value)]
+
+    return [
+        (re.compile(rf'{words}\s*(?:between|在)?\s*{_NUMBER}{unit}\s*(?:and|to|-|~|到|至)\s*{_NUMBER}{unit}(?:\s*之间)?', re.I),
+         build_between),
+        (re.compile(rf'{words}\s*{_COMPARISON}\s*{_NUMBER}{unit}', re.I), build_comparison),
+    ]
+
+
+# 各子句的正则与对应的过滤条件构造函数；匹配到的文本会从标签搜索词中移除
+_CLAUSE_PATTERNS = [
+    (re.compile(rf'{_TEMPO_WORDS}\s*(?:between|在)?\s*{_NUMBER}\s*(?:and|to|-|~|到|至)\s*{_NUMBER}(?:\s*之间)?', re.I),
+     lambda m: [('bpm', 'between', (min(float(m.group(1)), float(m.group(2))),
+                                    max(float(m.group(1)), float(m.group(2)))))]),
+    (re.compile(rf'{_TEMPO_WORDS}\s*{_COMPARISON}\s*{_NUMBER}', re.I),
+     lambda m: [('bpm', '=' if m.group(1) in (':', '==') else m.group(1), float(m.group(2)))]),
+    (re.compile(rf'{_KEY_WORDS}\s*[:=]?\s*((?:[降升])?[A-Ga-g][#b♯♭]?\s*(?:major|minor|maj|min|m|大调|小调)?)(?![\w#])', re.I),
+     lambda m: [('key', '=', parse_key(m.group(1)))] if parse_key(m.group(1)) else None),
+]
+for _field, _words, _units, _default in _UNIT_FIELDS:
+    _CLAUSE_PATTERNS.extend(_unit_clause_patterns(_field, _words, _units, _default))
+_CLAUSE_PATTERNS.extend([
+    (re.compile(rf'(?<!\w){_CHANNEL_KEYWORDS}\s*[:=]?\s*(' + "|".join(_CHANNEL_WORDS) + r')(?!\w)', re.I),
+     lambda m: [('channels', '=', _CHANNEL_WORDS[m.group(1).lower()])]),
+    # 目录子句，例如 folder:"D:\\SFX\\Impacts" 或 目录:/home/me/sfx，匹配该目录及其所有子目录中的音频
+    (re.compile(rf'(?<!\w){_FOLDER_WORDS}\s*[:=]\s*(?:\'([^\']+)\'|"([^"]+)"|([^\s\'"]+))', re.I),
+     lambda m: [('folder', '=', (m.group(1) or m.group(2) or m.group(3)).strip())]),
+    # 显式的标签子句，例如 label 'impact' 或 标签:爆炸
+    (re.compile(rf'(?<!\w){_LABEL_WORDS}\s*[:=]?\s*(?:\'([^\']+)\'|"([^"]+)"|([^\s\'"]+))', re.I),
+     lambda m: [('label', '=', (m.group(1) or m.group(2) or m.group(3)).strip())]),
+])
+
+# 子句之间的连接词
+_CONNECTOR = re.compile(r'^(?:and|且|并且|&&|,|，)$', re.I)
+_AND_WORDS = ('AND', '&&')
+_OPERATOR_WORDS = ('AND', '&&', 'OR', '||', 'NOT', '!')
+
+
+def parse_search_query(text):
+    """
+    解析搜索框输入，分离出结构化过滤条件与剩余的标签搜索词。
+
+    例如 "loop BPM between 118 and 124 and key A minor" 解析为
+    label_term='loop'，filters=[('bpm', 'between', (118.0, 124.0)), ('key', '=', (9, 1))]；
+    "label 'impact' AND duration < 2s AND channels = 2 AND samplerate >= 48000" 解析为
+    label_term=''，filters=[('duration_ms', '<', 2000.0), ('sample_rate', '>=', 48000.0),
+    ('channels', '=', 2.0), ('label', '=', 'impact')]。
+    "impact folder:'D:\\SFX\\Metal'" 只搜索该目录子树：filters=[('folder', '=', 'D:\\SFX\\Metal')]。
+    标签搜索词可以是布尔查询，例如 "drum AND (kick OR snare) NOT acoustic AND bpm > 120"。
+
+    Returns:
+        ParsedQuery
+    """
+    filters = []
+    remaining = text
+    for pattern, build in _CLAUSE_PATTERNS:
+        while True:
+            match = pattern.search(remaining)
+            if not match:
+                break
+            clause_filters = build(match)
+            if not clause_filters:
+                break # 形似子句但无法解析（例如未知调名），保留原文作为标签搜索词
+            filters.extend(clause_filters)
+            remaining = remaining[:match.start()] + " " + remaining[match.end():]
+
+    # 布尔查询（见 core.label_query）中保留大写的 AND，否则 "drum AND kick" 会变成短语 "drum kick"
+    keep = _AND_WORDS if is_boolean_query(remaining) else ()
+    words = [word for word in remaining.split() if word in keep or not _CONNECTOR.match(word)]
+    return ParsedQuery(" ".join(_drop_dangling_and(words)), filters)
+
+
+def _drop_dangling_and(words):
+    """
+    去掉移除过滤子句后留下的多余 AND：位于开头或结尾、紧跟在运算符或 "(" 之后、紧挨 ")" 或 OR 之前的 AND。
+    相邻的子表达式之间默认就是 AND，去掉它们不改变查询的含义；只剩连接词时结果为空。
+    """
+    kept = []
+    for index, word in enumerate(words):
+        if word in _AND_WORDS:
+            previous = kept[-1] if kept else None
+            following = words[index + 1] if index + 1 < len(words) else None
+            if (previous is None or previous in _OPERATOR_WORDS or previous.endswith("(")
+                    or following is None or following in _AND_WORDS or following in ('OR', '||')
+                    or following.startswith(")")):
+                continue
+        kept.append(word)
+    return kept
+
+
+if __name__ == '__main__':
+    # 解析示例：(输入, 期望的 label_term, 期望的过滤条件)
+    cases = [
+        ("label 'impact' AND duration < 2s AND channels = 2 AND samplerate >= 48000", '',
+         [('duration_ms', '<', 2000.0), ('sample_rate', '>=', 48000.0), ('channels', '=', 2.0), ('label', '=', 'impact')]),
+        ("drum AND (kick OR snare) NOT acoustic AND bpm > 120", 'drum AND (kick OR snare) NOT acoustic',
+         [('bpm', '>', 120.0)]),
+        ("loop BPM between 118 and 124 and key A minor", 'loop',
+         [('bpm', 'between', (118.0, 124.0)), ('key', '=', (9, 1))]),
+        ("bpm > 120 AND drum AND kick", 'drum AND kick', [('bpm', '>', 120.0)]),
+        ("(kick AND bpm > 120) OR snare", '(kick ) OR snare', [('bpm', '>', 120.0)]),
+        ("stereo ambience channels:mono", 'stereo ambience', [('channels', '=', 1)]),
+        ("雨声 声道:立体声", '雨声', [('channels', '=', 2)]),
+    ]
+    for text, expected_term, expected_filters in cases:
+        parsed = parse_search_query(text)
+        status = "OK" if (parsed.label_term, sorted(parsed.filters)) == (expected_term, sorted(expected_filters)) else "FAIL"
+        print(f"{status} {text!r} -> {parsed}")
@@ -0,0 +1,322 @@
+import os
+import threading
+import time
+
+from core.audio_decoder import np, is_analysis_available
+from core.audio_features import FEATURE_VERSION, extract_features, pack_vector, unpack_vectors
+from utils.logger_config import logger
+
+# 超过该数量后启用粗粒度 IVF 分区，只在最近的若干个分区内做暴力检索
+IVF_THRESHOLD = 200_000
+IVF_NPROBE = 8
+IVF_TRAIN_SAMPLE = 50_000
+IVF_TRAIN_ITERATIONS = 10
+
+# 后台特征提取每积累多少条结果写一次数据库
+FEATURE_WRITE_BATCH = 32
+
+# 增量加入的向量沿用上次完整构建时的标准化统计量；向量数增长到构建时的这么多倍（或越过 IVF_THRESHOLD）后，
+# 后台特征提取结束时在提取线程中完整重建一次
+REBUILD_GROWTH_FACTOR = 1.5
+MIN_MATRIX_CAPACITY = 1024
+
+
+class SimilarityIndex:
+    """
+    内存中的特征矩阵，提供余弦相似度 top-k 查询。
+    向量在构建时按整库统计量做 z-score 标准化并归一化，使余弦相似度只需一次矩阵乘法。
+    新提取的向量用 add() 追加到矩阵末尾（容量按倍数增长），同一文件重新提取时原地替换，查询不需要重建索引。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.paths = []
+        self._positions = {} # path -> 矩阵中的行号
+        self._storage = None # 预留了容量的矩阵，前 len(paths) 行有效
+        self._built_count = 0
+        self._mean = None
+        self._std = None
+        self._centroids = None
+        self._inverted_lists = None
+        self._row_partitions = None # 启用 IVF 时每行所属的分区
+        self._added_since_load = None # rebuild() 读取数据库期间 add() 加入的 {path: 原始向量}
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def matrix(self):
+        return None if self._storage is None else self._storage[:len(self.paths)]
+
+    def is_built(self):
+        return self._storage is not None
+
+    def needs_rebuild(self):
+        """增量加入的向量较多、标准化统计量可能已经偏移，或向量数越过了 IVF_THRESHOLD 时返回 True。"""
+        with self._lock:
+            count = len(self.paths)
+            if self._centroids is None and count > IVF_THRESHOLD:
+                return True
+            return count > max(self._built_count, 1) * REBUILD_GROWTH_FACTOR
+
+    def rebuild(self, load_rows):
+        """
+        调用 load_rows() 读取全部向量并完整构建索引。读取与计算都不持有锁，查询照常进行；
+        这期间 add() 加入的向量在替换时重新加入，不会丢失。
+
+        Args:
+            load_rows (callable): 返回 [(audio_id, path, vector_blob), ...]，即 DatabaseManager.load_audio_features。
+        """
+        with self._lock:
+            self._added_since_load = {}
+        self.build(load_rows())
+
+    def build(self, rows):
+        """
+        由 (audio_id, path, vector_blob) 行构建索引。
+
+        Args:
+            rows (list): DatabaseManager.load_audio_features 的返回值。
+        """
+        start_time = time.perf_counter()
+        raw = unpack_vectors([row[2] for row in rows])
+        paths = [row[1] for row in rows]
+        if len(raw):
+            mean = raw.mean(axis=0)
+            std = raw.std(axis=0) + 1e-6
+        else:
+            mean = np.zeros(raw.shape[1], dtype=np.float32)
+            std = np.ones(raw.shape[1], dtype=np.float32)
+        storage = np.empty((max(len(raw), MIN_MATRIX_CAPACITY), raw.shape[1]), dtype=np.float32)
+        storage[:len(raw)] = _normalize(raw, mean, std)
+        centroids = inverted_lists = row_partitions = None
+        if len(paths) > IVF_THRESHOLD:
+            centroids, inverted_lists, row_partitions = _train_ivf(storage[:len(raw)])
+        with self._lock:
+            self.paths = paths
+            self._positions = {path: row for row, path in enumerate(paths)}
+            self._storage = storage
+            self._built_count = len(paths)
+            self._mean = mean
+            self._std = std
+            self._centroids = centroids
+            self._inverted_lists = inverted_lists
+            self._row_partitions = row_partitions
+            added, self._added_since_load = self._added_since_load, None
+            if added:
+                self._add_locked(list(added.items()))
+        logger.info(f"相似度索引已构建: {len(self.paths)} 条向量，耗时 {(time.perf_counter() - start_time) * 1000:.1f} ms。")
+
+    def add(self, items):
+        """
+        加入或替换一批向量。索引尚未构建时忽略（首次构建会从数据库读取它们）。
+
+        Args:
+            items (list): [(path, 原始特征向量), ...]
+        """
+        with self._lock:
+            if self._added_since_load is not None:
+                self._added_since_load.update(items)
+            if self._storage is not None and items:
+                self._add_locked(items)
+
+    def _add_locked(self, items):
+        vectors = _normalize(np.asarray([vector for _path, vector in items], dtype=np.float32), self._mean, self._std)
+        changed_rows = []
+        for (path, _vector), normalized in zip(items, vectors):
+            row = self._positions.get(path)
+            if row is None:
+                row = len(self.paths)
+                if row == len(self._storage):
+                    grown = np.empty((2 * len(self._storage), self._storage.shape[1]), dtype=np.float32)
+                    grown[:row] = self._storage[:row]
+                    self._storage = grown
+                self.paths.append(path)
+                self._positions[path] = row
+            self._storage[row] = normalized
+            changed_rows.append(row)
+        if self._centroids is not None:
+            self._assign_partitions(np.unique(np.array(changed_rows, dtype=np.int64)))
+
+    def _assign_partitions(self, rows):
+        """把新增或替换的行归入最近的分区；替换的行先从原来的分区中移除（分区约 sqrt(n) 行，移除的代价很小）。"""
+        assignment = np.argmax(self._storage[rows] @ self._centroids.T, axis=1).astype(np.int32)
+        replaced = rows[rows < len(self._row_partitions)]
+        for row, c in zip(replaced, self._row_partitions[replaced]):
+            self._inverted_lists[c] = self._inverted_lists[c][self._inverted_lists[c] != row]
+        grown = np.empty(len(self.paths), dtype=np.int32)
+        grown[:len(self._row_partitions)] = self._row_partitions
+        grown[rows] = assignment
+        self._row_partitions = grown
+        for c in np.unique(assignment):
+            self._inverted_lists[c] = np.concatenate((self._inverted_lists[c], rows[assignment == c]))
+
+    def query(self, vector, k=50, exclude_path=None):
+        """
+        返回与给定原始特征向量最相似的 k 个文件。
+
+        Returns:
+            list: [(path, similarity), ...]，按相似度降序排列。
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            matrix = self.matrix
+            if matrix is None or len(matrix) == 0:
+                return []
+            q = _normalize(np.asarray(vector, dtype=np.float32), self._mean, self._std)
+
+            if self._centroids is not None:
+                probes = np.argsort(self._centroids @ q)[-IVF_NPROBE:]
+                candidates = np.concatenate([self._inverted_lists[c] for c in probes])
+            else:
+                candidates = None
+
+            sub_matrix = matrix if candidates is None else matrix[candidates]
+            scores = sub_matrix @ q
+            top_n = min(k + 1, len(scores)) # 多取一条，以便排除查询文件自身
+            top = np.argpartition(-scores, top_n - 1)[:top_n]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for i in top:
+                row = i if candidates is None else candidates[i]
+                path = self.paths[row]
+                if path == exclude_path:
+                    continue
+                results.append((path, float(scores[i])))
+            results = results[:k]
+
+        logger.debug(f"相似度查询完成，耗时 {(time.perf_counter() - start_time) * 1000:.2f} ms。")
+        return results
+
+
+def _normalize(vectors, mean, std):
+    standardized = (vectors - mean) / std
+    norms = np.linalg.norm(standardized, axis=-1, keepdims=True)
+    return (standardized / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _train_ivf(matrix):
+    """
+    在抽样数据上训练 k-means 粗分区，并为每个分区建立倒排列表。
+
+    Returns:
+        tuple: (分区中心矩阵, [每个分区的行号数组, ...], 每行所属的分区)
+    """
+    n = len(matrix)
+    n_lists = int(np.sqrt(n))
+    rng = np.random.default_rng(0)
+    sample = matrix[rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+    for _ in range(IVF_TRAIN_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assignment == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+    # 分块分配全部向量，避免 (n, n_lists) 的大矩阵一次性占用内存
+    assignment = np.empty(n, dtype=np.int32)
+    for start in range(0, n, 65536):
+        assignment[start:start + 65536] = np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind='stable')
+    boundaries = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+    logger.info(f"向量数超过 {IVF_THRESHOLD}，已启用 IVF 分区: {n_lists} 个分区。")
+    return centroids, [order[boundaries[c]:boundaries[c + 1]] for c in range(n_lists)], assignment
+
+
+class SimilaritySearch:
+    """
+    相似音频检索服务：负责后台特征提取、首次使用时构建索引以及异步查询。
+    查询通过 DatabaseWorker 的读线程池执行；索引的完整构建只在首次查询和后台特征提取线程中进行，
+    之后新提取的向量增量加入索引。
+    """
+    def __init__(self, db_manager, db_worker):
+        self.db_manager = db_manager
+        self.db_worker = db_worker
+        self.index = SimilarityIndex()
+        self._build_lock = threading.Lock() # 保证索引只完整构建一次（首次查询与提取线程可能同时需要）
+        self._stop_event = threading.Event()
+        self._indexer_thread = None
+
+    def start_background_indexing(self):
+        """为尚未计算（或版本过期）的音频启动后台特征提取。"""
+        if not is_analysis_available():
+            logger.warning("numpy 不可用，跳过后台特征提取。")
+            return
+        if self._indexer_thread and self._indexer_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._indexer_thread = threading.Thread(target=self._indexer_loop, daemon=True)
+        self._indexer_thread.start()
+
+    def stop(self):
+        """停止后台特征提取线程。"""
+        self._stop_event.set()
+        if self._indexer_thread and self._indexer_thread.is_alive():
+            self._indexer_thread.join(timeout=2.0)
+
+    def _ensure_index(self):
+        if self.index.is_built(): # 提取线程重建期间旧索引仍可查询，不等待 _build_lock
+            return
+        with self._build_lock:
+            if not self.index.is_built():
+                self.index.rebuild(lambda: self.db_manager.load_audio_features(FEATURE_VERSION))
+
+    def _indexer_loop(self):
+        pending = self.db_manager.get_audios_without_features(FEATURE_VERSION)
+        if not pending:
+            logger.info("所有音频的特征向量均已是最新。")
+            return
+        logger.info(f"后台特征提取已启动，待处理 {len(pending)} 个文件。")
+        batch = []
+        processed = 0
+        start_time = time.time()
+        for _audio_id, path in pending:
+            if self._stop_event.is_set():
+                break
+            if not os.path.exists(path):
+                continue
+            vector = extract_features(path)
+            if vector is not None:
+                batch.append((path, vector))
+                processed += 1
+            if len(batch) >= FEATURE_WRITE_BATCH:
+                self._store_batch(batch)
+                batch = []
+        if batch:
+            self._store_batch(batch)
+        elapsed = time.time() - start_time
+        logger.info(f"后台特征提取结束: {processed} 个文件，耗时 {elapsed:.1f}s。")
+        with self._build_lock:
+            if self.index.is_built() and self.index.needs_rebuild() and not self._stop_event.is_set():
+                self.index.rebuild(lambda: self.db_manager.load_audio_features(FEATURE_VERSION))
+
+    def _store_batch(self, batch):
+        """写入一批特征向量 [(path, vector), ...]，并增量加入内存索引（索引尚未构建时由首次构建读取）。"""
+        if self.db_manager.save_audio_features([(path, pack_vector(vector)) for path, vector in batch], FEATURE_VERSION):
+            self.index.add(batch)
+
+    def _query(self, path, k):
+        """在读线程中执行：首次使用时构建索引，取得查询文件的特征向量（必要时提取并保存）后查询。"""
+        if not is_analysis_available():
+            return []
+        self._ensure_index()
+        stored_blob = self.db_manager.get_audio_features(path, FEATURE_VERSION)
+        if stored_blob is not None:
+            vector = unpack_vectors([stored_blob])[0]
+        else:
+            vector = extract_features(path)
+            if vector is None:
+                return []
+            self.index.add([(path, vector)])
+            self.db_worker.write(self.db_manager.save_audio_features, [(path, pack_vector(vector))], FEATURE_VERSION)
+        return self.index.query(vector, k=k, exclude_path=path)
+
+    def find_similar(self, path, callback, k=50):
+        """
+        异步查找与 path 最相似的音频，完成后在主线程调用 callback(results)。
+        results 为 [(path, similarity), ...]；出错时为空列表。
+        """
+        self.db_worker.read(self._query, path, k, callback=callback, error_callback=lambda _error: callback([]))
@@ -0,0 +1,651 @@
+"""
+纯 Python 实现的内嵌标签读取器。
+
+只读取各格式中存放标签的区域（ID3v2 头部、FLAC 元数据块、Ogg 注释包、MP4 的 moov/udta 原子、
+RIFF/AIFF 的 INFO/bext 块、ASF 头对象），音频数据区一律通过 seek 跳过，因此单个文件的开销
+基本与文件大小无关。同一次扫描中还会从格式头部读取时长、采样率和声道数等流属性。
+"""
+import os
+import struct
+
+from utils.logger_config import logger
+
+# 统一的元数据字段
+METADATA_FIELDS = ("title", "artist", "album", "comment", "description")
+# 流属性字段：时长（毫秒）、采样率（Hz）、声道数、文件大小（字节）
+PROPERTY_FIELDS = ("duration_ms", "sample_rate", "channels", "file_size")
+
+# 单个标签帧/块的读取上限，超过的（通常是封面图片）直接跳过
+MAX_FIELD_BYTES = 64 * 1024
+# Ogg 注释包通常位于文件开头的前几页
+OGG_HEADER_READ_BYTES = 128 * 1024
+
+_ID3_FRAME_FIELDS = {
+    "TIT2": "title", "TT2": "title",
+    "TPE1": "artist", "TP1": "artist",
+    "TALB": "album", "TAL": "album",
+    "COMM": "comment", "COM": "comment",
+}
+_VORBIS_FIELDS = {
+    "TITLE": "title",
+    "ARTIST": "artist",
+    "ALBUM": "album",
+    "COMMENT": "comment",
+    "DESCRIPTION": "description",
+}
+_MP4_FIELDS = {
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9alb": "album",
+    b"\xa9cmt": "comment",
+    b"desc": "description",
+}
+_RIFF_INFO_FIELDS = {
+    b"INAM": "title",
+    b"IART": "artist",
+    b"IPRD": "album",
+    b"ICMT": "comment",
+}
+_AIFF_TEXT_FIELDS = {
+    b"NAME": "title",
+    b"AUTH": "artist",
+    b"ANNO": "comment",
+}
+_ASF_EXTENDED_FIELDS = {
+    "WM/AlbumTitle": "album",
+    "WM/Text": "comment",
+    "Description": "description",
+}
+
+_ASF_HEADER_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+_ASF_CONTENT_DESCRIPTION_GUID = bytes.fromhex("3326b2758e66cf11a6d900aa0062ce6c")
+_ASF_EXTENDED_CONTENT_DESCRIPTION_GUID = bytes.fromhex("40a4d0d207e3d21197f000a0c95ea850")
+_ASF_FILE_PROPERTIES_GUID = bytes.fromhex("a1dcab8c47a9cf118ee400c00c205365")
+_ASF_STREAM_PROPERTIES_GUID = bytes.fromhex("9107dcb7b7a9cf118ee600c00c205365")
+_ASF_AUDIO_MEDIA_GUID = bytes.fromhex("409e69f84d5bcf11a8fd00805f5c442b")
+
+# MPEG 音频帧头查找表
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_MPEG1_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),    # Layer III
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),   # Layer II
+    3: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448), # Layer I
+}
+_MPEG2_BITRATES = {
+    1: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    3: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+}
+# 在 ID3 标签之后查找第一个 MPEG 帧头的最大范围
+MPEG_SYNC_SEARCH_BYTES = 64 * 1024
+
+
+def _clean_text(text):
+    return text.replace("\x00", " ").strip()
+
+
+def _decode_legacy_bytes(raw):
+    """解码未声明编码的 8 位文本。国内素材中常见 GBK 冒充 Latin-1 的情况，优先尝试 UTF-8/GBK。"""
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("latin-1")
+
+
+def _set_properties(props, duration_seconds=None, sample_rate=None, channels=None):
+    """记录流属性；无效值（0 或 None）不覆盖已有值。"""
+    if duration_seconds and duration_seconds > 0:
+        props["duration_ms"] = int(round(duration_seconds * 1000))
+    if sample_rate:
+        props["sample_rate"] = int(sample_rate)
+    if channels:
+        props["channels"] = int(channels)
+
+
+def _set_field(tags, field, value):
+    """记录字段值；同一字段出现多次时以分号连接。"""
+    value = _clean_text(value)
+    if not value:
+        return
+    if tags.get(field):
+        if value not in tags[field]:
+            tags[field] = f"{tags[field]}; {value}"
+    else:
+        tags[field] = value
+
+
+# --- ID3 ---
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_id3_text(encoding, data):
+    if encoding == 0:
+        return _decode_legacy_bytes(data.split(b"\x00", 1)[0])
+    if encoding == 1:
+        return data.decode("utf-16", errors="replace")
+    if encoding == 2:
+        return data.decode("utf-16-be", errors="replace")
+    return data.decode("utf-8", errors="replace")
+
+
+def _split_id3_terminated(encoding, data):
+    """拆分以编码相关结束符结尾的字符串，返回结束符之后的剩余数据。"""
+    if encoding in (1, 2):
+        for i in range(0, len(data) - 1, 2):
+            if data[i:i + 2] == b"\x00\x00":
+                return data[i + 2:]
+        return b""
+    index = data.find(b"\x00")
+    return data[index + 1:] if index >= 0 else b""
+
+
+def _parse_id3v2(f, start, tags):
+    """解析位于 start 处的 ID3v2 标签，返回标签结束位置；不是 ID3v2 时返回 start。"""
+    f.seek(start)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return start
+    major = header[3]
+    flags = header[5]
+    tag_end = start + 10 + _syncsafe(header[6:10])
+    position = start + 10
+
+    if flags & 0x40: # 扩展头
+        ext = f.read(4)
+        if len(ext) < 4:
+            return tag_end
+        position += _syncsafe(ext) if major >= 4 else struct.unpack(">I", ext)[0] + 4
+
+    if major == 2:
+        id_len, header_len = 3, 6
+    else:
+        id_len, header_len = 4, 10
+
+    while position + header_len <= tag_end:
+        f.seek(position)
+        frame_header = f.read(header_len)
+        frame_id = frame_header[:id_len]
+        if len(frame_header) < header_len or frame_id[:1] == b"\x00":
+            break # 进入填充区
+        if major == 2:
+            size = int.from_bytes(frame_header[3:6], "big")
+        elif major >= 4:
+            size = _syncsafe(frame_header[4:8])
+        else:
+            size = struct.unpack(">I", frame_header[4:8])[0]
+        data_start = position + header_len
+        position = data_start + size
+
+        field = _ID3_FRAME_FIELDS.get(frame_id.decode("latin-1"))
+        if not field or size < 2 or size > MAX_FIELD_BYTES:
+            continue
+        data = f.read(size)
+        encoding, payload = data[0], data[1:]
+        if field == "comment":
+            payload = _split_id3_terminated(encoding, payload[3:]) # 跳过语言代码和简短描述
+        _set_field(tags, field, _decode_id3_text(encoding, payload))
+    return tag_end
+
+
+def _parse_id3v1(f, tags):
+    """解析文件末尾 128 字节的 ID3v1 标签。"""
+    try:
+        f.seek(-128, os.SEEK_END)
+    except OSError:
+        return
+    data = f.read(128)
+    if len(data) != 128 or data[:3] != b"TAG":
+        return
+    _set_field(tags, "title", _decode_legacy_bytes(data[3:33].split(b"\x00", 1)[0]))
+    _set_field(tags, "artist", _decode_legacy_bytes(data[33:63].split(b"\x00", 1)[0]))
+    _set_field(tags, "album", _decode_legacy_bytes(data[63:93].split(b"\x00", 1)[0]))
+    _set_field(tags, "comment", _decode_legacy_bytes(data[97:127].split(b"\x00", 1)[0]))
+
+
+# --- Vorbis 注释 (FLAC / Ogg Vorbis / Opus) ---
+
+def _parse_vorbis_comment(data, tags):
+    try:
+        vendor_len = struct.unpack_from("<I", data, 0)[0]
+        offset = 4 + vendor_len
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        for _ in range(count):
+            length = struct.unpack_from("<I", data, offset)[0]
+            offset += 4
+            entry = data[offset:offset + length].decode("utf-8", errors="replace")
+            offset += length
+            key, sep, value = entry.partition("=")
+            field = _VORBIS_FIELDS.get(key.upper())
+            if sep and field:
+                _set_field(tags, field, value)
+    except struct.error:
+        pass # 注释包被截断时保留已解析的部分
+
+
+def _parse_flac(f, start, tags, props):
+    f.seek(start + 4)
+    while True:
+        block_header = f.read(4)
+        if len(block_header) < 4:
+            return
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7F
+        length = int.from_bytes(block_header[1:4], "big")
+        if block_type == 0 and length >= 18:
+            # STREAMINFO：采样率 20 位、声道数-1 3 位、位深-1 5 位、总采样数 36 位
+            streaminfo = f.read(length)
+            packed = int.from_bytes(streaminfo[10:18], "big")
+            sample_rate = packed >> 44
+            total_samples = packed & ((1 << 36) - 1)
+            _set_properties(props, total_samples / sample_rate if sample_rate else None,
+                            sample_rate, ((packed >> 41) & 0x7) + 1)
+        elif block_type == 4 and length <= MAX_FIELD_BYTES:
+            _parse_vorbis_comment(f.read(length), tags)
+        else:
+            f.seek(length, os.SEEK_CUR)
+        if is_last:
+            return
+
+
+def _iter_ogg_packets(data):
+    """从 Ogg 页数据中重组出完整的包。"""
+    offset = 0
+    packet = b""
+    while offset + 27 <= len(data) and data[offset:offset + 4] == b"OggS":
+        segment_count = data[offset + 26]
+        segment_table = data[offset + 27:offset + 27 + segment_count]
+        position = offset + 27 + segment_count
+        for lacing in segment_table:
+            packet += data[position:position + lacing]
+            position += lacing
+            if lacing < 255:
+                yield packet
+                packet = b""
+        offset = position
+
+
+def _ogg_last_granule(f, file_size):
+    """读取文件末尾最后一个 Ogg 页的 granule position（总采样数）。"""
+    f.seek(max(0, file_size - 65536))
+    tail = f.read(65536)
+    index = tail.rfind(b"OggS")
+    if index < 0 or index + 14 > len(tail):
+        return None
+    return struct.unpack_from("<q", tail, index + 6)[0]
+
+
+def _parse_ogg(f, start, file_size, tags, props):
+    f.seek(start)
+    granule_rate = None
+    pre_skip = 0
+    for index, packet in enumerate(_iter_ogg_packets(f.read(OGG_HEADER_READ_BYTES))):
+        if packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+            channels, sample_rate = struct.unpack_from("<BI", packet, 11)
+            _set_properties(props, sample_rate=sample_rate, channels=channels)
+            granule_rate = sample_rate
+        elif packet.startswith(b"OpusHead") and len(packet) >= 16:
+            channels, pre_skip, input_rate = struct.unpack_from("<BHI", packet, 9)
+            _set_properties(props, sample_rate=input_rate or 48000, channels=channels)
+            granule_rate = 48000 # Opus 的 granule 固定以 48 kHz 计
+        elif packet.startswith(b"\x03vorbis"):
+            _parse_vorbis_comment(packet[7:], tags)
+            break
+        elif packet.startswith(b"OpusTags"):
+            _parse_vorbis_comment(packet[8:], tags)
+            break
+        if index >= 2:
+            break
+    if granule_rate:
+        granule = _ogg_last_granule(f, file_size)
+        if granule and granule > 0:
+            _set_properties(props, (granule - pre_skip) / float(granule_rate))
+
+
+# --- MP4 / M4A ---
+
+def _iter_mp4_atoms(f, start, end):
+    """遍历 [start, end) 范围内的原子，产出 (类型, 数据起始, 数据结束)。只读原子头。"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return
+        yield atom_type, position + header_size, min(position + size, end)
+        position += size
+
+
+def _find_mp4_atom(f, start, end, atom_type):
+    for child_type, child_start, child_end in _iter_mp4_atoms(f, start, end):
+        if child_type == atom_type:
+            return child_start, child_end
+    return None
+
+
+def _parse_mp4_audio_track(f, trak, props):
+    """从 trak/mdia 中读取音频轨的声道数和采样率（stsd 中的音频采样描述）。"""
+    mdia = _find_mp4_atom(f, trak[0], trak[1], b"mdia")
+    hdlr = mdia and _find_mp4_atom(f, mdia[0], mdia[1], b"hdlr")
+    if not hdlr:
+        return False
+    f.seek(hdlr[0] + 8)
+    if f.read(4) != b"soun":
+        return False
+    minf = _find_mp4_atom(f, mdia[0], mdia[1], b"minf")
+    stbl = minf and _find_mp4_atom(f, minf[0], minf[1], b"stbl")
+    stsd = stbl and _find_mp4_atom(f, stbl[0], stbl[1], b"stsd")
+    if not stsd:
+        return False
+    # stsd: 版本/标志(4) + 条目数(4)，随后第一个采样描述的头(8) + 保留(6) + 数据引用(2) + 版本/修订/厂商(8)
+    f.seek(stsd[0] + 8 + 8 + 16)
+    entry = f.read(12)
+    if len(entry) < 12:
+        return False
+    channels, _sample_size, _compression, _packet_size, rate_fixed = struct.unpack(">HHHHI", entry)
+    _set_properties(props, sample_rate=rate_fixed >> 16, channels=channels)
+    return True
+
+
+def _parse_mp4(f, file_size, tags, props):
+    moov = _find_mp4_atom(f, 0, file_size, b"moov")
+    if moov:
+        for atom_type, atom_start, atom_end in _iter_mp4_atoms(f, moov[0], moov[1]):
+            if atom_type == b"mvhd":
+                f.seek(atom_start)
+                version = f.read(4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack(">IQ", f.read(28)[16:28])
+                else:
+                    timescale, duration = struct.unpack(">II", f.read(16)[8:16])
+                if timescale:
+                    _set_properties(props, duration / float(timescale))
+            elif atom_type == b"trak" and "channels" not in props:
+                _parse_mp4_audio_track(f, (atom_start, atom_end), props)
+    udta = moov and _find_mp4_atom(f, moov[0], moov[1], b"udta")
+    meta = udta and _find_mp4_atom(f, udta[0], udta[1], b"meta")
+    # meta 是 full atom，子原子前有 4 字节版本/标志
+    ilst = meta and _find_mp4_atom(f, meta[0] + 4, meta[1], b"ilst")
+    if not ilst:
+        return
+    for item_type, item_start, item_end in _iter_mp4_atoms(f, ilst[0], ilst[1]):
+        field = _MP4_FIELDS.get(item_type)
+        if not field:
+            continue
+        data_atom = _find_mp4_atom(f, item_start, item_end, b"data")
+        if not data_atom or data_atom[1] - data_atom[0] > MAX_FIELD_BYTES:
+            continue
+        f.seek(data_atom[0])
+        payload = f.read(data_atom[1] - data_atom[0])
+        if len(payload) > 8 and struct.unpack(">I", payload[:4])[0] == 1: # 类型 1 = UTF-8 文本
+            _set_field(tags, field, payload[8:].decode("utf-8", errors="replace"))
+
+
+# --- RIFF (WAV) / AIFF ---
+
+def _iter_chunks(f, start, end, big_endian):
+    """遍历 RIFF/IFF 块，产出 (块 ID, 数据起始, 数据长度)。块按偶数字节对齐。"""
+    fmt = ">4sI" if big_endian else "<4sI"
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        chunk_id, size = struct.unpack(fmt, header)
+        yield chunk_id, position + 8, size
+        position += 8 + size + (size & 1)
+
+
+def _parse_riff(f, file_size, tags, props):
+    byte_rate = None
+    data_size = None
+    for chunk_id, data_start, size in _iter_chunks(f, 12, file_size, big_endian=False):
+        if chunk_id == b"fmt " and size >= 16:
+            f.seek(data_start)
+            _format_tag, channels, sample_rate, byte_rate = struct.unpack("<HHII", f.read(12))
+            _set_properties(props, sample_rate=sample_rate, channels=channels)
+        elif chunk_id == b"data":
+            data_size = min(size, file_size - data_start) # 录制中断的文件块长度可能不可信
+        elif chunk_id == b"LIST" and size <= MAX_FIELD_BYTES:
+            f.seek(data_start)
+            data = f.read(size)
+            if data[:4] != b"INFO":
+                continue
+            offset = 4
+            while offset + 8 <= len(data):
+                sub_id, sub_size = struct.unpack_from("<4sI", data, offset)
+                field = _RIFF_INFO_FIELDS.get(sub_id)
+                if field:
+                    _set_field(tags, field, _decode_legacy_bytes(data[offset + 8:offset + 8 + sub_size].split(b"\x00", 1)[0]))
+                offset += 8 + sub_size + (sub_size & 1)
+        elif chunk_id == b"bext":
+            # BWF 广播扩展块：前 256 字节为 Description
+            f.seek(data_start)
+            _set_field(tags, "description", _decode_legacy_bytes(f.read(min(size, 256)).split(b"\x00", 1)[0]))
+        elif chunk_id in (b"id3 ", b"ID3 "):
+            _parse_id3v2(f, data_start, tags)
+    if byte_rate and data_size:
+        _set_properties(props, data_size / float(byte_rate))
+
+
+def _extended_to_float(data):
+    """将 AIFF 的 80 位 IEEE 扩展精度浮点数转换为 float。"""
+    exponent = ((data[0] & 0x7F) << 8) | data[1]
+    mantissa = int.from_bytes(data[2:10], "big")
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+def _parse_aiff(f, file_size, tags, props):
+    for chunk_id, data_start, size in _iter_chunks(f, 12, file_size, big_endian=True):
+        field = _AIFF_TEXT_FIELDS.get(chunk_id)
+        if chunk_id == b"COMM" and size >= 18:
+            f.seek(data_start)
+            comm = f.read(18)
+            channels, frame_count = struct.unpack(">HI", comm[:6])
+            sample_rate = _extended_to_float(comm[8:18])
+            _set_properties(props, frame_count / sample_rate if sample_rate else None, sample_rate, channels)
+        elif field and size <= MAX_FIELD_BYTES:
+            f.seek(data_start)
+            _set_field(tags, field, _decode_legacy_bytes(f.read(size)))
+        elif chunk_id in (b"ID3 ", b"id3 "):
+            _parse_id3v2(f, data_start, tags)
+
+
+# --- ASF (WMA) ---
+
+def _parse_asf(f, tags, props):
+    f.seek(16)
+    header_size, object_count = struct.unpack("<QI", f.read(12))
+    position = 30
+    for _ in range(object_count):
+        if position + 24 > header_size:
+            return
+        f.seek(position)
+        guid = f.read(16)
+        object_size = struct.unpack("<Q", f.read(8))[0]
+        if object_size < 24:
+            return
+        if guid == _ASF_FILE_PROPERTIES_GUID and object_size >= 104:
+            data = f.read(80)
+            # 播放时长以 100 纳秒为单位，包含以毫秒计的预卷时间
+            play_duration = struct.unpack_from("<Q", data, 40)[0]
+            preroll = struct.unpack_from("<Q", data, 56)[0]
+            _set_properties(props, play_duration / 1e7 - preroll / 1000.0)
+        elif guid == _ASF_STREAM_PROPERTIES_GUID and object_size >= 86:
+            data = f.read(62)
+            if data[:16] == _ASF_AUDIO_MEDIA_GUID:
+                # 类型相关数据为 WAVEFORMATEX：格式标签(2)、声道数(2)、采样率(4)
+                channels, sample_rate = struct.unpack_from("<HI", data, 56)
+                _set_properties(props, sample_rate=sample_rate, channels=channels)
+        elif guid in (_ASF_CONTENT_DESCRIPTION_GUID, _ASF_EXTENDED_CONTENT_DESCRIPTION_GUID) and object_size <= MAX_FIELD_BYTES:
+            data = f.read(object_size - 24)
+            if guid == _ASF_CONTENT_DESCRIPTION_GUID:
+                lengths = struct.unpack_from("<5H", data, 0)
+                offset = 10
+                for field, length in zip(("title", "artist", None, "description", None), lengths):
+                    if field:
+                        _set_field(tags, field, data[offset:offset + length].decode("utf-16-le", errors="replace"))
+                    offset += length
+            else:
+                count = struct.unpack_from("<H", data, 0)[0]
+                offset = 2
+                for _ in range(count):
+                    name_len = struct.unpack_from("<H", data, offset)[0]
+                    name = data[offset + 2:offset + 2 + name_len].decode("utf-16-le", errors="replace").rstrip("\x00")
+                    offset += 2 + name_len
+                    value_type, value_len = struct.unpack_from("<HH", data, offset)
+                    value = data[offset + 4:offset + 4 + value_len]
+                    offset += 4 + value_len
+                    field = _ASF_EXTENDED_FIELDS.get(name)
+                    if field and value_type == 0:
+                        _set_field(tags, field, value.decode("utf-16-le", errors="replace"))
+        position += object_size
+
+
+# --- MPEG 音频 (MP3) ---
+
+def _parse_mpeg_audio(f, audio_start, file_size, props):
+    """
+    解析第一个 MPEG 音频帧头；VBR 文件通过 Xing/Info/VBRI 头中的总帧数计算时长，
+    CBR 文件按码率估算。
+    """
+    f.seek(audio_start)
+    data = f.read(MPEG_SYNC_SEARCH_BYTES)
+    offset = data.find(b"\xff")
+    while 0 <= offset < len(data) - 4:
+        b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+        version = (b1 >> 3) & 0x3
+        layer = (b1 >> 1) & 0x3
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 0x3
+        if (b1 & 0xE0) == 0xE0 and version != 1 and layer != 0 and bitrate_index not in (0, 15) and rate_index != 3:
+            break
+        offset = data.find(b"\xff", offset + 1)
+    else:
+        return
+
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    bitrates = _MPEG1_BITRATES if version == 3 else _MPEG2_BITRATES
+    bitrate = bitrates[layer][bitrate_index] * 1000
+    mono = (b3 >> 6) == 3
+    if layer == 3:
+        samples_per_frame = 384
+    elif layer == 2 or version == 3:
+        samples_per_frame = 1152
+    else:
+        samples_per_frame = 576
+    _set_properties(props, sample_rate=sample_rate, channels=1 if mono else 2)
+
+    frame_count = None
+    if version == 3:
+        xing_offset = offset + 4 + (17 if mono else 32)
+    else:
+        xing_offset = offset + 4 + (9 if mono else 17)
+    if data[xing_offset:xing_offset + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, xing_offset + 4)[0]
+        if flags & 0x1:
+            frame_count = struct.unpack_from(">I", data, xing_offset + 8)[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        frame_count = struct.unpack_from(">I", data, offset + 36 + 14)[0]
+
+    if frame_count:
+        _set_properties(props, frame_count * samples_per_frame / float(sample_rate))
+    elif bitrate:
+        _set_properties(props, (file_size - audio_start - offset) * 8.0 / bitrate)
+
+
+def read_metadata(path):
+    """
+    一次打开文件，同时读取内嵌文本元数据和流属性。
+
+    Args:
+        path (str): 音频文件路径。
+
+    Returns:
+        tuple: (tags, props)。tags 只包含非空的 METADATA_FIELDS 字段；props 包含能读到的
+               PROPERTY_FIELDS 字段（file_size 总是存在）。读取失败时两者尽量保留已解析的部分。
+    """
+    tags = {}
+    props = {}
+    try:
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            props["file_size"] = file_size
+            head = f.read(12)
+            if head[:3] == b"ID3":
+                # MP3（或带 ID3 头的 FLAC/AAC）
+                tag_end = _parse_id3v2(f, 0, tags)
+                f.seek(tag_end)
+                if f.read(4) == b"fLaC":
+                    _parse_flac(f, tag_end, tags, props)
+                else:
+                    _parse_mpeg_audio(f, tag_end, file_size, props)
+            elif head[:4] == b"fLaC":
+                _parse_flac(f, 0, tags, props)
+            elif head[:4] == b"OggS":
+                _parse_ogg(f, 0, file_size, tags, props)
+            elif head[4:8] == b"ftyp":
+                _parse_mp4(f, file_size, tags, props)
+            elif head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                _parse_riff(f, file_size, tags, props)
+            elif head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+                _parse_aiff(f, file_size, tags, props)
+            elif head[:12] == _ASF_HEADER_GUID[:12]:
+                _parse_asf(f, tags, props)
+            elif head[:1] == b"\xff":
+                _parse_mpeg_audio(f, 0, file_size, props) # 无 ID3v2 标签的 MP3
+            if not tags and path.lower().endswith(".mp3"):
+                _parse_id3v1(f, tags)
+    except (OSError, struct.error, ValueError, IndexError, ZeroDivisionError) as e:
+        logger.debug(f"读取内嵌元数据失败: {path}, {e}")
+    return tags, props
+
+
+def read_tags(path):
+    """
+    读取音频文件的内嵌文本元数据。
+
+    Args:
+        path (str): 音频文件路径。
+
+    Returns:
+        dict: 只包含非空字段的字典，键为 METADATA_FIELDS 之一；无法识别或读取失败时返回空字典。
+    """
+    return read_metadata(path)[0]
+
+
+def read_tags_bulk(paths, max_workers=8):
+    """
+    并行读取多个文件的标签与流属性（I/O 密集，适合线程池，尤其是网络磁盘）。
+
+    Yields:
+        tuple: (path, tags, props, mtime)；文件不可访问时 mtime 为 None。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def read_one(path):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return path, {}, {}, None
+        tags, props = read_metadata(path)
+        return path, tags, props, mtime
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(read_one, paths, chunksize=64)
@@ -0,0 +1,181 @@
+import time
+
+import wx
+
+from utils.logger_config import logger
+
+PREFETCH_MARGIN = 50 # 可见的最后一项（或选中项）距离已加载末尾不足该数量时加载下一页
+# 列表的排序方式：(DatabaseManager.get_label_usage_page 的 order 参数, 显示名)
+BROWSE_ORDERS = [('usage', "按使用次数"), ('recent', "按最近使用")]
+
+
+class LabelBrowserDialog(wx.Dialog):
+    """
+    按使用次数或最近使用时间浏览所有标签。标签按页从数据库读取（见 DatabaseManager.get_label_usage_page），
+    只加载可见及即将滚动到的部分；确认后 GetSelectedLabel() 返回选中的标签名。
+    """
+    def __init__(self, parent, total_count, page_loader):
+        """
+        Args:
+            total_count (int): 正在使用的标签数量，显示在标题中。
+            page_loader (callable): 调用方式为 page_loader(order, after, callback, error_callback)，加载完成后在主线程调用
+                callback((labels, next_key))，失败时在主线程调用 error_callback(error)；
+                labels 为 [(标签名, 使用次数, 最近使用时间), ...]。
+        """
+        super().__init__(parent, title=f"浏览标签 (共 {total_count} 个)", size=(500, 450),
+                         style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.total_count = total_count
+        self.page_loader = page_loader
+        self.loaded_labels = []
+        self.next_page_key = None
+        self.has_more_labels = True
+        self._page_pending = False
+        self._load_generation = 0 # 切换排序后丢弃旧排序尚未返回的页
+
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.order_choice = wx.Choice(panel, choices=[name for _order, name in BROWSE_ORDERS])
+        self.order_choice.SetSelection(0)
+        self.order_choice.Bind(wx.EVT_CHOICE, self.on_order_changed)
+        sizer.Add(self.order_choice, 0, wx.EXPAND | wx.ALL, 10)
+
+        self.list_box = wx.ListBox(panel, style=wx.LB_SINGLE | wx.LB_HSCROLL)
+        self.list_box.Bind(wx.EVT_LISTBOX, self.on_list_selected)
+        self.list_box.Bind(wx.EVT_LISTBOX_DCLICK, lambda event: self._confirm())
+        # 滚动后检查可见区域是否接近已加载部分的末尾
+        self.list_box.Bind(wx.EVT_SCROLLWIN, self.on_list_scrolled)
+        self.list_box.Bind(wx.EVT_MOUSEWHEEL, self.on_list_scrolled)
+        self.list_box.Bind(wx.EVT_SIZE, self.on_list_scrolled)
+        sizer.Add(self.list_box, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+
+        self.status_label = wx.StaticText(panel, label="正在加载...")
+        sizer.Add(self.status_label, 0, wx.EXPAND | wx.ALL, 10)
+
+        buttons = wx.StdDialogButtonSizer()
+        search_button = wx.Button(panel, wx.ID_OK, "搜索此标签")
+        search_button.Bind(wx.EVT_BUTTON, lambda event: self._confirm())
+        buttons.AddButton(search_button)
+        buttons.AddButton(wx.Button(panel, wx.ID_CANCEL, "关闭"))
+        buttons.Realize()
+        sizer.Add(buttons, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+
+        panel.SetSizer(sizer)
+        self.Layout()
+        self.Centre()
+        self.list_box.SetFocus()
+
+        self._request_next_page()
+
+    def _current_order(self):
+        return BROWSE_ORDERS[self.order_choice.GetSelection()][0]
+
+    def _request_next_page(self):
+        """请求下一页；已有请求在进行中或没有更多标签时不做任何事。"""
+        if self._page_pending or not self.has_more_labels:
+            return
+        self._page_pending = True
+        generation = self._load_generation
+        self.page_loader(self._current_order(), self.next_page_key,
+                         lambda page: self._on_page_loaded(generation, page),
+                         lambda error: self._on_page_failed(generation, error))
+
+    def _on_page_failed(self, generation, error):
+        """一页加载失败：清除进行中的标记，之后滚动或选择时会重新请求这一页。"""
+        if not self or generation != self._load_generation:
+            return
+        self._page_pending = False
+        self.status_label.SetLabel(f"已加载 {len(self.loaded_labels)} / {self.total_count} 个标签，下一页加载失败，滚动列表可重试。")
+        logger.warning(f"标签分页加载失败: {error}")
+
+    def _on_page_loaded(self, generation, page):
+        if not self or generation != self._load_generation: # 对话框已关闭，或已切换排序
+            return
+        labels, next_key = page
+        self._page_pending = False
+        self.next_page_key = next_key
+        self.has_more_labels = next_key is not None
+
+        if labels:
+            self.list_box.Freeze()
+            try:
+                for label in labels:
+                    self.list_box.Append(self._get_display_text(label))
+                    self.loaded_labels.append(label[0])
+            finally:
+                self.list_box.Thaw()
+            if self.list_box.GetSelection() == wx.NOT_FOUND:
+                self.list_box.SetSelection(0)
+
+        if not self.loaded_labels:
+            self.status_label.SetLabel("还没有使用中的标签。")
+        elif self.has_more_labels:
+            self.status_label.SetLabel(f"已加载 {len(self.loaded_labels)} / {self.total_count} 个标签。")
+        else:
+            self.status_label.SetLabel(f"所有 {len(self.loaded_labels)} 个标签已加载。")
+
+    def _get_display_text(self, label):
+        name, usage_count, last_used = label
+        if self._current_order() == 'recent' and last_used:
+            return f"{name} ({usage_count} 个音频，最近使用 {time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))})"
+        return f"{name} ({usage_count} 个音频)"
+
+    def _last_visible_index(self):
+        """返回列表框中最后一个可见项的索引；列表未填满可见区域时返回已加载的条数。"""
+        index = self.list_box.HitTest(wx.Point(1, self.list_box.GetClientSize().height - 1))
+        return len(self.loaded_labels) if index == wx.NOT_FOUND else index
+
+    def _load_more_if_needed(self, index=None):
+        """可见区域（或指定的选中项）接近已加载部分的末尾时加载下一页。"""
+        if not self or not self.has_more_labels:
+            return
+        if index is None:
+            index = self._last_visible_index()
+        if index >= len(self.loaded_labels) - PREFETCH_MARGIN:
+            self._request_next_page()
+
+    def on_list_scrolled(self, event):
+        event.Skip()
+        # 等滚动位置更新后再检查
+        wx.CallAfter(self._load_more_if_needed)
+
+    def on_list_selected(self, event):
+        # 用键盘向下浏览时提前加载下一页
+        self._load_more_if_needed(self.list_box.GetSelection())
+
+    def on_order_changed(self, event):
+        """切换排序后从第一页重新加载。"""
+        self._load_generation += 1
+        self.loaded_labels = []
+        self.next_page_key = None
+        self.has_more_labels = True
+        self._page_pending = False
+        self.list_box.Clear()
+        self.status_label.SetLabel("正在加载...")
+        logger.debug(f"标签浏览切换排序: {self._current_order()}")
+        self._request_next_page()
+
+    def _confirm(self):
+        if self.GetSelectedLabel() is not None:
+            self.EndModal(wx.ID_OK)
+
+    def GetSelectedLabel(self):
+        """Returns: str | None: 选中的标签名。"""
+        index = self.list_box.GetSelection()
+        return self.loaded_labels[index] if index != wx.NOT_FOUND else None
+
+
+if __name__ == '__main__':
+    sample = [(f"标签{i}", 1000 - i, time.time() - i * 3600) for i in range(1000)]
+
+    def load_page(order, after, callback, error_callback):
+        items = sample if order == 'usage' else sorted(sample, key=lambda item: -item[2])
+        start = after or 0
+        end = start + 200
+        callback((items[start:end], end if end < len(items) else None))
+
+    app = wx.App(False)
+    dlg = LabelBrowserDialog(None, len(sample), load_page)
+    if dlg.ShowModal() == wx.ID_OK:
+        print(dlg.GetSelectedLabel())
+    dlg.Destroy()
@@ -0,0 +1,87 @@
+import wx
+
+from utils.logger_config import logger
+
+COMPLETION_LIMIT = 10 # 下拉列表中最多显示的补全项
+
+
+class LabelCompleter(wx.TextCompleter):
+    """
+    标签名的输入补全，候选来自内存中的 LabelTrie（按使用次数排序），每次按键只需几微秒。
+    指定 separator 时只补全最后一个分隔符之后的部分（例如 "脚步, 金" -> "脚步, 金属"）。
+    注意：在 Windows 上 Start/GetNext 可能在非主线程中调用，LabelTrie 本身是线程安全的。
+    """
+    def __init__(self, label_trie, separator=None, limit=COMPLETION_LIMIT):
+        super().__init__()
+        self.label_trie = label_trie
+        self.separator = separator
+        self.limit = limit
+        self._completions = iter(())
+
+    def Start(self, prefix):
+        head, term = "", prefix
+        if self.separator and self.separator in prefix:
+            head, term = prefix.rsplit(self.separator, 1)
+            head += self.separator
+            # 保留用户在分隔符后输入的空格
+            stripped = term.lstrip()
+            head += term[:len(term) - len(stripped)]
+            term = stripped
+        if term.startswith('-'): # 批量编辑中表示移除的标签，补全 "-" 之后的部分
+            head += '-'
+            term = term[1:]
+        if not term:
+            self._completions = iter(())
+            return False
+        try:
+            names = self.label_trie.complete(term, self.limit)
+        except Exception as e:
+            logger.warning(f"标签自动补全失败: {e}")
+            names = []
+        self._completions = iter([head + name for name in names])
+        return bool(names)
+
+    def GetNext(self):
+        return next(self._completions, "")
+
+
+class LabelInputDialog(wx.Dialog):
+    """
+    带标签自动补全的单行输入对话框，用法与 wx.TextEntryDialog 相同。
+    label_trie 为 None（补全索引尚未加载完成）时退化为普通输入框。
+    """
+    def __init__(self, parent, message, caption, value="", label_trie=None, separator=None):
+        super().__init__(parent, title=caption)
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        sizer.Add(wx.StaticText(panel, label=message), 0, wx.ALL, 10)
+        self.text_ctrl = wx.TextCtrl(panel, value=value, size=(400, -1), style=wx.TE_PROCESS_ENTER)
+        self.text_ctrl.Bind(wx.EVT_TEXT_ENTER, lambda event: self.EndModal(wx.ID_OK))
+        sizer.Add(self.text_ctrl, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+
+        buttons = self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL)
+        sizer.Add(buttons, 0, wx.EXPAND | wx.ALL, 10)
+
+        panel.SetSizer(sizer)
+        sizer.Fit(self)
+        self.Fit()
+
+        if label_trie is not None:
+            self.text_ctrl.AutoComplete(LabelCompleter(label_trie, separator))
+        self.text_ctrl.SetFocus()
+
+    def GetValue(self):
+        return self.text_ctrl.GetValue()
+
+
+if __name__ == '__main__':
+    from core.label_trie import LabelTrie
+
+    trie = LabelTrie()
+    trie.build([("金属撞击", 12), ("金属门", 3), ("脚步 木地板", 7), ("impact", 20), ("impulse", 4)])
+    app = wx.App(False)
+    dlg = LabelInputDialog(None, "添加标签 (多个标签用逗号分隔):", "添加音频标签", label_trie=trie, separator=',')
+    if dlg.ShowModal() == wx.ID_OK:
+        print(dlg.GetValue())
+    dlg.Destroy()
@@ -1,7 +1,6 @@
 import wx
 import os
 import threading
-import queue
 import time
 from concurrent.futures import ThreadPoolExecutor
 
@@ -9,25 +8,47 @@ from utils.logger_config import logger
 import core.audio_manager
 from utils.unified_tts_speaker import unified_speaker
 
+LIST_PAGE_SIZE = 100       # 内存中的结果列表每次追加到列表框的条数
+PREFETCH_MARGIN = 50       # 可见的最后一项（或选中项）距离已加载末尾不足该数量时加载下一页
+MISSING_FILE_PREFIX = "[文件缺失] "
+
 class SearchResultsDialog(wx.Dialog):
     """
     一个用于显示搜索结果并提供音频预览功能的对话框。
-    支持分批加载、后台文件存在性检查和即时预览。
+    结果按页按需加载（只加载可见或即将可见的部分），并在后台检查文件是否存在（缺失的文件在列表中标出），支持即时预览。
+    列表支持多选（Shift/Ctrl），可对选中的文件或（确认后）全部结果批量编辑标签。
     """
-    def __init__(self, parent, title, all_results):
+    def __init__(self, parent, title, all_results=None, display_names=None, total_count=None, page_loader=None,
+                 batch_labeler=None):
         """
         初始化搜索结果对话框。
 
         Args:
             parent (wx.Frame): 父窗口。
             title (str): 对话框的标题。
-            all_results (list): 包含所有搜索结果文件路径的列表。
+            all_results (list, optional): 已在内存中的结果文件路径列表（例如相似音频、重复组）。
+            display_names (list, optional): 与 all_results 一一对应的显示文本，默认显示文件名。
+            total_count (int, optional): 数据库统计的匹配总数，打开时立即显示在标题和状态栏中。
+            page_loader (callable, optional): 数据库结果的分页加载函数，与 all_results 二选一。
+                调用方式为 page_loader(after, callback, error_callback)，加载完成后在主线程调用 callback((paths, next_key))，
+                失败时在主线程调用 error_callback(error)；after 为上一页返回的 next_key（第一页为 None），
+                next_key 为 None 表示没有更多结果。
+            batch_labeler (callable, optional): 批量编辑标签，调用方式为 batch_labeler(dialog, paths, scope)；
+                paths 为选中的文件路径，为 None 表示数据库中的全部结果（尚未加载的页也包括在内），scope 为范围的说明文字。
+                省略时不显示批量编辑按钮。
         """
+        self.all_results = list(all_results) if all_results is not None else []
+        self.total_count = total_count if total_count is not None else len(self.all_results)
+        title = f"{title} (共 {self.total_count} 条)"
         super().__init__(parent, title=title, size=(600, 400), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
         self.parent_frame = parent
-        self.all_results = list(all_results)
+        self.display_names = list(display_names) if display_names is not None else None
+        self.page_loader = page_loader if page_loader is not None else self._list_page_loader
+        self.batch_labeler = batch_labeler
         self.loaded_results = []
-        self.pending_results_queue = queue.Queue()
+        self.next_page_key = None
+        self.has_more_results = True
+        self._page_pending = False
         self.current_playing_path = None
         self.last_preview_time = 0
 
@@ -35,109 +56,139 @@ class SearchResultsDialog(wx.Dialog):
         self.panel = wx.Panel(self)
         main_sizer = wx.BoxSizer(wx.VERTICAL)
 
-        self.list_box = wx.ListBox(self.panel, style=wx.LB_SINGLE | wx.LB_HSCROLL)
+        self.list_box = wx.ListBox(self.panel, style=wx.LB_EXTENDED | wx.LB_HSCROLL)
         self.list_box.Bind(wx.EVT_LISTBOX, self.on_list_selected)
         self.list_box.Bind(wx.EVT_LISTBOX_DCLICK, self.on_list_double_click)
+        # 滚动后检查可见区域是否接近已加载部分的末尾
+        self.list_box.Bind(wx.EVT_SCROLLWIN, self.on_list_scrolled)
+        self.list_box.Bind(wx.EVT_MOUSEWHEEL, self.on_list_scrolled)
+        self.list_box.Bind(wx.EVT_SIZE, self.on_list_scrolled)
 
-        self.status_label = wx.StaticText(self.panel, label="正在初始化...")
+        self.status_label = wx.StaticText(self.panel, label=f"共 {self.total_count} 条匹配，正在加载...")
 
         main_sizer.Add(self.list_box, 1, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(self.status_label, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        if batch_labeler is not None:
+            self.batch_label_button = wx.Button(self.panel, label="批量编辑标签...")
+            self.batch_label_button.Bind(wx.EVT_BUTTON, self.on_batch_label)
+            main_sizer.Add(self.batch_label_button, 0, wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
 
         self.panel.SetSizer(main_sizer)
         self.Layout()
         self.Centre()
 
-        # --- 分批加载逻辑 ---
-        self.batch_size = 50
-        self.initial_load_size = 100
-        self.load_timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self.on_load_more_results, self.load_timer)
-
         # --- 线程池用于后台文件存在性检查 ---
         self.executor = ThreadPoolExecutor(max_workers=2)
-        self.future_to_path = {}
-
-        # 启动初始加载
-        self._start_initial_load()
-
-    def _start_initial_load(self):
-        """启动初始加载并开始后台分批加载。"""
-        if not self.all_results:
-            self.status_label.SetLabel("没有匹配的音频文件。")
-            logger.warning("搜索结果对话框初始化时，all_results 为空。")
-            return
+        self.missing_count = 0
 
-        # 加载初始批次到列表
-        initial_batch_end_index = min(self.initial_load_size, len(self.all_results))
-        initial_batch = self.all_results[:initial_batch_end_index]
-        for path in initial_batch:
-            self.list_box.Append(os.path.basename(path))
-            self.loaded_results.append(path)
+        # 加载第一页，之后随滚动和选择按需加载
+        self._request_next_page()
 
-        # 将剩余文件放入待加载队列
-        for path in self.all_results[initial_batch_end_index:]:
-            self.pending_results_queue.put(path)
+    def _list_page_loader(self, after, callback, error_callback):
+        """对内存中的结果列表按页切片，与数据库分页使用同一套加载流程。"""
+        start = after or 0
+        end = start + LIST_PAGE_SIZE
+        callback((self.all_results[start:end], end if end < len(self.all_results) else None))
 
-        # 更新状态标签
-        self.status_label.SetLabel(f"已加载 {len(self.loaded_results)} / {len(self.all_results)} 条。")
+    def _request_next_page(self):
+        """请求下一页结果；已有请求在进行中或没有更多结果时不做任何事。"""
+        if self._page_pending or not self.has_more_results:
+            return
+        self._page_pending = True
+        self.page_loader(self.next_page_key, self._on_page_loaded, self._on_page_failed)
 
-        # 如果还有待加载项，启动定时器
-        if not self.pending_results_queue.empty():
-            self.load_timer.Start(500) # 每 500ms 尝试加载一批
-            logger.info(f"开始分批加载，初始加载 {len(self.loaded_results)} 条，剩余 {self.pending_results_queue.qsize()} 条。")
+    def _on_page_loaded(self, page):
+        """将一页结果追加到列表框，并提交后台文件存在性检查。"""
+        if not self: # 结果返回前对话框已经关闭
+            return
+        paths, next_key = page
+        self._page_pending = False
+        self.next_page_key = next_key
+        self.has_more_results = next_key is not None
+
+        if paths:
+            first_index = len(self.loaded_results)
+            self.list_box.Freeze()
+            try:
+                for path in paths:
+                    self.list_box.Append(self._get_display_name(len(self.loaded_results), path))
+                    self.loaded_results.append(path)
+            finally:
+                self.list_box.Thaw()
+            future = self.executor.submit(self._find_missing_files, first_index, paths)
+            future.add_done_callback(lambda done: wx.CallAfter(self._mark_missing_files, done.result()))
+
+        if not self.loaded_results:
+            self.status_label.SetLabel("没有匹配的音频文件。")
+            logger.warning("搜索结果对话框没有可显示的结果。")
+            return
+        if self.has_more_results:
+            # 一页足以填满可见区域；之后的页由滚动、窗口缩放和选择触发加载
+            self.status_label.SetLabel(f"已加载 {len(self.loaded_results)} / {self.total_count} 条。")
         else:
-            logger.info("所有搜索结果已一次性加载完毕。")
+            self.status_label.SetLabel(f"所有 {len(self.loaded_results)} 条结果已加载。")
+            logger.info(f"搜索结果全部加载完成，共 {len(self.loaded_results)} 条。")
 
-    def on_load_more_results(self, event):
-        """定时器事件处理，从队列加载更多结果到列表。"""
-        items_added_this_batch = 0
-        while items_added_this_batch < self.batch_size and not self.pending_results_queue.empty():
-            try:
-                path = self.pending_results_queue.get_nowait()
-                # 异步提交文件存在性检查
-                future = self.executor.submit(self._check_file_exists, path)
-                self.future_to_path[future] = path
-
-                # 立即将文件名添加到列表框
-                self.list_box.Append(os.path.basename(path))
-                self.loaded_results.append(path)
-                items_added_this_batch += 1
-            except queue.Empty:
-                break # 队列为空时退出循环
-
-        # 处理已完成的文件存在性检查
-        self._process_completed_file_checks()
-
-        # 更新状态标签
-        self.status_label.SetLabel(f"已加载 {len(self.loaded_results)} / {len(self.all_results)} 条。")
-
-        # 如果队列已空，停止定时器
-        if self.pending_results_queue.empty():
-            self.load_timer.Stop()
-            self.status_label.SetLabel(f"所有 {len(self.all_results)} 条结果已加载。")
-            logger.info("所有搜索结果分批加载完成。")
-
-    def _check_file_exists(self, path):
-        """在后台线程中检查文件是否存在。"""
-        return path, os.path.exists(path)
-
-    def _process_completed_file_checks(self):
-        """处理已完成的文件存在性检查结果，并更新UI（如果需要）。"""
-        completed_futures = [f for f in self.future_to_path if f.done()]
-        for future in completed_futures:
-            path, exists = future.result()
-            if not exists:
-                logger.warning(f"文件不存在，将可能在UI中被标记: {path}")
-                # TODO: 可以在这里实现更复杂的UI反馈，例如改变列表项的颜色或添加图标
-                # 简单起见，此处仅记录警告，未来可以根据需要实现UI更新
-            del self.future_to_path[future] # 清理已处理的future
+    def _on_page_failed(self, error):
+        """一页加载失败：清除进行中的标记，之后滚动或选择时会重新请求这一页。"""
+        if not self:
+            return
+        self._page_pending = False
+        self.status_label.SetLabel(f"已加载 {len(self.loaded_results)} / {self.total_count} 条，下一页加载失败，滚动列表可重试。")
+        logger.warning(f"搜索结果分页加载失败: {error}")
+
+    def _last_visible_index(self):
+        """返回列表框中最后一个可见项的索引；列表未填满可见区域时返回已加载的条数。"""
+        index = self.list_box.HitTest(wx.Point(1, self.list_box.GetClientSize().height - 1))
+        return len(self.loaded_results) if index == wx.NOT_FOUND else index
+
+    def _load_more_if_needed(self, index=None):
+        """可见区域（或指定的选中项）接近已加载部分的末尾时加载下一页。"""
+        if not self or not self.has_more_results:
+            return
+        if index is None:
+            index = self._last_visible_index()
+        if index >= len(self.loaded_results) - PREFETCH_MARGIN:
+            self._request_next_page()
+
+    def on_list_scrolled(self, event):
+        event.Skip()
+        # 等滚动位置更新后再检查
+        wx.CallAfter(self._load_more_if_needed)
+
+    def _get_display_name(self, index, path):
+        """返回列表中第 index 项的显示文本。"""
+        if self.display_names is not None:
+            return self.display_names[index]
+        return os.path.basename(path)
+
+    def _find_missing_files(self, first_index, paths):
+        """在后台线程中检查一页结果的文件是否存在，返回缺失文件在列表中的索引。"""
+        return [first_index + offset for offset, path in enumerate(paths) if not os.path.exists(path)]
+
+    def _mark_missing_files(self, indexes):
+        """在列表中标出缺失的文件（移动过的文件由后台核对重新链接，见 core.audio_reconciler）。"""
+        if not self or not indexes:
+            return
+        for index in indexes:
+            self.list_box.SetString(index, MISSING_FILE_PREFIX + self.list_box.GetString(index))
+        self.missing_count += len(indexes)
+        logger.info(f"搜索结果中有 {self.missing_count} 个文件不存在。")
+
+    def _event_index(self, event):
+        """多选列表中事件对应的项（最近点击或用键盘移到的项）；该项未被选中时返回 wx.NOT_FOUND。"""
+        index = event.GetSelection()
+        if index == wx.NOT_FOUND or not self.list_box.IsSelected(index):
+            return wx.NOT_FOUND
+        return index
 
     def on_list_selected(self, event):
         """列表项被选中时触发，进行即时音频预览。"""
-        selected_index = self.list_box.GetSelection()
+        selected_index = self._event_index(event)
         if selected_index == wx.NOT_FOUND:
             return
+        # 用键盘向下浏览时提前加载下一页
+        self._load_more_if_needed(selected_index)
 
         current_time = time.time()
         # 限制预览频率，避免用户快速上下滚动时频繁播放
@@ -169,7 +220,7 @@ class SearchResultsDialog(wx.Dialog):
 
     def on_list_double_click(self, event):
         """列表项双击时，切换播放/暂停或播放新文件。"""
-        selected_index = self.list_box.GetSelection()
+        selected_index = self._event_index(event)
         if selected_index == wx.NOT_FOUND:
             return
 
@@ -194,10 +245,40 @@ class SearchResultsDialog(wx.Dialog):
 
         unified_speaker.speak(f"播放/暂停: {os.path.basename(selected_path)}")
 
+    def on_batch_label(self, event):
+        """
+        批量编辑标签：有选中项时默认作用于选中的文件，也可以在选择框中改选全部结果；
+        作用于全部结果前需确认条数，避免误改整个结果集。
+        """
+        selections = self.list_box.GetSelections()
+        all_scope = f"全部 {self.total_count} 条结果"
+        if selections:
+            selected_scope = f"选中的 {len(selections)} 个文件"
+            unified_speaker.speak(f"批量编辑标签，默认作用于{selected_scope}。")
+            dlg = wx.SingleChoiceDialog(self, "要批量编辑哪些文件的标签？", "批量编辑标签", [selected_scope, all_scope])
+            dlg.SetSelection(0)
+            dlg.CenterOnParent()
+            choice = dlg.GetSelection() if dlg.ShowModal() == wx.ID_OK else wx.NOT_FOUND
+            dlg.Destroy()
+            if choice == wx.NOT_FOUND:
+                return
+            if choice == 0:
+                self.batch_labeler(self, [self.loaded_results[index] for index in selections], selected_scope)
+                return
+
+        unified_speaker.speak(f"将批量编辑{all_scope}的标签，请确认。")
+        answer = wx.MessageBox(f"将批量编辑{all_scope}的标签（包括尚未加载到列表中的结果），是否继续？",
+                               "确认批量编辑", wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION, self)
+        if answer != wx.YES:
+            unified_speaker.speak("已取消批量编辑。")
+            return
+        # 内存中的结果直接传路径；数据库结果交给调用方按搜索条件选取，不必先加载全部页
+        paths = list(self.all_results) if self.page_loader == self._list_page_loader else None
+        self.batch_labeler(self, paths, all_scope)
+
     def OnClose(self, event):
         """对话框关闭时执行清理操作。"""
         core.audio_manager.audio_command_queue.put(("stop", None)) # 停止所有音频
-        self.load_timer.Stop() # 停止加载定时器
         self.executor.shutdown(wait=True) # 等待所有后台任务完成并关闭线程池
         logger.info("搜索结果对话框已关闭，已停止音频播放并清理线程。")
         self.Destroy() # 销毁对话框自身
@@ -209,6 +290,7 @@ if __name__ == '__main__':
 
     # 模拟 logger
     import logging
+    import queue
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     # 模拟 unified_speaker
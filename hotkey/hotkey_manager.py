@@ -73,6 +73,35 @@ _registered_hotkey_info = {} # 存储 {hotkey_string_normalized: func_name}
 # { hotkey_string_normalized: set_of_modifier_strings_lower } (例如 {'ctrl', 'alt'})
 _hotkey_modifiers_map = {}
 
+# keyboard 库的修饰键顺序，规范化快捷键字符串时修饰键按此排序
+_MODIFIER_ORDER = ["alt", "ctrl", "shift", "windows"]
+
+
+def _join_hotkey(modifiers, key):
+    """
+    把修饰键集合与普通键拼接为规范化的快捷键字符串（例如 "alt+ctrl+m"），
+    update_hotkey 保存的和 _load_config 比较的都是这种形式。
+    """
+    parts = sorted((m for m in modifiers if m in _MODIFIER_ORDER), key=_MODIFIER_ORDER.index)
+    if key and key not in parts:
+        parts.append(key)
+    return "+".join(parts)
+
+
+def _normalize_hotkey_string(hotkey_str):
+    """把快捷键字符串（例如默认值 "ctrl+alt+m"）转换为规范化形式，用于比较是否为同一组合键。"""
+    modifiers = set()
+    key = ""
+    for part in (hotkey_str or "").split('+'):
+        part = part.strip().lower()
+        if part in ('win', 'windows'):
+            modifiers.add('windows')
+        elif part in _MODIFIER_ORDER:
+            modifiers.add(part)
+        elif part:
+            key = part
+    return _join_hotkey(modifiers, key)
+
 
 # 确保在程序退出时停止键盘监听
 @atexit.register
@@ -99,7 +128,16 @@ class HotkeyManager:
             ("fast_forward", "快进"),
             ("rewind", "快退"),
             ("add_label", "添加标签"),
-            ("search_label", "搜索标签")
+            ("search_label", "搜索标签"),
+            ("find_similar", "查找相似音频"),
+            ("find_duplicates", "查找重复音频"),
+            ("announce_labels", "朗读当前音频的标签"),
+            ("rescan_library", "扫描素材库"),
+            ("find_exact_duplicates", "查找完全相同的文件"),
+            ("browse_labels", "浏览常用标签"),
+            ("recent_plays", "最近试听的音频"),
+            ("most_played", "最常试听的音频"),
+            ("label_folder", "批量编辑文件夹的标签")
         ])
 
         # 定义 UI 需要的普通键及其 keyboard 库对应键名
@@ -207,6 +245,9 @@ class HotkeyManager:
         # 合并已加载的配置和默认配置，确保所有定义的功能都有一个条目
         # 对于加载到的功能，使用其值；对于新功能或未加载到的功能，将其值设为空字符串，等待用户设置。
         self.hotkeys = {}
+        default_hotkeys = self._get_default_hotkey_values()
+        # 已占用的组合键；用户设置的快捷键以规范化形式保存（"alt+ctrl+m"），默认值写作 "ctrl+alt+m"，需统一后比较
+        used_hotkeys = {_normalize_hotkey_string(value) for value in loaded_hotkeys.values() if value}
         for func_name in self._defined_functions.keys(): # 遍历所有已知功能
             if func_name in loaded_hotkeys:
                 # 如果已加载的配置中有该功能，则使用它
@@ -215,6 +256,12 @@ class HotkeyManager:
                 if not self._is_valid_hotkey_string(self.hotkeys[func_name]):
                     logger.warning(f"加载的功能 '{func_name}' 对应的快捷键 '{self.hotkeys[func_name]}' 无效，已重置为空。")
                     self.hotkeys[func_name] = ""
+            elif loaded_hotkeys and func_name in default_hotkeys and \
+                    _normalize_hotkey_string(default_hotkeys[func_name]) not in used_hotkeys:
+                # 已有配置但缺少该功能（新增功能）：使用默认快捷键，前提是它没有被其他功能占用
+                self.hotkeys[func_name] = default_hotkeys[func_name]
+                used_hotkeys.add(_normalize_hotkey_string(default_hotkeys[func_name]))
+                logger.info(f"功能 '{func_name}' 为新功能，使用默认快捷键 '{default_hotkeys[func_name]}'。")
             else:
                 # 如果是新功能，或加载配置中没有该功能，则初始化为空字符串
                 self.hotkeys[func_name] = ""
@@ -239,7 +286,16 @@ class HotkeyManager:
             "fast_forward": "ctrl+alt+right",
             "rewind": "ctrl+alt+left",
             "add_label": "ctrl+alt+a",
-            "search_label": "ctrl+alt+s"
+            "search_label": "ctrl+alt+s",
+            "find_similar": "ctrl+alt+m",
+            "find_duplicates": "ctrl+alt+d",
+            "announce_labels": "ctrl+alt+l",
+            "rescan_library": "ctrl+alt+r",
+            "find_exact_duplicates": "ctrl+alt+e",
+            "browse_labels": "ctrl+alt+b",
+            "recent_plays": "ctrl+alt+h",
+            "most_played": "ctrl+alt+t",
+            "label_folder": "ctrl+alt+f"
         }
 
     def _set_default_hotkeys(self):
@@ -312,20 +368,9 @@ class HotkeyManager:
                 key_str_for_keyboard = key_str.lower()
             parts.append(key_str_for_keyboard)
 
-        # 构建最终用于存储和比较的规范化快捷键字符串 (例如 "ctrl+alt+shift+t")
-        # 确保修饰键排序一致 ('alt', 'ctrl', 'shift', 'windows')，然后是普通键
-        modifier_order = ["alt", "ctrl", "shift", "windows"] # keyboard 库的默认修饰键排序
-
-        # 过滤掉不存在的修饰键，并按指定顺序排序
-        sorted_modifiers_for_hotkey_str = sorted([m for m in mod_keys_lower_set if m in modifier_order],
-                                                 key=lambda x: modifier_order.index(x))
-
-        # 添加普通键，确保它不在修饰键列表中
-        final_parts = sorted_modifiers_for_hotkey_str
-        if key_str_for_keyboard and key_str_for_keyboard not in sorted_modifiers_for_hotkey_str:
-             final_parts.append(key_str_for_keyboard)
-
-        new_hotkey_str_normalized = "+".join(final_parts)
+        # 构建最终用于存储和比较的规范化快捷键字符串 (例如 "alt+ctrl+shift+t")
+        # 修饰键按 keyboard 库的顺序 ('alt', 'ctrl', 'shift', 'windows') 排列，然后是普通键
+        new_hotkey_str_normalized = _join_hotkey(mod_keys_lower_set, key_str_for_keyboard)
 
         # Step 2: 验证和冲突检测
         if not new_hotkey_str_normalized:
@@ -342,7 +387,7 @@ class HotkeyManager:
 
         # 检查内部冲突 (与现有已注册的快捷键冲突)
         for existing_func, existing_hotkey_str in self.hotkeys.items():
-            if existing_func != func_name and existing_hotkey_str == new_hotkey_str_normalized:
+            if existing_func != func_name and _normalize_hotkey_string(existing_hotkey_str) == new_hotkey_str_normalized:
                 display_name = self._defined_functions.get(existing_func, existing_func)
                 return False, f"该快捷键 '{new_hotkey_str_normalized}' 已与功能 '{display_name}' 冲突。"
 